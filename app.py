@@ -1,13 +1,18 @@
+import time
+_startup_started = time.perf_counter()
+
+import asyncio
+import functools
 import gradio as gr
 import os
 import re
 from dotenv import load_dotenv
-from voice_clone import VoiceClone
-from voice2text import AudioTranscriber
-from split_vedio2audio import VideoAudioSplitter
-from voice_generate import VoiceGenerator
+from audio_utils import WavStreamReframer
+from long_form import WavConcatWriter
 import sys
 
+_imports_done = time.perf_counter()
+
 # 检查.env文件是否存在
 if not os.path.exists('.env'):
     print("\n错误：缺少 .env 文件！")
@@ -28,11 +33,30 @@ if not SILICONFLOW_API_KEY:
     print("如果您还没有 API 密钥，请联系管理员获取\n")
     sys.exit(1)
 
-# 初始化服务
-voice_clone = VoiceClone(SILICONFLOW_API_KEY)
-transcriber = AudioTranscriber(SILICONFLOW_API_KEY)
-video_splitter = VideoAudioSplitter()
-voice_generator = VoiceGenerator(SILICONFLOW_API_KEY)
+# 追踪配置（TRACE_LOG / PROFILE_SLOW_SECONDS）在导入时读取，需在 load_dotenv 之后导入
+from tracing import accumulate, span as trace_span, traced
+
+# 服务在首次使用时才创建（界面事件处理函数均为协程，使用 asyncio 版本的客户端），
+# HTTP、ffmpeg、NumPy 等模块随之推迟导入，启动过程不访问网络
+@functools.cache
+def get_voice_clone():
+    from async_clients import AsyncVoiceClone
+    return AsyncVoiceClone(SILICONFLOW_API_KEY)
+
+@functools.cache
+def get_transcriber():
+    from async_clients import AsyncAudioTranscriber
+    return AsyncAudioTranscriber(SILICONFLOW_API_KEY)
+
+@functools.cache
+def get_video_splitter():
+    from split_vedio2audio import VideoAudioSplitter
+    return VideoAudioSplitter()
+
+@functools.cache
+def get_voice_generator():
+    from async_clients import AsyncVoiceGenerator
+    return AsyncVoiceGenerator(SILICONFLOW_API_KEY)
 
 # 定义可用的模型
 AVAILABLE_MODELS = {
@@ -44,17 +68,35 @@ AVAILABLE_MODELS = {
 # 定义内置声音
 built_in_voices = ["alex", "anna", "bella", "benjamin", "charles", "claire", "david", "diana"]
 
+# 模型对比一次最多的 (模型, 音色) 组合数，对应界面中预先创建的播放器数量
+MAX_COMPARE_SLOTS = 9
+
+@traced()
+async def load_voice_lists():
+    """页面加载后再填充依赖远端的音色下拉框，接口较慢或不可用时不影响启动"""
+    try:
+        voices = await get_voice_generator().get_voice_list()
+    except Exception as e:
+        print(f"获取音色列表失败: {str(e)}")
+        voices = []
+    return (
+        gr.Dropdown(choices=voices), gr.Dropdown(choices=voices),
+        gr.Dropdown(choices=built_in_voices + voices), gr.Dropdown(choices=voices)
+    )
+
 def validate_voice_id(voice_id):
     """验证克隆音色ID是否符合要求"""
-    if not voice_id:
-        return False, "音色ID不能为空"
-    if len(voice_id) > 64:
-        return False, "音色ID长度不能超过64个字符"
-    if not re.match(r'^[a-zA-Z0-9_-]+$', voice_id):
-        return False, "音色ID只能包含字母、数字、下划线和连字符"
-    return True, "验证通过"
-
-def process_voice_clone(audio_file, reference_text, target_text, model_choice, voice_id):
+    with trace_span("validation"):
+        if not voice_id:
+            return False, "音色ID不能为空"
+        if len(voice_id) > 64:
+            return False, "音色ID长度不能超过64个字符"
+        if not re.match(r'^[a-zA-Z0-9_-]+$', voice_id):
+            return False, "音色ID只能包含字母、数字、下划线和连字符"
+        return True, "验证通过"
+
+@traced()
+async def process_voice_clone(audio_file, reference_text, target_text, model_choice, voice_id):
     """处理语音克隆请求"""
     if not audio_file or not reference_text or not target_text:
         return "请确保所有必填字段都已填写", None
@@ -68,7 +110,7 @@ def process_voice_clone(audio_file, reference_text, target_text, model_choice, v
         # 上传参考音频
         model_id = AVAILABLE_MODELS[model_choice]
         print(f"上传语音文件: {audio_file}")
-        result = voice_clone.upload_voice_base64(
+        result = await get_voice_clone().upload_voice_stream(
             audio_file,
             voice_id,
             model_id,
@@ -86,7 +128,7 @@ def process_voice_clone(audio_file, reference_text, target_text, model_choice, v
         output_path = os.path.join(output_dir, f"output_{voice_id}.wav")
 
         # 生成克隆语音
-        voice_clone.speech(
+        await get_voice_clone().speech(
             target_text,
             voice=voice_uri,
             model_id=model_id,
@@ -98,90 +140,281 @@ def process_voice_clone(audio_file, reference_text, target_text, model_choice, v
     except Exception as e:
         return f"处理过程中出错: {str(e)}", None
 
-def transcribe_audio(audio_file):
+@traced()
+async def transcribe_audio(audio_file, long_audio=False):
     """处理语音转文字请求"""
     if not audio_file:
         return "请上传音频文件"
 
     try:
         print(audio_file)  # audio_file is already a path string
-        result = transcriber.transcriptions(audio_file)
+        if long_audio:
+            from audio_chunking import format_timestamp
+
+            # 长音频模式：按静音切分并行转写，每段前标注开始时间
+            result = await get_transcriber().transcriptions_long(audio_file)
+            return "\n".join(
+                f"[{format_timestamp(item['start'])}] {item['text']}" for item in result['segments']
+            )
+        result = await get_transcriber().transcriptions(audio_file)
         return result.get('text', '转写失败')
     except Exception as e:
         return f"转写过程中出错: {str(e)}"
 
-def split_video_audio(video_file, start_time=None, duration=None):
+@traced()
+async def split_video_audio(video_file, start_time=None, duration=None, output_format="auto"):
     """处理视频分离音频请求"""
     if not video_file:
         return "请上传视频文件", None
 
     try:
         # 处理视频分离
-        output_path = video_splitter.split_video_to_audio(
+        result = await asyncio.to_thread(
+            get_video_splitter().extract_audio,
             video_file,
             start_time,
-            duration
+            duration,
+            output_format
+        )
+        method = "流复制" if result['method'] == "copy" else "转码"
+        return f"音频提取成功！（{method}，源编码 {result['codec']}，耗时 {result['elapsed']:.2f} 秒）", result['path']
+    except Exception as e:
+        return f"处理过程中出错: {str(e)}", None
+
+@traced()
+async def transcribe_video(video_file, start_time=None, duration=None):
+    """处理视频直接转写请求（音频经管道直接上传，不生成中间文件）"""
+    if not video_file:
+        return "请上传视频文件"
+
+    try:
+        from pipelines import avideo_to_transcript
+
+        result = await avideo_to_transcript(get_video_splitter(), get_transcriber(), video_file, start_time, duration)
+        return result.get('text', '转写失败')
+    except Exception as e:
+        return f"转写过程中出错: {str(e)}"
+
+@traced()
+async def split_video_segments(video_file, ranges_text, segment_length=0, output_format="auto"):
+    """处理批量分段提取请求"""
+    if not video_file:
+        return "请上传视频文件", None
+
+    try:
+        from split_vedio2audio import parse_ranges
+
+        ranges = parse_ranges(ranges_text or "")
+        if not ranges and not segment_length:
+            return "请填写时间段列表或固定分段时长", None
+        result = await asyncio.to_thread(
+            get_video_splitter().split_video_to_segments,
+            video_file,
+            ranges or None,
+            None if ranges else int(segment_length),
+            output_format
         )
-        return "音频提取成功！", output_path
+        method = "流复制" if result['method'] == "copy" else "转码"
+        return f"共提取 {len(result['paths'])} 段音频（{method}，耗时 {result['elapsed']:.2f} 秒）", result['paths']
     except Exception as e:
         return f"处理过程中出错: {str(e)}", None
 
-def generate_speech(text, model_choice, voice, speed, gain, response_format, sample_rate):
-    """处理语音合成请求"""
+@traced()
+async def generate_speech(text, model_choice, voice, speed, gain, response_formats, sample_rate, use_cache=True, long_form=False):
+    """
+    处理语音合成请求，边接收边写盘并逐块推送到流式播放组件
+
+    只做一次远端合成（WAV），合成完成后在本地派生所选的各个输出格式
+    """
     if not text:
-        return "请输入要合成的文本", None
+        yield "请输入要合成的文本", None, None, None
+        return
+    if not response_formats:
+        yield "请至少选择一种输出格式", None, None, None
+        return
     
     try:
+        from audio_variants import derive_variants, master_sample_rate, supported_rate, variant_label
+
         # 生成输出音频文件路径
         output_dir = "outputs/generated"
         os.makedirs(output_dir, exist_ok=True)
-        output_path = os.path.join(output_dir, f"generated_{os.urandom(4).hex()}.wav")
-        
-        # 生成语音
+        basename = f"generated_{os.urandom(4).hex()}"
+        output_path = os.path.join(output_dir, f"{basename}.wav")
         model_id = AVAILABLE_MODELS[model_choice]
-        speech_data = voice_generator.create_speech(
+        variants = [(response_format, int(sample_rate)) for response_format in response_formats]
+        master_rate = master_sample_rate(variants)
+
+        async def finish():
+            # 远端合成的 WAV 即是 ("wav", master_rate) 这一项，直接复用，只派生其余格式
+            derived = [variant for variant in variants if variant != ("wav", master_rate)]
+            paths = {}
+            if derived:
+                with trace_span("derive_variants", formats=len(derived)):
+                    with open(output_path, "rb") as f:
+                        master = f.read()
+                    paths = await asyncio.to_thread(derive_variants, master, derived, output_dir, basename)
+            files = [
+                output_path if (fmt, rate) == ("wav", master_rate)
+                else paths[variant_label(fmt, supported_rate(fmt, rate))]
+                for fmt, rate in variants
+            ]
+            return "语音合成成功！", None, output_path, files
+
+        # 长文本模式：分段并发合成，按顺序拼接写盘
+        if long_form:
+            segments = get_voice_generator().stream_long_speech(
+                text,
+                model=model_id,
+                voice=voice,
+                speed=speed,
+                gain=gain,
+                sample_rate=master_rate,
+                use_cache=use_cache
+            )
+            with open(output_path, "wb") as f, accumulate("disk_write", target="output") as writes:
+                writer = WavConcatWriter(f)
+                index = 0
+                async for segment in segments:
+                    index += 1
+                    with writes:
+                        writer.append(segment)
+                    yield f"语音合成中（第 {index} 段）...", segment, None, None
+                writer.close()
+            yield await finish()
+            return
+        
+        # 流式生成语音
+        chunks = get_voice_generator().stream_speech(
             text,
             model=model_id,
             voice=voice,
             speed=speed,
             gain=gain,
-            response_format=response_format,
-            sample_rate=sample_rate
+            response_format="wav",
+            sample_rate=master_rate,
+            use_cache=use_cache
         )
         
-        # 保存音频文件
-        with open(output_path, "wb") as f:
-            f.write(speech_data)
+        # 边接收边保存音频文件
+        reframer = WavStreamReframer()
+        with open(output_path, "wb") as f, accumulate("disk_write", target="output") as writes:
+            async for chunk in chunks:
+                with writes:
+                    f.write(chunk)
+                playable = reframer.feed(chunk)
+                if playable:
+                    yield "语音合成中...", playable, None, None
             
-        return "语音合成成功！", output_path
+        yield await finish()
     except Exception as e:
-        return f"处理过程中出错: {str(e)}", None
+        yield f"处理过程中出错: {str(e)}", None, None, None
+
+@traced()
+async def compare_models(text, model_choices, voices, speed, gain, sample_rate, use_cache=False):
+    """多模型（及多音色）并发合成对比，每完成一个组合即刷新结果表与对应的播放器"""
+    hidden = [gr.update(visible=False, value=None)] * MAX_COMPARE_SLOTS
+    if not text or not model_choices or not voices:
+        yield "请填写文本并至少选择一个模型和一个音色", None, *hidden
+        return
+    combos = [(name, voice) for name in model_choices for voice in voices]
+    if len(combos) > MAX_COMPARE_SLOTS:
+        yield f"一次最多对比 {MAX_COMPARE_SLOTS} 个组合（当前 {len(combos)} 个）", None, *hidden
+        return
+
+    from pipelines import acompare_speech
+
+    rows = [[name, voice.split(':', 1)[0], "合成中", None, None, None] for name, voice in combos]
+    players = [
+        gr.update(visible=True, value=None, label=f"{name} / {voice.split(':', 1)[0]}") for name, voice in combos
+    ] + hidden[len(combos):]
+    yield "合成中...", rows, *players
+
+    started = time.perf_counter()
+    done = 0
+    results = acompare_speech(
+        get_voice_generator(), text, [AVAILABLE_MODELS[name] for name in model_choices], voices,
+        "outputs/compare", speed=speed, gain=gain, sample_rate=sample_rate, use_cache=use_cache
+    )
+    async for result in results:
+        done += 1
+        row = rows[result["index"]]
+        if result["error"]:
+            row[2] = f"失败: {result['error']}"
+        else:
+            row[2:] = ["成功", round(result["latency"], 2), round(result["ttfb"], 2), round(result["duration"], 2)]
+            players[result["index"]] = gr.update(visible=True, value=result["path"])
+        yield f"已完成 {done}/{len(combos)}", rows, *players
+
+    total = sum(row[3] for row in rows if row[3] is not None)
+    yield f"对比完成，总耗时 {time.perf_counter() - started:.2f} 秒（各组合耗时之和 {total:.2f} 秒）", rows, *players
 
-def refresh_voice_list():
+@traced()
+async def dub_video(video_file, voice, model_choice, segment_seconds, speed, gain, use_cache=True):
+    """视频配音：提取、转写、合成按片段流水线执行，每个片段每完成一个阶段即刷新进度表"""
+    if not video_file or not voice:
+        yield "请上传视频并选择音色", None, None
+        return
+
+    from pipelines import adub_video
+
+    stage_labels = {"extract": "已提取", "transcribe": "已转写", "synthesize": "已合成"}
+    rows = []
+    try:
+        events = adub_video(
+            get_video_splitter(), get_transcriber(), get_voice_clone(), video_file, voice.split(':', 1)[-1],
+            model=AVAILABLE_MODELS[model_choice], segment_seconds=segment_seconds, speed=speed, gain=gain,
+            use_cache=use_cache
+        )
+        async for event in events:
+            if event["stage"] == "done":
+                stages = event["stage_seconds"]
+                yield (
+                    f"配音完成：{event['segments']} 个片段，总耗时 {event['elapsed']:.2f} 秒"
+                    f"（提取 {stages['extract']:.2f} 秒、转写 {stages['transcribe']:.2f} 秒、"
+                    f"合成 {stages['synthesize']:.2f} 秒）"
+                    + (f"，配音最多比原片段顺延 {event['max_delay']:.1f} 秒" if event["max_delay"] > 0.05 else ""),
+                    rows, event["path"]
+                )
+                break
+            if event["index"] == len(rows):
+                rows.append([event["index"] + 1, round(event["start"], 2), round(event["end"], 2), "", ""])
+            row = rows[event["index"]]
+            row[3] = stage_labels[event["stage"]]
+            if event["stage"] == "transcribe":
+                row[4] = event["text"]
+            yield f"处理中：已提取 {len(rows)} 个片段", rows, None
+    except Exception as e:
+        yield f"处理过程中出错: {str(e)}", rows, None
+
+@traced()
+async def refresh_voice_list():
     """刷新语音列表"""
-    return gr.Dropdown(choices=voice_generator.get_voice_list())
+    return gr.Dropdown(choices=await get_voice_generator().get_voice_list(refresh=True))
 
-def delete_voice(voice):
+@traced()
+async def delete_voice(voice):
     """删除语音"""
     if not voice:
         return "请选择要删除的语音", None
     
     try:
         voice_uri = voice.split(':', 1)[-1]
-        result = voice_generator.delete_voice(voice_uri)
+        result = await get_voice_generator().delete_voice(voice_uri)
         print("删除结果：", result)
         if result == "success":
-            return "语音删除成功！", gr.Dropdown(choices=voice_generator.get_voice_list())
+            return "语音删除成功！", gr.Dropdown(choices=await get_voice_generator().get_voice_list())
         else:
             return f"删除失败：{result.get('message', '未知错误')}", None
     except Exception as e:
         return f"删除过程中出错: {str(e)}", None
 
-def process_voice_clone_and_refresh(audio_file, reference_text, target_text, model_choice, voice_id):
+@traced()
+async def process_voice_clone_and_refresh(audio_file, reference_text, target_text, model_choice, voice_id):
     """处理语音克隆并刷新音色列表"""
-    status, audio = process_voice_clone(audio_file, reference_text, target_text, model_choice, voice_id)
+    status, audio = await process_voice_clone(audio_file, reference_text, target_text, model_choice, voice_id)
     # 无论成功与否都刷新列表，因为可能有其他用户添加了新音色
-    return status, audio, gr.Dropdown(choices=built_in_voices + voice_generator.get_voice_list())
+    return status, audio, gr.Dropdown(choices=built_in_voices + await get_voice_generator().get_voice_list())
 
 # 创建 Gradio 界面
 with gr.Blocks(title="数字人工具包") as demo:
@@ -190,7 +423,7 @@ with gr.Blocks(title="数字人工具包") as demo:
     with gr.Tabs():
         # 视频分离音频标签页
         with gr.Tab("视频分离音频"):
-            gr.Markdown("### 视频分离音频\n\n* 将 mp4 格式的视频文件转成音频文件，支持视频文件的开始时间、持续时间分离音频\n* 使用ffmpeg分离音频：ffmpeg -ss 开始时间 -t 持续时间 -i 视频文件 -c:a copy 提取的音频文件")
+            gr.Markdown("### 视频分离音频\n\n* 将 mp4 格式的视频文件转成音频文件，支持视频文件的开始时间、持续时间分离音频\n* 使用ffmpeg分离音频：源音频编码与输出格式兼容时直接流复制（-c:a copy），否则转码\n* 输出格式选择 auto 时按源编码自动选择可流复制的容器（如 AAC → m4a）")
             with gr.Row():
                 with gr.Column():
                     video_input = gr.Video(label="上传视频文件")
@@ -204,6 +437,11 @@ with gr.Blocks(title="数字人工具包") as demo:
                         value="00:00:30",
                         placeholder="00:00:00"
                     )
+                    split_format = gr.Dropdown(
+                        choices=["auto", "mp3", "m4a", "wav", "flac", "ogg"],
+                        label="输出格式",
+                        value="auto"
+                    )
                     split_btn = gr.Button("开始分离", variant="primary")
 
                 with gr.Column():
@@ -211,10 +449,29 @@ with gr.Blocks(title="数字人工具包") as demo:
                     output_audio_file = gr.Audio(label="提取的音频", show_download_button=True)
                     send_to_clone_btn = gr.Button("发送到语音克隆", variant="secondary")
 
+            with gr.Accordion("视频直接转写（音频经管道直接上传，不生成中间文件）", open=False):
+                transcribe_video_btn = gr.Button("转写视频", variant="primary")
+                video_transcription = gr.Textbox(label="转写结果")
+
+            with gr.Accordion("批量分段提取（一次 ffmpeg 调用提取多段）", open=False):
+                with gr.Row():
+                    with gr.Column():
+                        segment_ranges = gr.Textbox(
+                            label="时间段列表（每行一个：开始时间 持续时间，例如 00:00:10 00:00:05）",
+                            lines=4,
+                            placeholder="00:00:00 00:00:30\n00:01:00 00:00:15"
+                        )
+                        segment_length = gr.Number(label="或按固定时长切分（秒，填写时间段列表时忽略）", value=0, precision=0)
+                        split_segments_btn = gr.Button("批量提取", variant="primary")
+                    with gr.Column():
+                        split_segments_status = gr.Textbox(label="处理状态")
+                        segment_files = gr.Files(label="提取的音频片段")
+
         # 语音转写标签页
         with gr.Tab("语音转写"):
             gr.Markdown("### 语音转写\n\n* 选择模型：FunAudioLLM/SenseVoiceSmall")
             audio_input_transcribe = gr.Audio(label="上传要转写的音频", type="filepath")
+            long_audio = gr.Checkbox(label="长音频模式（在静音处切分后并行转写，结果按时间标注）", value=False)
             transcribe_btn = gr.Button("开始转写", variant="primary")
             transcription_output = gr.Textbox(label="转写结果")
             
@@ -242,6 +499,7 @@ with gr.Blocks(title="数字人工具包") as demo:
                                 value="voice_" + os.urandom(4).hex(),
                                 placeholder="请输入唯一的声音ID"
                             )
+                            transcode_reference = gr.Checkbox(label="上传前压缩参考音频（转为模型采样率的单声道 mp3）", value=True)
                             upload_btn = gr.Button("上传音色", variant="primary")
 
                         with gr.Column():
@@ -250,11 +508,36 @@ with gr.Blocks(title="数字人工具包") as demo:
                                 refresh_clone_list_btn = gr.Button("🔄 刷新音色列表", variant="secondary")
                                 delete_clone_btn = gr.Button("🗑️ 删除音色", variant="primary")
                             voice_list = gr.Dropdown(
-                                choices=voice_generator.get_voice_list(),
-                                label="已上传的音色列表",
+                                choices=[],
+                                label="已上传的音色列表（可多选后批量删除）",
+                                multiselect=True,
                                 interactive=True
                             )
                             voice_manage_status = gr.Textbox(label="音色管理状态", visible=True)
+
+                    with gr.Accordion("批量上传音色（音色ID取自文件名，参考文本优先读取同名 .txt 文件，没有时自动转写）", open=False):
+                        with gr.Row():
+                            with gr.Column():
+                                bulk_files = gr.File(
+                                    label="参考音频（可多选，可附带同名 .txt 文件）",
+                                    file_count="multiple",
+                                    type="filepath"
+                                )
+                                bulk_folder = gr.Textbox(label="或服务器上的目录路径", placeholder="例如 /data/speakers")
+                                bulk_model_choice = gr.Dropdown(
+                                    choices=list(AVAILABLE_MODELS.keys()),
+                                    label="选择模型",
+                                    value="CosyVoice2"
+                                )
+                                bulk_concurrency = gr.Slider(minimum=1, maximum=16, value=4, step=1, label="并发数")
+                                bulk_upload_btn = gr.Button("批量上传", variant="primary")
+                            with gr.Column():
+                                bulk_status = gr.Textbox(label="处理状态")
+                                bulk_results = gr.Dataframe(
+                                    headers=["文件", "音色ID", "状态", "uri", "参考文本 / 错误"],
+                                    label="上传结果",
+                                    interactive=False
+                                )
                 
                 # 克隆语音部分
                 with gr.TabItem("克隆语音"):
@@ -273,7 +556,7 @@ with gr.Blocks(title="数字人工具包") as demo:
                                 value="CosyVoice2"
                             )
                             clone_voice_select = gr.Dropdown(
-                                choices=voice_generator.get_voice_list(),
+                                choices=[],
                                 label="选择音色（从已上传的音色中选择）",
                                 interactive=True
                             )
@@ -295,6 +578,8 @@ with gr.Blocks(title="数字人工具包") as demo:
                                     step=1,
                                     label="音量增益"
                                 )
+                            clone_use_cache = gr.Checkbox(label="使用合成缓存（相同文本与参数直接读取本地结果）", value=True)
+                            clone_long_form = gr.Checkbox(label="长文本模式（按句切分并发合成后拼接）", value=False)
                             clone_btn = gr.Button("开始生成", variant="primary")
 
                         with gr.Column():
@@ -325,13 +610,14 @@ with gr.Blocks(title="数字人工具包") as demo:
                     )
                     with gr.Row():
                         response_format = gr.Dropdown(
-                            choices=["mp3", "opus", "wav", "pcm"],
-                            label="输出格式",
-                            value="wav"
+                            choices=["wav", "mp3", "opus", "pcm", "aac", "flac"],
+                            label="输出格式（可多选，只合成一次，其余格式本地转换）",
+                            multiselect=True,
+                            value=["wav"]
                         )
                         sample_rate = gr.Dropdown(
                             choices=[8000, 16000, 24000, 32000, 44100, 48000],
-                            info="opus: Supports 48000 Hz. wav, pcm: Supports 8000, 16000, 24000, 32000, 44100 Hz, with a default of 44100 Hz. mp3: Supports 32000, 44100 Hz, with a default of 44100 Hz.",
+                            info="远端按 WAV 合成（最高 44100 Hz），其余格式与采样率在本地转换；opus 不支持的采样率取最接近的可用值",
                             label="采样率",
                             value=44100
                         )
@@ -349,11 +635,123 @@ with gr.Blocks(title="数字人工具包") as demo:
                             step=1,
                             label="音量增益"
                         )
+                    use_cache = gr.Checkbox(label="使用合成缓存（相同文本与参数直接读取本地结果）", value=True)
+                    long_form = gr.Checkbox(label="长文本模式（按句切分并发合成后拼接）", value=False)
                     generate_btn = gr.Button("开始合成", variant="primary")
 
                 with gr.Column():
                     generate_status = gr.Textbox(label="处理状态")
+                    streaming_audio = gr.Audio(label="实时播放", streaming=True, autoplay=True)
                     generated_audio = gr.Audio(label="合成的音频")
+                    variant_files = gr.Files(label="多格式输出")
+
+        # 模型对比标签页
+        with gr.Tab("模型对比"):
+            gr.Markdown("### 模型对比\n\n* 同一段文本用所选的全部模型（及多个音色）并发合成，总耗时取决于最慢的模型\n* 结果并排展示，附各组合的耗时、首字节时间与音频时长")
+            with gr.Row():
+                with gr.Column():
+                    compare_text = gr.Textbox(
+                        label="输入文本",
+                        placeholder="请输入要对比的文本内容",
+                        lines=5
+                    )
+                    compare_models_select = gr.CheckboxGroup(
+                        choices=list(AVAILABLE_MODELS.keys()),
+                        label="选择模型",
+                        value=list(AVAILABLE_MODELS.keys())
+                    )
+                    compare_voice_select = gr.Dropdown(
+                        choices=built_in_voices,
+                        label="选择音色（可多选，克隆音色只能用于创建它的模型）",
+                        multiselect=True,
+                        value=[built_in_voices[0]]
+                    )
+                    with gr.Row():
+                        compare_sample_rate = gr.Dropdown(
+                            choices=[8000, 16000, 24000, 32000, 44100],
+                            label="采样率",
+                            value=24000
+                        )
+                        compare_speed = gr.Slider(
+                            minimum=0.25,
+                            maximum=4.0,
+                            value=1.0,
+                            step=0.1,
+                            label="语速"
+                        )
+                        compare_gain = gr.Slider(
+                            minimum=-20,
+                            maximum=20,
+                            value=0,
+                            step=1,
+                            label="音量增益"
+                        )
+                    compare_use_cache = gr.Checkbox(label="使用合成缓存（命中缓存时耗时不反映模型的真实延迟）", value=False)
+                    compare_btn = gr.Button("开始对比", variant="primary")
+
+                with gr.Column():
+                    compare_status = gr.Textbox(label="处理状态")
+                    compare_table = gr.Dataframe(
+                        headers=["模型", "音色", "状态", "耗时(秒)", "首字节(秒)", "音频时长(秒)"],
+                        label="对比结果",
+                        interactive=False
+                    )
+            compare_players = []
+            for _ in range(MAX_COMPARE_SLOTS // 3):
+                with gr.Row():
+                    for _ in range(3):
+                        compare_players.append(gr.Audio(visible=False))
+
+        # 视频配音标签页
+        with gr.Tab("视频配音"):
+            gr.Markdown("### 视频配音\n\n* 提取音频 → 转写 → 用克隆音色合成 → 合成进视频\n* 各阶段按片段流水线执行：合成第 N 段的同时转写第 N+1 段、提取第 N+2 段，总耗时接近最慢的阶段\n* 配音片段放在原片段的开始时间处，比原片段长时顺延")
+            with gr.Row():
+                with gr.Column():
+                    dub_video_input = gr.Video(label="上传视频文件")
+                    dub_model_select = gr.Dropdown(
+                        choices=list(AVAILABLE_MODELS.keys()),
+                        label="选择模型",
+                        interactive=True,
+                        value="CosyVoice2"
+                    )
+                    dub_voice_select = gr.Dropdown(
+                        choices=[],
+                        label="选择音色（从已上传的音色中选择）",
+                        interactive=True
+                    )
+                    with gr.Row():
+                        dub_segment_seconds = gr.Slider(
+                            minimum=5,
+                            maximum=60,
+                            value=20,
+                            step=1,
+                            label="片段时长（秒，在附近的静音处切分）"
+                        )
+                        dub_speed = gr.Slider(
+                            minimum=0.25,
+                            maximum=4.0,
+                            value=1.0,
+                            step=0.1,
+                            label="语速"
+                        )
+                        dub_gain = gr.Slider(
+                            minimum=-20,
+                            maximum=20,
+                            value=0,
+                            step=1,
+                            label="音量增益"
+                        )
+                    dub_use_cache = gr.Checkbox(label="使用转写与合成缓存", value=True)
+                    dub_btn = gr.Button("开始配音", variant="primary")
+
+                with gr.Column():
+                    dub_status = gr.Textbox(label="处理状态")
+                    dub_table = gr.Dataframe(
+                        headers=["片段", "开始(秒)", "结束(秒)", "状态", "文本"],
+                        label="片段进度",
+                        interactive=False
+                    )
+                    dub_output = gr.Video(label="配音后的视频")
 
     # 绑定事件
     def send_to_voice_clone(audio):
@@ -375,47 +773,101 @@ with gr.Blocks(title="数字人工具包") as demo:
     )
 
     # 定义刷新音色列表函数
-    def refresh_clone_voice_list():
-        return gr.Dropdown(choices=voice_generator.get_voice_list())
+    @traced()
+    async def refresh_clone_voice_list():
+        return gr.Dropdown(choices=await get_voice_generator().get_voice_list(refresh=True))
 
     # 定义删除并刷新音色的函数
-    def delete_and_refresh_voice(voice):
-        if not voice:
-            return "请选择要删除的音色！", gr.Dropdown(choices=voice_generator.get_voice_list())
-        status, _ = delete_voice(voice)
-        return status, gr.Dropdown(choices=voice_generator.get_voice_list())
+    @traced()
+    async def delete_and_refresh_voice(voices):
+        if not voices:
+            return "请选择要删除的音色！", gr.Dropdown(choices=await get_voice_generator().get_voice_list())
+        if isinstance(voices, str):
+            voices = [voices]
+        results = await get_voice_generator().delete_voices([voice.split(':', 1)[-1] for voice in voices])
+        failed = [result for result in results.values() if result != "success"]
+        status = f"已删除 {len(results) - len(failed)} 个音色"
+        if failed:
+            status += f"，{len(failed)} 个失败：{failed[0]}"
+        return status, gr.Dropdown(choices=await get_voice_generator().get_voice_list(), value=[])
+
+    # 定义批量上传音色功能
+    @traced()
+    async def bulk_upload_voices(files, folder, model_choice, concurrency=4):
+        from pipelines import aonboard_voices, collect_reference_clips
+
+        paths = list(files or [])
+        if folder:
+            if not os.path.isdir(folder):
+                yield f"目录不存在: {folder}", None, gr.Dropdown()
+                return
+            paths.append(folder)
+        clips = collect_reference_clips(paths)
+        if not clips:
+            yield "没有找到参考音频（支持 wav / mp3 / m4a / flac / ogg / opus / aac）", None, gr.Dropdown()
+            return
+
+        rows = [[os.path.basename(path), "", "等待中", "", ""] for path, _ in clips]
+        index = {path: i for i, (path, _) in enumerate(clips)}
+        yield f"共 {len(clips)} 个参考音频，处理中...", rows, gr.Dropdown()
+        counts = {"uploaded": 0, "skipped": 0, "error": 0}
+        results = aonboard_voices(
+            get_voice_clone(), get_transcriber(), get_voice_generator(), clips,
+            AVAILABLE_MODELS[model_choice], max_concurrency=int(concurrency)
+        )
+        async for result in results:
+            counts[result["status"]] += 1
+            status = {"uploaded": "已上传", "skipped": "已存在，跳过", "error": "失败"}[result["status"]]
+            rows[index[result["path"]]] = [
+                os.path.basename(result["path"]), result["voice_id"] or "", status,
+                result["uri"] or "", result["error"] or result["text"] or ""
+            ]
+            yield f"已处理 {sum(counts.values())}/{len(clips)}", rows, gr.Dropdown()
+        yield (
+            f"批量上传完成：上传 {counts['uploaded']} 个，跳过 {counts['skipped']} 个，失败 {counts['error']} 个",
+            rows,
+            gr.Dropdown(choices=await get_voice_generator().get_voice_list())
+        )
 
     # 定义上传音色功能
-    def upload_voice(audio_file, reference_text, model_choice, voice_id):
+    @traced()
+    async def upload_voice(audio_file, reference_text, model_choice, voice_id, transcode=True):
         if not audio_file or not reference_text:
-            return "请确保音频文件和参考文本都已填写", gr.Dropdown(choices=voice_generator.get_voice_list())
+            return "请确保音频文件和参考文本都已填写", gr.Dropdown(choices=await get_voice_generator().get_voice_list())
 
         # 验证voice_id
         is_valid, message = validate_voice_id(voice_id)
         if not is_valid:
-            return message, gr.Dropdown(choices=voice_generator.get_voice_list())
+            return message, gr.Dropdown(choices=await get_voice_generator().get_voice_list())
 
         try:
             # 上传参考音频
             model_id = AVAILABLE_MODELS[model_choice]
             print(f"上传语音文件: {audio_file}")
-            result = voice_clone.upload_voice_base64(
+            result = await get_voice_clone().upload_voice_stream(
                 audio_file,
                 voice_id,
                 model_id,
-                reference_text
+                reference_text,
+                transcode=transcode
             )
 
             if not result or 'uri' not in result:
-                return "上传音频失败", gr.Dropdown(choices=voice_generator.get_voice_list())
+                return "上传音频失败", gr.Dropdown(choices=await get_voice_generator().get_voice_list())
 
-            return "音色上传成功！", gr.Dropdown(choices=voice_generator.get_voice_list())
+            stats = result['upload_stats']
+            status = (
+                f"音色上传成功！传输 {stats['wire_bytes_after'] / 1024:.1f} KB"
+                f"（整份 base64 上传需 {stats['wire_bytes_before'] / 1024:.1f} KB）"
+            )
+            return status, gr.Dropdown(choices=await get_voice_generator().get_voice_list())
 
         except Exception as e:
-            return f"处理过程中出错: {str(e)}", gr.Dropdown(choices=voice_generator.get_voice_list())
+            return f"处理过程中出错: {str(e)}", gr.Dropdown(choices=await get_voice_generator().get_voice_list())
 
     # 定义克隆语音功能
-    def clone_voice(text, model_choice, voice, speed, gain):
+    @traced()
+    async def clone_voice(text, model_choice, voice, speed, gain, use_cache=True, long_form=False):
         if not text or not voice:
             return "请确保文本和音色都已填写", None
         
@@ -430,11 +882,15 @@ with gr.Blocks(title="数字人工具包") as demo:
             model_id = AVAILABLE_MODELS[model_choice]
             
             # 生成克隆语音
-            voice_clone.speech(
+            await get_voice_clone().speech(
                 text,
                 voice=voice_uri,
                 model_id=model_id,
-                speech_file_path=output_path
+                speech_file_path=output_path,
+                speed=speed,
+                gain=gain,
+                use_cache=use_cache,
+                long_form=long_form
             )
             
             return "语音生成成功！", output_path
@@ -444,10 +900,16 @@ with gr.Blocks(title="数字人工具包") as demo:
     # 绑定上传音色相关事件
     upload_btn.click(
         upload_voice,
-        inputs=[audio_input, reference_text, model_choice, voice_id],
+        inputs=[audio_input, reference_text, model_choice, voice_id, transcode_reference],
         outputs=[upload_status, voice_list]
     )
     
+    bulk_upload_btn.click(
+        bulk_upload_voices,
+        inputs=[bulk_files, bulk_folder, bulk_model_choice, bulk_concurrency],
+        outputs=[bulk_status, bulk_results, voice_list]
+    )
+
     refresh_clone_list_btn.click(
         refresh_clone_voice_list,
         outputs=[voice_list]
@@ -467,33 +929,98 @@ with gr.Blocks(title="数字人工具包") as demo:
     
     clone_btn.click(
         clone_voice,
-        inputs=[clone_text, clone_model_select, clone_voice_select, clone_speed_slider, clone_gain_slider],
+        inputs=[clone_text, clone_model_select, clone_voice_select, clone_speed_slider, clone_gain_slider, clone_use_cache, clone_long_form],
         outputs=[clone_status, cloned_audio]
     )
-    
-    transcribe_ref_btn.click(
-        transcribe_audio,
-        inputs=[audio_input],
-        outputs=[reference_text]
-    )
 
     transcribe_btn.click(
         transcribe_audio,
-        inputs=[audio_input_transcribe],
+        inputs=[audio_input_transcribe, long_audio],
         outputs=[transcription_output]
     )
 
     split_btn.click(
         split_video_audio,
-        inputs=[video_input, start_time, duration],
+        inputs=[video_input, start_time, duration, split_format],
         outputs=[split_status, output_audio_file]
     )
 
+    transcribe_video_btn.click(
+        transcribe_video,
+        inputs=[video_input, start_time, duration],
+        outputs=[video_transcription]
+    )
+
+    split_segments_btn.click(
+        split_video_segments,
+        inputs=[video_input, segment_ranges, segment_length, split_format],
+        outputs=[split_segments_status, segment_files]
+    )
+
     generate_btn.click(
         generate_speech,
-        inputs=[text_input, model_select, default_voice_select, speed_slider, gain_slider, response_format, sample_rate],
-        outputs=[generate_status, generated_audio]
+        inputs=[text_input, model_select, default_voice_select, speed_slider, gain_slider, response_format, sample_rate, use_cache, long_form],
+        outputs=[generate_status, streaming_audio, generated_audio, variant_files]
     )
 
+    compare_btn.click(
+        compare_models,
+        inputs=[compare_text, compare_models_select, compare_voice_select, compare_speed, compare_gain, compare_sample_rate, compare_use_cache],
+        outputs=[compare_status, compare_table, *compare_players]
+    )
+
+    dub_btn.click(
+        dub_video,
+        inputs=[dub_video_input, dub_voice_select, dub_model_select, dub_segment_seconds, dub_speed, dub_gain, dub_use_cache],
+        outputs=[dub_status, dub_table, dub_output]
+    )
+
+    # 页面加载后再获取音色列表
+    demo.load(
+        load_voice_lists,
+        outputs=[voice_list, clone_voice_select, compare_voice_select, dub_voice_select]
+    )
+
+# 启动耗时：导入模块与构建界面（不含 launch），用于发现启动性能回退
+STARTUP_SECONDS = time.perf_counter() - _startup_started
+print(f"启动耗时 {STARTUP_SECONDS:.2f} 秒（导入模块 {_imports_done - _startup_started:.2f} 秒，"
+      f"构建界面 {time.perf_counter() - _imports_done:.2f} 秒）")
+
+def register_routes(server_app):
+    """
+    在 FastAPI 应用上挂载额外接口：
+    /metrics 输出 Prometheus 格式的运行指标；/api/v1/* 为不经过 Gradio 队列的 HTTP 接口（见 http_api.py）
+    """
+    from fastapi.responses import Response
+    from http_api import create_router
+    from http_transport import get_transport
+    from metrics import PROMETHEUS_CONTENT_TYPE, get_metrics
+
+    def metrics_endpoint():
+        body = get_metrics().render() + get_transport().policy.render()
+        return Response(body, media_type=PROMETHEUS_CONTENT_TYPE)
+
+    server_app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
+    server_app.include_router(create_router(
+        get_voice_generator, get_voice_clone, get_transcriber, get_video_splitter, validate_voice_id
+    ))
+
+def create_app():
+    """
+    构建对外服务的 FastAPI 应用：先注册 /metrics 与 /api/v1/*，再将界面挂载在根路径，
+    接口在开始接受请求之前就已就绪。其他 ASGI 服务器可直接加载：uvicorn app:create_app --factory
+    """
+    from fastapi import FastAPI
+
+    server_app = FastAPI()
+    register_routes(server_app)
+    return gr.mount_gradio_app(server_app, demo, path="/")
+
 if __name__ == "__main__":
-    demo.launch(share=True)
+    import uvicorn
+
+    uvicorn.run(
+        create_app(),
+        host=os.getenv("GRADIO_SERVER_NAME", "127.0.0.1"),
+        port=int(os.getenv("GRADIO_SERVER_PORT", "7860"))
+    )
@@ -0,0 +1,535 @@
+"""
+asyncio 版本的 API 客户端：
+1. AsyncVoiceClone / AsyncAudioTranscriber / AsyncVoiceGenerator 与同步版本方法一致，均为协程
+2. 共享 http_transport 中按事件循环缓存的 httpx.AsyncClient，单个进程即可同时保持大量上游请求
+3. 复用同步版本的请求构建逻辑与语音合成缓存
+"""
+
+import asyncio
+import base64
+import json
+import os
+from typing import Optional
+
+from audio_chunking import (
+    DEFAULT_CHUNK_SECONDS, DEFAULT_MAX_WORKERS, DEFAULT_SAMPLE_RATE,
+    decode_pcm, merge_transcripts, split_pcm, to_wav_bytes
+)
+from audio_variants import derive_variants, master_sample_rate
+from long_form import DEFAULT_MAX_CHARS, DEFAULT_MAX_CONCURRENCY, WavConcatWriter, aiter_synthesized, concat_wav, split_text
+from metrics import track
+from tracing import accumulate, span as trace_span
+from reference_upload import prepare_upload
+from singleflight import AsyncSingleFlight
+from synthesis_cache import SynthesisCache
+from transcript_cache import TranscriptCache, bytes_digest, file_digest
+from voice2text import AudioTranscriber, multipart_envelope
+from voice_clone import VoiceClone
+from voice_generate import VoiceGenerator
+
+# 进程内相同音频的并发转写请求合并为一次
+_transcribe_flight = AsyncSingleFlight()
+READ_CHUNK_SIZE = 64 * 1024
+
+
+async def _aread_chunks(f):
+    """逐块读取已打开的文件，读盘在线程中执行，不阻塞事件循环"""
+    while chunk := await asyncio.to_thread(f.read, READ_CHUNK_SIZE):
+        yield chunk
+
+
+def _read_base64(path):
+    with open(path, "rb") as f:
+        return base64.b64encode(f.read()).decode('utf-8')
+
+
+class AsyncVoiceClone(VoiceClone):
+    """语音克隆类（asyncio 版本）"""
+
+    async def upload_voice(
+        self,
+        audio_path: str,
+        voice_id: str,
+        model_id: str,
+        text: str
+    ) -> Optional[dict]:
+        """使用multipart/form-data方式上传语音文件进行克隆"""
+        try:
+            if not os.path.exists(audio_path):
+                print(f"音频文件 {audio_path} 不存在")
+                return None
+
+            url = f"{self.base_url}/uploads/audio/voice"
+            headers = {
+                "Authorization": f"Bearer {self.api_key}"
+            }
+            data = {
+                "model": model_id,
+                "customName": voice_id,
+                "text": text
+            }
+            with open(audio_path, "rb") as audio_file, track("upload") as span:
+                files = {"file": audio_file}
+                span.sent(os.path.getsize(audio_path))
+                response = await self.transport.async_client().post(url, headers=headers, files=files, data=data)
+            response = response.json()
+            if 'uri' in response:
+                await self.registry.aadd(
+                    voice_id, response['uri'], model_id, await asyncio.to_thread(file_digest, audio_path)
+                )
+            return response
+
+        except Exception as e:
+            print(f"上传语音文件失败: {str(e)}")
+            return None
+
+    async def upload_voice_base64(
+        self,
+        audio_path: str,
+        voice_id: str,
+        model_id: str,
+        text: str
+    ) -> Optional[dict]:
+        """使用base64编码方式上传语音文件进行克隆"""
+        if not os.path.exists(audio_path):
+            print(f"音频文件 {audio_path} 不存在")
+            return None
+
+        # 读取整个文件并编码耗时与文件大小成正比，放到线程中执行
+        with trace_span("file_read_encode", bytes=os.path.getsize(audio_path)):
+            audio_base64 = await asyncio.to_thread(_read_base64, audio_path)
+
+        url = f"{self.base_url}/uploads/audio/voice"
+        headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        }
+        data = {
+            "model": model_id,
+            "customName": voice_id,
+            "audio": f"data:audio/mpeg;base64,{audio_base64}",
+            "text": text
+        }
+        # 整份编码结果再序列化为 JSON，大文件时同样耗时明显
+        with trace_span("json_encode"):
+            body = await asyncio.to_thread(json.dumps, data)
+        with track("upload") as span:
+            span.sent(len(body))
+            response = await self.transport.async_client().post(url, headers=headers, content=body)
+            response = response.json()
+            print(f"上传语音文件响应: {response}")
+            if 'code' in response:
+                raise Exception(response['message'])
+        if 'uri' in response:
+            await self.registry.aadd(
+                voice_id, response['uri'], model_id, await asyncio.to_thread(file_digest, audio_path)
+            )
+        return response
+
+    async def upload_voice_stream(
+        self,
+        audio_path: str,
+        voice_id: str,
+        model_id: str,
+        text: str,
+        transcode: bool = True
+    ) -> Optional[dict]:
+        """流式上传语音文件进行克隆，参数同 VoiceClone.upload_voice_stream"""
+        if not os.path.exists(audio_path):
+            print(f"音频文件 {audio_path} 不存在")
+            return None
+
+        # 转码是本地 ffmpeg 进程，放到线程中执行
+        body, stats, temp_path = await asyncio.to_thread(
+            prepare_upload, audio_path, model_id, voice_id, text, transcode
+        )
+        try:
+            url = f"{self.base_url}/uploads/audio/voice"
+            headers = {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+                "Content-Length": str(len(body))
+            }
+            with track("upload") as span:
+                span.sent(len(body))
+                response = await self.transport.async_client().post(url, headers=headers, content=body.aiter())
+                response = response.json()
+                print(f"上传语音文件响应: {response}，传输统计: {stats}")
+                if 'code' in response:
+                    raise Exception(response['message'])
+        finally:
+            if temp_path:
+                os.remove(temp_path)
+        if 'uri' in response:
+            await self.registry.aadd(
+                voice_id, response['uri'], model_id, await asyncio.to_thread(file_digest, audio_path)
+            )
+        response['upload_stats'] = stats
+        return response
+
+    async def _stream_speech(
+        self,
+        text: str,
+        voice: str,
+        model_id: str,
+        response_format: str,
+        speed: float,
+        gain: float,
+        sample_rate: Optional[int],
+        use_cache: bool
+    ):
+        """流式生成单段语音，命中缓存时直接读取本地文件"""
+        key = SynthesisCache.make_key(
+            text, model_id, voice, speed, gain, sample_rate, response_format, self.base_url
+        )
+        if use_cache:
+            cached = await asyncio.to_thread(self.cache.open, key)
+            if cached is not None:
+                with cached as f:
+                    async for chunk in _aread_chunks(f):
+                        yield chunk
+                return
+
+        client = self.transport.async_openai_client(self.api_key, self.base_url)
+        extra_body = {"gain": gain}
+        if sample_rate:
+            extra_body["sample_rate"] = sample_rate
+
+        with track("tts") as span:
+            async with client.audio.speech.with_streaming_response.create(
+                model=model_id,
+                voice=voice,
+                input=text,
+                speed=speed,
+                extra_body=extra_body,
+                response_format=response_format
+            ) as response:
+                with self.cache.writer(key) as cache_file, accumulate("disk_write", target="cache") as writes:
+                    async for chunk in response.iter_bytes():
+                        span.received(len(chunk))
+                        with writes:
+                            cache_file.write(chunk)
+                        yield chunk
+
+    def stream_speech(
+        self,
+        text: str,
+        voice: str,
+        model_id: str = "FunAudioLLM/CosyVoice2-0.5B",
+        response_format: str = "wav",
+        speed: float = 1.0,
+        gain: float = 0,
+        sample_rate: Optional[int] = None,
+        use_cache: bool = True
+    ):
+        """流式生成语音，按到达顺序逐块返回音频数据（不写文件），异步生成器"""
+        return self._stream_speech(text, voice, model_id, response_format, speed, gain, sample_rate, use_cache)
+
+    async def speech(
+        self,
+        text: str,
+        voice: str,
+        model_id: str = "FunAudioLLM/CosyVoice2-0.5B",
+        response_format: str = "wav",
+        speech_file_path: str = "speech.wav",
+        speed: float = 1.0,
+        gain: float = 0,
+        sample_rate: Optional[int] = None,
+        use_cache: bool = True,
+        long_form: bool = False,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY
+    ) -> None:
+        """生成语音，参数同 VoiceClone.speech"""
+        try:
+            if long_form:
+                if response_format != "wav":
+                    raise ValueError("长文本模式仅支持 wav 格式")
+
+                async def synthesize(segment):
+                    return b"".join([chunk async for chunk in self._stream_speech(
+                        segment, voice, model_id, response_format, speed, gain, sample_rate, use_cache
+                    )])
+
+                segments = split_text(text)
+                print(f"长文本切分为 {len(segments)} 个片段")
+                with open(speech_file_path, "wb") as f, accumulate("disk_write", target="output") as writes:
+                    writer = WavConcatWriter(f)
+                    async for wav in aiter_synthesized(segments, synthesize, max_concurrency):
+                        with writes:
+                            writer.append(wav)
+                    writer.close()
+                return None
+
+            with open(speech_file_path, "wb") as f, accumulate("disk_write", target="output") as writes:
+                async for chunk in self._stream_speech(
+                    text, voice, model_id, response_format, speed, gain, sample_rate, use_cache
+                ):
+                    with writes:
+                        f.write(chunk)
+
+        except Exception as e:
+            print(f"生成语音失败: {str(e)}")
+            return None
+
+
+class AsyncAudioTranscriber(AudioTranscriber):
+    """语音转写类（asyncio 版本）"""
+
+    async def _cached(self, key, coro_fn, use_cache=True):
+        """先查转写缓存，未命中时合并相同键的并发请求（含跨进程），结果写回缓存"""
+        if use_cache:
+            result = await asyncio.to_thread(self.cache.get, key)
+            if result is not None:
+                return result
+
+        async def load():
+            async with self.state.alock(f"transcribe:{key}"):
+                result = await asyncio.to_thread(self.cache.get, key) if use_cache else None
+                if result is None:
+                    result = await coro_fn()
+                    await asyncio.to_thread(self.cache.put, key, result)
+                return result
+
+        return await _transcribe_flight.do(key, load)
+
+    async def transcriptions(self, audio_file_path, use_cache=True):
+        """将音频文件转换为文字，参数与返回值同 AudioTranscriber.transcriptions"""
+        if not os.path.exists(audio_file_path):
+            raise FileNotFoundError(f"音频文件不存在: {audio_file_path}")
+
+        digest = await asyncio.to_thread(file_digest, audio_file_path)
+        key = TranscriptCache.make_key(digest, self.model, base_url=self.root_url)
+        return await self._cached(key, lambda: self._upload_file(audio_file_path), use_cache)
+
+    async def _upload_file(self, audio_file_path):
+        with open(audio_file_path, 'rb') as audio_file:
+            files = {
+                'file': ('audio.wav', audio_file, 'audio/wav'),
+                'model': (None, self.model)
+            }
+            try:
+                with track("transcription") as span:
+                    span.sent(os.path.getsize(audio_file_path))
+                    response = await self.transport.async_client().post(
+                        self.url,
+                        headers={"Authorization": f"Bearer {self.api_key}"},
+                        files=files
+                    )
+                    response.raise_for_status()
+                    span.received(len(response.content))
+                    return response.json()
+            except Exception as e:
+                raise Exception(f"API 请求失败: {str(e)}")
+
+    async def transcribe_bytes(self, audio_data, filename='audio.wav', content_type='audio/wav', use_cache=True):
+        """转写内存中的音频数据，参数同 AudioTranscriber.transcribe_bytes"""
+        key = TranscriptCache.make_key(bytes_digest(audio_data), self.model, base_url=self.root_url)
+        return await self._cached(
+            key, lambda: self._upload_bytes(audio_data, filename, content_type), use_cache
+        )
+
+    async def _upload_bytes(self, audio_data, filename, content_type):
+        files = {
+            'file': (filename, audio_data, content_type),
+            'model': (None, self.model)
+        }
+        try:
+            with track("transcription") as span:
+                span.sent(len(audio_data))
+                response = await self.transport.async_client().post(
+                    self.url,
+                    headers={"Authorization": f"Bearer {self.api_key}"},
+                    files=files
+                )
+                response.raise_for_status()
+                span.received(len(response.content))
+                return response.json()
+        except Exception as e:
+            raise Exception(f"API 请求失败: {str(e)}")
+
+    async def transcribe_stream(self, chunks, filename='audio.wav', content_type='audio/wav'):
+        """转写流式音频，chunks 为异步可迭代对象，其余参数同 AudioTranscriber.transcribe_stream"""
+        multipart_type, head, tail = multipart_envelope(self.model, filename, content_type)
+
+        try:
+            with track("transcription") as span:
+                async def body():
+                    yield head
+                    async for chunk in chunks:
+                        span.sent(len(chunk))
+                        yield chunk
+                    yield tail
+
+                response = await self.transport.async_client().post(
+                    self.url,
+                    headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": multipart_type},
+                    content=body()
+                )
+                response.raise_for_status()
+                span.received(len(response.content))
+                return response.json()
+        except Exception as e:
+            raise Exception(f"API 请求失败: {str(e)}")
+
+    async def transcriptions_long(self, audio_file_path, chunk_seconds=DEFAULT_CHUNK_SECONDS,
+                                  max_workers=DEFAULT_MAX_WORKERS, use_cache=True):
+        """长音频模式，参数与返回值同 AudioTranscriber.transcriptions_long"""
+        if not os.path.exists(audio_file_path):
+            raise FileNotFoundError(f"音频文件不存在: {audio_file_path}")
+
+        digest = await asyncio.to_thread(file_digest, audio_file_path)
+        key = TranscriptCache.make_key(digest, self.model, f"long:{chunk_seconds}", self.root_url)
+        return await self._cached(
+            key, lambda: self._transcribe_chunks(audio_file_path, chunk_seconds, max_workers), use_cache
+        )
+
+    async def _transcribe_chunks(self, audio_file_path, chunk_seconds, max_workers):
+        # 解码与切分是本地 CPU 工作，放到线程中执行以免阻塞事件循环
+        samples = await asyncio.to_thread(decode_pcm, audio_file_path, DEFAULT_SAMPLE_RATE)
+        chunks = await asyncio.to_thread(split_pcm, samples, DEFAULT_SAMPLE_RATE, chunk_seconds)
+        print(f"长音频切分为 {len(chunks)} 个片段")
+
+        semaphore = asyncio.Semaphore(max(1, max_workers))
+
+        async def transcribe(chunk):
+            start, end, chunk_samples = chunk
+            async with semaphore:
+                result = await self._upload_bytes(
+                    to_wav_bytes(chunk_samples, DEFAULT_SAMPLE_RATE), 'audio.wav', 'audio/wav'
+                )
+            return {"start": start, "end": end, "text": result.get('text', '')}
+
+        segments = await asyncio.gather(*[transcribe(chunk) for chunk in chunks])
+        return merge_transcripts(segments)
+
+
+class AsyncVoiceGenerator(VoiceGenerator):
+    """语音合成类（asyncio 版本）"""
+
+    async def _fetch_voice_list(self):
+        """从上游拉取语音列表"""
+        url = f"{self.base_url}/voice/list"
+        with track("voice_list") as span:
+            raw = await self.transport.async_client().get(url, headers=self.headers)
+            span.received(len(raw.content))
+            response = raw.json()
+        return [
+            {"customName": item['customName'], "uri": item['uri'], "model": item.get('model')}
+            for item in response['result']
+        ]
+
+    async def get_voice_list(self, refresh=False):
+        """获取语音列表，参数同 VoiceGenerator.get_voice_list"""
+        entries = await self.registry.aget(self._fetch_voice_list, refresh=refresh)
+        return [f"{item['customName']}:{item['uri']}" for item in entries]
+
+    async def get_voices(self, refresh=False):
+        """获取音色条目列表，同 VoiceGenerator.get_voices"""
+        return await self.registry.aget(self._fetch_voice_list, refresh=refresh)
+
+    async def find_voice(self, custom_name, refresh=False):
+        """按 customName 查找音色条目，不存在时返回 None"""
+        await self.registry.aget(self._fetch_voice_list, refresh=refresh)
+        return self.registry.lookup(custom_name)
+
+    async def delete_voice(self, uri):
+        """删除指定的语音"""
+        url = f"{self.base_url}/voice/deletions"
+        with track("voice_delete"):
+            response = await self.transport.async_client().post(url, headers=self.headers, json={"uri": uri})
+        if response.is_success:
+            await self.registry.aremove(uri)
+        return response.json()
+
+    async def delete_voices(self, uris, max_concurrency=4):
+        """并发删除多个音色，返回值同 VoiceGenerator.delete_voices"""
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def delete(uri):
+            async with semaphore:
+                try:
+                    return await self.delete_voice(uri)
+                except Exception as e:
+                    return {"message": str(e)}
+
+        uris = list(uris)
+        return dict(zip(uris, await asyncio.gather(*(delete(uri) for uri in uris))))
+
+    async def stream_speech(self, text, voice, model="FunAudioLLM/CosyVoice2-0.5B",
+                            speed=1, gain=0, sample_rate=24000, response_format="wav", use_cache=True):
+        """流式生成语音，参数同 VoiceGenerator.stream_speech"""
+        url = f"{self.base_url}/speech"
+        data = self._speech_payload(text, voice, model, speed, gain, sample_rate, response_format)
+        key = SynthesisCache.make_key(
+            text, model, data["voice"], speed, gain, sample_rate, data["response_format"], self.root_url
+        )
+        if use_cache:
+            cached = await asyncio.to_thread(self.cache.open, key)
+            if cached is not None:
+                with cached as f:
+                    async for chunk in _aread_chunks(f):
+                        yield chunk
+                return
+
+        print(f"生成语音请求数据：{data}")
+        with track("tts") as span:
+            async with self.transport.async_client().stream("POST", url, headers=self.headers, json=data) as response:
+                if response.status_code != 200:
+                    await response.aread()
+                    raise Exception(f"生成语音失败: {response.status_code} {response.text}")
+                with self.cache.writer(key) as cache_file, accumulate("disk_write", target="cache") as writes:
+                    async for chunk in response.aiter_bytes():
+                        if chunk:
+                            span.received(len(chunk))
+                            with writes:
+                                cache_file.write(chunk)
+                            yield chunk
+
+    async def stream_long_speech(self, text, voice, model="FunAudioLLM/CosyVoice2-0.5B",
+                                 speed=1, gain=0, sample_rate=24000, use_cache=True,
+                                 max_concurrency=DEFAULT_MAX_CONCURRENCY, max_chars=DEFAULT_MAX_CHARS):
+        """长文本模式，参数同 VoiceGenerator.stream_long_speech"""
+        async def synthesize(segment):
+            return await self.create_speech(
+                segment, voice, model=model, speed=speed, gain=gain,
+                sample_rate=sample_rate, response_format="wav", use_cache=use_cache
+            )
+
+        segments = split_text(text, max_chars)
+        print(f"长文本切分为 {len(segments)} 个片段")
+        async for wav in aiter_synthesized(segments, synthesize, max_concurrency):
+            yield wav
+
+    async def create_speech_to_file(self, text, voice, output_path, **kwargs):
+        """流式生成语音并边接收边写入文件，返回文件路径"""
+        with open(output_path, "wb") as f, accumulate("disk_write", target="output") as writes:
+            async for chunk in self.stream_speech(text, voice, **kwargs):
+                with writes:
+                    f.write(chunk)
+        return output_path
+
+    async def create_speech(self, text, voice, model="FunAudioLLM/CosyVoice2-0.5B",
+                            speed=1, gain=0, sample_rate=24000, response_format="wav", use_cache=True,
+                            long_form=False, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """生成语音，返回音频二进制数据"""
+        if long_form:
+            return concat_wav([wav async for wav in self.stream_long_speech(
+                text, voice, model=model, speed=speed, gain=gain, sample_rate=sample_rate,
+                use_cache=use_cache, max_concurrency=max_concurrency
+            )])
+        return b"".join([chunk async for chunk in self.stream_speech(
+            text, voice, model=model, speed=speed, gain=gain,
+            sample_rate=sample_rate, response_format=response_format, use_cache=use_cache
+        )])
+
+    async def create_speech_variants(self, text, voice, variants, output_dir, basename=None,
+                                     model="FunAudioLLM/CosyVoice2-0.5B", speed=1, gain=0, use_cache=True,
+                                     long_form=False, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """只做一次远端合成，在线程池中本地派生其余格式与采样率，返回 {"格式_采样率": 文件路径}"""
+        master = await self.create_speech(
+            text, voice, model=model, speed=speed, gain=gain, sample_rate=master_sample_rate(variants),
+            response_format="wav", use_cache=use_cache, long_form=long_form, max_concurrency=max_concurrency
+        )
+        return await asyncio.to_thread(
+            derive_variants, master, variants, output_dir, basename or f"speech_{os.urandom(4).hex()}"
+        )
@@ -0,0 +1,130 @@
+"""
+长音频切分：
+1. 使用 ffmpeg 将音频解码为单声道 16 bit PCM
+2. 用 NumPy 向量化计算帧能量，在每个目标切点附近选择最安静的位置作为切点
+3. 将切分后的片段封装为 WAV，供并行转写使用
+"""
+
+import os
+
+import numpy as np
+
+from audio_utils import build_wav_header
+
+DEFAULT_SAMPLE_RATE = 16000
+DEFAULT_CHUNK_SECONDS = float(os.getenv("TRANSCRIBE_CHUNK_SECONDS", "30"))
+DEFAULT_MAX_WORKERS = int(os.getenv("TRANSCRIBE_MAX_WORKERS", "4"))
+FRAME_MS = 20
+
+
+def decode_pcm(audio_path, sample_rate=DEFAULT_SAMPLE_RATE):
+    """
+    将音频文件解码为单声道 PCM
+
+    Returns:
+        np.ndarray: int16 采样数组
+    """
+    import ffmpeg
+
+    try:
+        out, _ = (
+            ffmpeg
+            .input(audio_path)
+            .output("pipe:", format="s16le", acodec="pcm_s16le", ac=1, ar=sample_rate)
+            .run(capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error as e:
+        raise Exception(f"解码音频失败: {e.stderr.decode(errors='ignore')}")
+    return np.frombuffer(out, dtype=np.int16)
+
+
+def frame_energy(samples, sample_rate, frame_ms=FRAME_MS):
+    """按帧计算 RMS 能量（dBFS）"""
+    frame_len = max(1, int(sample_rate * frame_ms / 1000))
+    n_frames = len(samples) // frame_len
+    if n_frames == 0:
+        return np.zeros(0), frame_len
+    frames = samples[:n_frames * frame_len].astype(np.float32).reshape(n_frames, frame_len)
+    rms = np.sqrt(np.mean(frames * frames, axis=1)) / 32768.0
+    return 20 * np.log10(np.maximum(rms, 1e-10)), frame_len
+
+
+def find_cut_points(samples, sample_rate, chunk_seconds=DEFAULT_CHUNK_SECONDS, search_seconds=None):
+    """
+    在每个目标切点附近寻找静音位置
+
+    Args:
+        samples (np.ndarray): PCM 采样
+        sample_rate (int): 采样率
+        chunk_seconds (float): 目标片段时长
+        search_seconds (float): 在目标切点前后搜索静音的范围，默认为片段时长的 1/4
+
+    Returns:
+        list[int]: 切点位置（采样下标），不含开头与结尾
+    """
+    energy, frame_len = frame_energy(samples, sample_rate)
+    if len(energy) == 0:
+        return []
+    # 平滑能量曲线，避免切在两个音节之间的短暂停顿
+    smoothed = np.convolve(energy, np.ones(5) / 5, mode="same")
+
+    frames_per_chunk = max(1, int(chunk_seconds * 1000 / FRAME_MS))
+    search = int((search_seconds if search_seconds is not None else chunk_seconds / 4) * 1000 / FRAME_MS)
+    cuts = []
+    last = 0
+    while len(energy) - last > frames_per_chunk + search:
+        target = last + frames_per_chunk
+        lo = max(last + 1, target - search)
+        hi = min(len(energy), target + search + 1)
+        cut = lo + int(np.argmin(smoothed[lo:hi]))
+        cuts.append(cut * frame_len)
+        last = cut
+    return cuts
+
+
+def split_pcm(samples, sample_rate, chunk_seconds=DEFAULT_CHUNK_SECONDS):
+    """
+    按静音切点切分 PCM
+
+    Returns:
+        list[tuple[float, float, np.ndarray]]: (开始秒数, 结束秒数, 采样) 列表
+    """
+    bounds = [0] + find_cut_points(samples, sample_rate, chunk_seconds) + [len(samples)]
+    return [
+        (start / sample_rate, end / sample_rate, samples[start:end])
+        for start, end in zip(bounds[:-1], bounds[1:])
+        if end > start
+    ]
+
+
+def to_wav_bytes(samples, sample_rate):
+    """将 int16 单声道采样封装为 WAV 字节"""
+    pcm = samples.astype(np.int16).tobytes()
+    return build_wav_header(len(pcm), sample_rate) + pcm
+
+
+def merge_transcripts(segments):
+    """
+    按时间顺序合并各片段的转写结果
+
+    Args:
+        segments (list[dict]): 含 start / end / text 的片段列表
+
+    Returns:
+        dict: {"text": 合并后的文本, "segments": 片段列表}
+    """
+    segments = sorted(segments, key=lambda item: item["start"])
+    text = ""
+    for item in segments:
+        piece = item["text"].strip()
+        # 英文片段之间补空格，中文直接拼接
+        if text and piece and text[-1].isascii() and piece[0].isascii():
+            text += " "
+        text += piece
+    return {"text": text, "segments": segments}
+
+
+def format_timestamp(seconds):
+    """秒数格式化为 HH:MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
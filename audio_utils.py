@@ -0,0 +1,110 @@
+"""
+音频数据处理工具：
+1. 解析流式 WAV 数据的头部
+2. 将流式 PCM 数据重新封装为可独立播放的 WAV 片段
+3. 从完整 WAV 数据中取出 PCM 数据，计算时长
+"""
+
+import struct
+
+
+def build_wav_header(data_size, sample_rate, channels=1, sample_width=2):
+    """构建 PCM WAV 文件头"""
+    byte_rate = sample_rate * channels * sample_width
+    block_align = channels * sample_width
+    return b"".join([
+        b"RIFF",
+        struct.pack("<I", 36 + data_size),
+        b"WAVE",
+        b"fmt ",
+        struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate, block_align, sample_width * 8),
+        b"data",
+        struct.pack("<I", data_size)
+    ])
+
+
+def parse_wav_header(data):
+    """
+    解析 WAV 文件头
+
+    Args:
+        data (bytes): 至少包含 data 块头部的 WAV 数据前缀
+
+    Returns:
+        tuple | None: (sample_rate, channels, sample_width, data_offset)，数据不足时返回 None
+    """
+    if len(data) < 12:
+        return None
+    if data[:4] != b"RIFF" or data[8:12] != b"WAVE":
+        raise ValueError("不是有效的 WAV 数据")
+    offset = 12
+    fmt = None
+    while offset + 8 <= len(data):
+        chunk_id = data[offset:offset + 4]
+        chunk_size = struct.unpack("<I", data[offset + 4:offset + 8])[0]
+        if chunk_id == b"data":
+            if fmt is None:
+                raise ValueError("WAV 数据缺少 fmt 块")
+            return fmt + (offset + 8,)
+        if offset + 8 + chunk_size > len(data):
+            return None
+        if chunk_id == b"fmt ":
+            _, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", data[offset + 8:offset + 24])
+            fmt = (sample_rate, channels, bits // 8)
+        offset += 8 + chunk_size + (chunk_size & 1)
+    return None
+
+
+def split_wav_pcm(wav):
+    """
+    拆分完整的 WAV 数据
+
+    Returns:
+        tuple: ((sample_rate, channels, sample_width), 按整帧截断的 PCM 字节)
+    """
+    sample_rate, channels, sample_width, data_offset = parse_wav_header(wav)
+    if wav[data_offset - 8:data_offset - 4] == b"data":
+        declared = struct.unpack("<I", wav[data_offset - 4:data_offset])[0]
+        # 流式返回的 WAV 头中 data 大小可能为 0 或 0xFFFFFFFF，此时以实际数据为准
+        if 0 < declared < len(wav) - data_offset:
+            wav = wav[:data_offset + declared]
+    pcm = wav[data_offset:]
+    frame_size = channels * sample_width
+    return (sample_rate, channels, sample_width), pcm[:len(pcm) - len(pcm) % frame_size]
+
+
+def wav_duration(wav):
+    """完整 WAV 数据的时长（秒）"""
+    (sample_rate, channels, sample_width), pcm = split_wav_pcm(wav)
+    return len(pcm) / (sample_rate * channels * sample_width)
+
+
+class WavStreamReframer:
+    """将流式 WAV 字节重新切分为独立可播放的 WAV 片段"""
+
+    def __init__(self):
+        self._buffer = b""
+        self.format = None
+
+    def feed(self, chunk):
+        """
+        输入一段流式数据
+
+        Returns:
+            bytes | None: 由已收到的完整采样帧组成的 WAV 片段，暂无完整帧时返回 None
+        """
+        self._buffer += chunk
+        if self.format is None:
+            header = parse_wav_header(self._buffer)
+            if header is None:
+                return None
+            sample_rate, channels, sample_width, data_offset = header
+            self.format = (sample_rate, channels, sample_width)
+            self._buffer = self._buffer[data_offset:]
+        sample_rate, channels, sample_width = self.format
+        frame_size = channels * sample_width
+        usable = len(self._buffer) - len(self._buffer) % frame_size
+        if usable == 0:
+            return None
+        pcm, self._buffer = self._buffer[:usable], self._buffer[usable:]
+        return build_wav_header(len(pcm), sample_rate, channels, sample_width) + pcm
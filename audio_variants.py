@@ -0,0 +1,170 @@
+"""
+多格式输出：
+1. 只做一次远端合成（WAV，取所需的最高采样率），其余格式与采样率在本地派生
+2. PCM / WAV 用 NumPy 向量化重采样与增益处理
+3. mp3 / opus 等压缩格式通过 ffmpeg 从 PCM 管道输入编码，多个格式并行编码
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audio_utils import build_wav_header, split_wav_pcm
+
+# 远端 wav 支持的最高采样率，更高的采样率在本地升采样
+MAX_REMOTE_SAMPLE_RATE = 44100
+# 压缩格式的 ffmpeg 编码参数：(容器, 编码器, 支持的采样率，None 表示不限)
+COMPRESSED_FORMATS = {
+    "mp3": ("mp3", "libmp3lame", (8000, 11025, 12000, 16000, 22050, 24000, 32000, 44100, 48000)),
+    "opus": ("ogg", "libopus", (8000, 12000, 16000, 24000, 48000)),
+    "aac": ("adts", "aac", None),
+    "flac": ("flac", "flac", None)
+}
+OUTPUT_FORMATS = ["wav", "pcm", *COMPRESSED_FORMATS]
+
+
+def master_sample_rate(variants):
+    """
+    一次远端合成所用的采样率：所需的最高采样率，但不超过远端支持的上限
+
+    Args:
+        variants (list[tuple[str, int]]): (格式, 采样率) 列表
+    """
+    return min(max(rate for _, rate in variants), MAX_REMOTE_SAMPLE_RATE)
+
+
+def supported_rate(output_format, sample_rate):
+    """压缩格式只支持部分采样率时，取不低于目标的最小可用值（没有时取最高值）"""
+    rates = COMPRESSED_FORMATS.get(output_format, (None, None, None))[2]
+    if not rates or sample_rate in rates:
+        return sample_rate
+    higher = [rate for rate in rates if rate >= sample_rate]
+    return min(higher) if higher else max(rates)
+
+
+def _lowpass_kernel(cutoff, taps=63):
+    """Hann 窗 sinc 低通滤波器，cutoff 为相对采样率的截止频率（0 ~ 0.5）"""
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hanning(taps)
+    return kernel / kernel.sum()
+
+
+def resample(samples, src_rate, dst_rate):
+    """
+    单声道重采样（float32 输入输出）：降采样先低通滤波防止混叠，再线性插值到目标采样点
+    """
+    if src_rate == dst_rate or len(samples) == 0:
+        return samples
+    if dst_rate < src_rate:
+        samples = np.convolve(samples, _lowpass_kernel(0.5 * dst_rate / src_rate), mode="same")
+    length = int(round(len(samples) * dst_rate / src_rate))
+    positions = np.arange(length) * (src_rate / dst_rate)
+    return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+
+
+def apply_gain(samples, gain_db):
+    """按分贝调整音量"""
+    if not gain_db:
+        return samples
+    return samples * np.float32(10 ** (gain_db / 20))
+
+
+def to_pcm16(samples):
+    """float32 采样转为 16 bit PCM 字节（溢出部分削波）"""
+    return np.clip(np.round(samples), -32768, 32767).astype("<i2").tobytes()
+
+
+def decode_wav(wav):
+    """
+    解析 WAV 数据
+
+    Returns:
+        tuple: (单声道 float32 采样, 采样率)
+    """
+    (sample_rate, channels, sample_width), pcm = split_wav_pcm(wav)
+    if sample_width != 2:
+        raise ValueError(f"仅支持 16 bit PCM WAV，当前为 {sample_width * 8} bit")
+    samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1)
+    return samples, sample_rate
+
+
+def encode_compressed(pcm, sample_rate, output_format, output_path):
+    """通过 ffmpeg 将 16 bit 单声道 PCM 编码为压缩格式"""
+    import ffmpeg
+
+    container, codec, _ = COMPRESSED_FORMATS[output_format]
+    try:
+        (
+            ffmpeg
+            .input("pipe:", format="s16le", ac=1, ar=sample_rate)
+            .output(output_path, format=container, acodec=codec)
+            .run(input=pcm, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+        )
+    except ffmpeg.Error as e:
+        raise Exception(f"{output_format} 编码失败: {e.stderr.decode(errors='ignore')}")
+    return output_path
+
+
+def variant_label(output_format, sample_rate):
+    """派生结果的键，如 mp3_44100"""
+    return f"{output_format}_{sample_rate}"
+
+
+def derive_variants(wav, variants, output_dir, basename, gain_db=0):
+    """
+    由一次合成得到的 WAV 派生多个格式 / 采样率的音频文件
+
+    Args:
+        wav (bytes): 远端合成的 WAV 数据
+        variants (list[tuple[str, int]]): (格式, 采样率) 列表，格式见 OUTPUT_FORMATS
+        output_dir (str): 输出目录
+        basename (str): 输出文件名前缀
+        gain_db (float): 额外在本地施加的增益（分贝）
+
+    Returns:
+        dict: {"格式_采样率": 文件路径}，顺序与 variants 一致
+    """
+    samples, source_rate = decode_wav(wav)
+    samples = apply_gain(samples, gain_db)
+    os.makedirs(output_dir, exist_ok=True)
+
+    resampled = {}
+
+    def pcm_at(rate):
+        # 相同采样率的多个格式共用一次重采样结果
+        if rate not in resampled:
+            resampled[rate] = to_pcm16(resample(samples, source_rate, rate))
+        return resampled[rate]
+
+    results = {}
+    encode_jobs = []
+    for output_format, sample_rate in variants:
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"不支持的输出格式: {output_format}")
+        sample_rate = supported_rate(output_format, int(sample_rate))
+        label = variant_label(output_format, sample_rate)
+        path = os.path.join(output_dir, f"{basename}_{sample_rate}.{output_format}")
+        pcm = pcm_at(sample_rate)
+        if output_format == "wav":
+            with open(path, "wb") as f:
+                f.write(build_wav_header(len(pcm), sample_rate) + pcm)
+        elif output_format == "pcm":
+            with open(path, "wb") as f:
+                f.write(pcm)
+        else:
+            encode_jobs.append((pcm, sample_rate, output_format, path))
+        results[label] = path
+
+    # 各压缩格式的 ffmpeg 编码互不依赖，并行执行
+    if encode_jobs:
+        with ThreadPoolExecutor(max_workers=len(encode_jobs)) as executor:
+            futures = [
+                executor.submit(encode_compressed, pcm, rate, fmt, path)
+                for pcm, rate, fmt, path in encode_jobs
+            ]
+            for future in futures:
+                future.result()
+    return results
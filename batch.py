@@ -0,0 +1,413 @@
+"""
+批量任务：
+1. 从 JSONL / CSV 清单读取任务（extract / transcribe / upload_voice / synthesize）
+2. 使用线程池并发执行，每个任务的结果单独记录
+3. 每完成一个任务即追加写入检查点文件，中断后重新运行会跳过已成功的任务
+4. 多个进程可以同时执行同一份清单（使用同一个检查点文件）：提交执行前在共享状态中认领任务，
+   认领为短租约，执行期间由后台线程续租；进程被强制结束后租约很快过期，重新运行即可接着执行。
+   其他进程正在执行的任务计为"其他进程执行中"，不计为成功
+
+清单每行一个任务，op 字段指定操作类型，id 字段可选（缺省为行号），其余字段为操作参数：
+
+    {"id": "a1", "op": "extract", "video_path": "a.mp4", "start_time": "00:00:10", "duration": "00:00:30"}
+    {"op": "transcribe", "audio_path": "a.mp3", "long": true}
+    {"op": "transcribe", "video_path": "a.mp4"}
+    {"op": "upload_voice", "audio_path": "ref.wav", "voice_id": "my-voice", "text": "参考音频文本"}
+    {"op": "synthesize", "text": "你好", "voice": "alex", "output_path": "outputs/hello.wav"}
+"""
+
+import csv
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
+
+from shared_state import get_shared_state, worker_name
+
+DEFAULT_OUTPUT_DIR = os.path.join("outputs", "batch")
+DEFAULT_MODEL = "FunAudioLLM/CosyVoice2-0.5B"
+OPERATIONS = ("extract", "transcribe", "upload_voice", "synthesize")
+# 任务认领的租约时长（秒）：执行期间每隔三分之一租约续租一次，进程异常退出后任务最迟在此时间后可被重新认领
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+# CSV 中需要转换类型的字段
+INT_FIELDS = ("sample_rate", "max_concurrency")
+FLOAT_FIELDS = ("speed", "gain")
+BOOL_FIELDS = ("long", "long_form", "transcode", "use_cache")
+
+
+def _parse_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y")
+
+
+def _normalize(job, line_no):
+    """去掉空值、转换字段类型并补全 id"""
+    job = {k: v for k, v in job.items() if k and v not in (None, "")}
+    for key in INT_FIELDS:
+        if key in job:
+            job[key] = int(job[key])
+    for key in FLOAT_FIELDS:
+        if key in job:
+            job[key] = float(job[key])
+    for key in BOOL_FIELDS:
+        if key in job:
+            job[key] = _parse_bool(job[key])
+    job["id"] = str(job.get("id", f"line-{line_no}"))
+    return job
+
+
+def read_manifest(path):
+    """
+    逐行读取任务清单（.csv 按表头解析，其他按 JSONL 解析）
+
+    Yields:
+        dict: 任务
+    """
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.lower().endswith(".csv"):
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                yield _normalize(row, line_no)
+            return
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                job = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"清单第 {line_no} 行不是合法的 JSON: {e}")
+            yield _normalize(job, line_no)
+
+
+def count_jobs(path):
+    """统计清单中的任务数（用于显示进度）"""
+    return sum(1 for _ in read_manifest(path))
+
+
+class Checkpoint:
+    """
+    检查点文件：JSONL，每行一个已完成任务的记录 {"id", "op", "status", "result" | "error"}
+
+    同一任务多次出现时以最后一条为准，因此失败任务重跑成功后会被覆盖。
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.records = {}
+        self._offset = 0
+        self.refresh()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8")
+
+    def refresh(self):
+        """读取上次读取之后追加的记录（包括其他进程写入的）"""
+        if not os.path.exists(self.path):
+            return
+        with self._lock:
+            with open(self.path, "rb") as f:
+                f.seek(self._offset)
+                data = f.read()
+            # 只处理完整的行，正在写入的最后一行留到下次读取
+            end = data.rfind(b"\n") + 1
+            for line in data[:end].splitlines():
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # 中断时可能留下写了一半的行
+                    continue
+                self.records[record["id"]] = record
+            self._offset += end
+
+    def done(self, job_id):
+        """任务是否已成功完成"""
+        record = self.records.get(job_id)
+        return record is not None and record["status"] == "ok"
+
+    def record(self, record):
+        """追加一条记录并立即落盘"""
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self.records[record["id"]] = record
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class JobLeases:
+    """
+    本进程持有的任务认领：后台线程定期续租，释放时只删除自己持有的认领
+
+    认领的值带有唯一标识，续租与释放都只在值未变（未被其他进程在过期后重新认领）时生效。
+    """
+
+    def __init__(self, state, lease=JOB_LEASE_SECONDS):
+        self.state = state
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._held = {}  # key -> 认领时写入的值
+        self._stop = threading.Event()
+        self._thread = None
+
+    def acquire(self, key, op):
+        """认领任务，已被其他进程认领时返回 False"""
+        value = {
+            "op": op, "status": "running", "worker": worker_name(),
+            "token": uuid.uuid4().hex, "started": time.time()
+        }
+        if not self.state.add("jobs", key, value, ttl=self.lease):
+            return False
+        with self._lock:
+            self._held[key] = value
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._heartbeat, name="job-lease", daemon=True)
+                self._thread.start()
+        return True
+
+    def release(self, key):
+        with self._lock:
+            value = self._held.pop(key, None)
+        if value is not None:
+            self.state.delete("jobs", key, expected=value)
+
+    def _heartbeat(self):
+        while not self._stop.wait(self.lease / 3):
+            with self._lock:
+                held = list(self._held.items())
+            for key, value in held:
+                try:
+                    renewed = self.state.renew("jobs", key, value, self.lease)
+                except Exception as e:
+                    print(f"任务 {key} 续租失败: {e}")
+                    continue
+                if not renewed:
+                    print(f"任务 {key} 的认领已过期，可能被其他进程重复执行")
+
+    def close(self):
+        """停止续租并释放仍持有的认领"""
+        self._stop.set()
+        with self._lock:
+            keys = list(self._held)
+        for key in keys:
+            self.release(key)
+
+
+class BatchRunner:
+    """按清单执行任务，操作委托给现有的客户端类"""
+
+    def __init__(self, api_key=None, output_dir=DEFAULT_OUTPUT_DIR, splitter=None,
+                 transcriber=None, voice_clone=None, voice_generator=None, state=None,
+                 lease=JOB_LEASE_SECONDS):
+        self.api_key = api_key
+        self.output_dir = output_dir
+        self.state = state or get_shared_state()
+        self.lease = lease
+        self._splitter = splitter
+        self._transcriber = transcriber
+        self._voice_clone = voice_clone
+        self._voice_generator = voice_generator
+        self._lock = threading.Lock()
+        os.makedirs(self.output_dir, exist_ok=True)
+
+    def _client(self, attr, factory):
+        """按需创建客户端，未用到的操作不要求配置 API Key"""
+        with self._lock:
+            if getattr(self, attr) is None:
+                if factory is not None and not self.api_key:
+                    raise ValueError("该操作需要设置 SILICONFLOW_API_KEY")
+                setattr(self, attr, factory(self.api_key) if factory else None)
+            return getattr(self, attr)
+
+    @property
+    def splitter(self):
+        from split_vedio2audio import VideoAudioSplitter
+
+        with self._lock:
+            if self._splitter is None:
+                self._splitter = VideoAudioSplitter()
+            return self._splitter
+
+    @property
+    def transcriber(self):
+        from voice2text import AudioTranscriber
+        return self._client("_transcriber", AudioTranscriber)
+
+    @property
+    def voice_clone(self):
+        from voice_clone import VoiceClone
+        return self._client("_voice_clone", VoiceClone)
+
+    @property
+    def voice_generator(self):
+        from voice_generate import VoiceGenerator
+        return self._client("_voice_generator", VoiceGenerator)
+
+    def run_job(self, job):
+        """
+        执行单个任务
+
+        Returns:
+            dict: 任务结果
+        """
+        op = job.get("op")
+        if op not in OPERATIONS:
+            raise ValueError(f"未知的操作类型: {op}（可选：{', '.join(OPERATIONS)}）")
+        return getattr(self, f"_run_{op}")(job)
+
+    def _run_extract(self, job):
+        result = self.splitter.extract_audio(
+            job["video_path"], job.get("start_time"), job.get("duration"), job.get("output_format", "mp3")
+        )
+        return {"path": result["path"], "method": result["method"], "codec": result["codec"]}
+
+    def _run_transcribe(self, job):
+        if "video_path" in job:
+            from pipelines import video_to_transcript
+
+            result = video_to_transcript(
+                self.splitter, self.transcriber, job["video_path"], job.get("start_time"), job.get("duration")
+            )
+        elif job.get("long"):
+            result = self.transcriber.transcriptions_long(job["audio_path"], use_cache=job.get("use_cache", True))
+        else:
+            result = self.transcriber.transcriptions(job["audio_path"], use_cache=job.get("use_cache", True))
+        text = result.get("text", "")
+        if "output_path" in job:
+            with open(job["output_path"], "w", encoding="utf-8") as f:
+                f.write(text)
+        return {"text": text, "output_path": job.get("output_path")}
+
+    def _run_upload_voice(self, job):
+        response = self.voice_clone.upload_voice_stream(
+            job["audio_path"], job["voice_id"], job.get("model", DEFAULT_MODEL),
+            job.get("text", ""), job.get("transcode", True)
+        )
+        if not response or "uri" not in response:
+            raise Exception(f"上传失败: {response}")
+        return {"uri": response["uri"], "upload_stats": response.get("upload_stats")}
+
+    def _run_synthesize(self, job):
+        response_format = job.get("response_format", "wav")
+        output_path = job.get("output_path") or os.path.join(self.output_dir, f"{job['id']}.{response_format}")
+        directory = os.path.dirname(output_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        kwargs = {
+            "model": job.get("model", DEFAULT_MODEL),
+            "speed": job.get("speed", 1),
+            "gain": job.get("gain", 0),
+            "sample_rate": job.get("sample_rate", 24000),
+            "response_format": response_format,
+            "use_cache": job.get("use_cache", True)
+        }
+        if job.get("long_form"):
+            audio = self.voice_generator.create_speech(job["text"], job["voice"], long_form=True, **kwargs)
+            with open(output_path, "wb") as f:
+                f.write(audio)
+        else:
+            self.voice_generator.create_speech_to_file(job["text"], job["voice"], output_path, **kwargs)
+        return {"path": output_path}
+
+    def run(self, jobs, checkpoint, workers=4, retry_failed=True, on_progress=None):
+        """
+        并发执行任务，已在检查点中成功的任务直接跳过，其他进程正在执行的任务不重复执行
+
+        Args:
+            jobs (Iterable[dict]): 任务
+            checkpoint (Checkpoint): 检查点
+            workers (int): 并发线程数
+            retry_failed (bool): 是否重跑检查点中记录为失败的任务
+            on_progress (callable): 每处理一个任务后以记录为参数回调（未执行的任务记录为 None）
+
+        Returns:
+            dict: {"ok", "error", "skipped" 检查点中已完成, "claimed" 其他进程执行中} 计数
+        """
+        counts = {"ok": 0, "error": 0, "skipped": 0, "claimed": 0}
+        # 使用同一检查点文件的进程属于同一次运行，共享任务认领
+        scope = hashlib.sha256(os.path.abspath(checkpoint.path).encode("utf-8")).hexdigest()[:16]
+        leases = JobLeases(self.state, self.lease)
+
+        def skip(job):
+            previous = checkpoint.records.get(job["id"])
+            return checkpoint.done(job["id"]) or (previous is not None and not retry_failed)
+
+        def claim(job):
+            """
+            在共享状态中认领任务，认领后重新读取检查点，确认其他进程没有刚刚完成它
+
+            Returns:
+                str: claimed 认领成功 / running 其他进程执行中 / done 已完成
+            """
+            key = f"{scope}:{job['id']}"
+            if not leases.acquire(key, job.get("op")):
+                return "running"
+            checkpoint.refresh()
+            if skip(job):
+                leases.release(key)
+                return "done"
+            return "claimed"
+
+        def execute(job):
+            try:
+                try:
+                    record = {"id": job["id"], "op": job.get("op"), "status": "ok", "result": self.run_job(job)}
+                except Exception as e:
+                    record = {"id": job["id"], "op": job.get("op"), "status": "error", "error": str(e)}
+                # 先写检查点再释放认领，其他进程认领后一定能读到这条记录
+                checkpoint.record(record)
+                return record
+            finally:
+                # 任务抛出 BaseException（如 KeyboardInterrupt）时同样释放认领
+                leases.release(f"{scope}:{job['id']}")
+
+        def collect(futures):
+            for future in futures:
+                record = future.result()
+                counts[record["status"]] += 1
+                if on_progress:
+                    on_progress(record)
+
+        def not_run(status):
+            counts[status] += 1
+            if on_progress:
+                on_progress(None)
+
+        try:
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                pending = {}
+                try:
+                    for job in jobs:
+                        if skip(job):
+                            not_run("skipped")
+                            continue
+                        # 限制排队中的任务数，清单很大时不必一次性读入内存；有空位后才认领，认领后立即提交
+                        if len(pending) >= workers * 2:
+                            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+                            for future in finished:
+                                del pending[future]
+                            collect(finished)
+                        outcome = claim(job)
+                        if outcome != "claimed":
+                            not_run("claimed" if outcome == "running" else "skipped")
+                            continue
+                        pending[executor.submit(execute, job)] = job
+                    collect(as_completed(pending))
+                except BaseException:
+                    # 中断（Ctrl-C）或任务抛出异常时取消尚未开始的任务并释放其认领，
+                    # 正在执行的任务结束后自行释放
+                    for future, job in pending.items():
+                        if future.cancel():
+                            leases.release(f"{scope}:{job['id']}")
+                    raise
+        finally:
+            leases.close()
+        return counts
@@ -0,0 +1,168 @@
+"""
+性能基准测试：
+1. 默认在本地启动模拟服务（mock_server），也可以指定任意兼容的 API 地址
+2. 对每个入口（音色列表、上传音色、语音合成、克隆语音合成、语音转写、ffmpeg 音频提取）
+   以指定并发执行固定次数，统计吞吐量与 p50 / p99 延迟
+3. 合成与转写绕过本地缓存，测量的是完整的请求路径
+
+    uv run python cli.py benchmark --requests 200 --concurrency 8
+"""
+
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audio_chunking import to_wav_bytes
+
+BENCH_TEXT = "数字人工具包基准测试。"
+BENCH_MODEL = "FunAudioLLM/CosyVoice2-0.5B"
+
+
+def percentile(values, pct):
+    """最近秩法求百分位数"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, int(round(pct / 100 * len(ordered) + 0.5)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def run_case(name, fn, requests, concurrency):
+    """
+    以指定并发执行 fn(i) 共 requests 次
+
+    Returns:
+        dict: {name, requests, errors, throughput, p50, p99, mean, first_error}
+    """
+    latencies = []
+    errors = []
+
+    def call(i):
+        started = time.perf_counter()
+        try:
+            fn(i)
+        except Exception as e:
+            errors.append(str(e))
+            return
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(call, range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        "name": name,
+        "requests": requests,
+        "errors": len(errors),
+        "throughput": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+        "first_error": errors[0] if errors else None
+    }
+
+
+def make_test_video(path, seconds=10):
+    """用 ffmpeg 生成带 AAC 音轨的测试视频"""
+    import ffmpeg
+
+    video = ffmpeg.input(f"testsrc=size=320x240:rate=25:duration={seconds}", f="lavfi")
+    audio = ffmpeg.input(f"sine=frequency=440:duration={seconds}", f="lavfi")
+    (
+        ffmpeg
+        .output(video, audio, path, vcodec="libx264", acodec="aac", shortest=None)
+        .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
+    )
+    return path
+
+
+def run_benchmarks(base_url, requests=50, concurrency=4, video_path=None, cases=None, api_key="benchmark"):
+    """
+    执行基准测试
+
+    Args:
+        base_url: API 根地址
+        requests: 每个入口的请求次数
+        concurrency: 并发数
+        video_path: ffmpeg 提取所用的视频，默认自动生成（需要 ffmpeg）
+        cases: 只运行指定名称的入口，默认全部
+        api_key: 请求使用的 API Key
+
+    Returns:
+        list[dict]: 各入口的统计结果
+    """
+    from split_vedio2audio import VideoAudioSplitter
+    from synthesis_cache import SynthesisCache
+    from transcript_cache import TranscriptCache
+    from voice2text import AudioTranscriber
+    from voice_clone import VoiceClone
+    from voice_generate import VoiceGenerator
+
+    work_dir = tempfile.mkdtemp(prefix="dh_bench_")
+    try:
+        # 独立的合成 / 转写缓存目录，避免污染正式缓存（use_cache=False 时结果仍会写回缓存）
+        cache = SynthesisCache(os.path.join(work_dir, "cache"))
+        generator = VoiceGenerator(api_key, cache=cache, base_url=base_url)
+        clone = VoiceClone(api_key, cache=cache, base_url=base_url)
+        transcriber = AudioTranscriber(
+            api_key, cache=TranscriptCache(os.path.join(work_dir, "transcripts")), base_url=base_url
+        )
+        splitter = VideoAudioSplitter()
+        splitter.output_dir = os.path.join(work_dir, "audio")
+        os.makedirs(splitter.output_dir, exist_ok=True)
+
+        reference_path = os.path.join(work_dir, "reference.wav")
+        wav = to_wav_bytes(np.zeros(16000 * 3, dtype=np.int16), 16000)
+        with open(reference_path, "wb") as f:
+            f.write(wav)
+
+        def clone_speech(i):
+            b"".join(clone._stream_speech(
+                f"{BENCH_TEXT}{i}", "alex", BENCH_MODEL, "wav", 1.0, 0, None, False
+            ))
+
+        def extract(i):
+            splitter.extract_audio(video_path, output_format="auto")
+
+        all_cases = [
+            ("voice_list", lambda i: generator.get_voice_list(refresh=True)),
+            ("upload_voice", lambda i: clone.upload_voice_stream(
+                reference_path, f"bench-{i}", BENCH_MODEL, BENCH_TEXT, transcode=False
+            )),
+            ("tts", lambda i: generator.create_speech(f"{BENCH_TEXT}{i}", "alex", use_cache=False)),
+            ("clone_tts", clone_speech),
+            ("transcription", lambda i: transcriber.transcribe_bytes(wav + str(i).encode(), use_cache=False)),
+            ("ffmpeg_extract", extract)
+        ]
+        if video_path is None and (cases is None or "ffmpeg_extract" in cases):
+            try:
+                video_path = make_test_video(os.path.join(work_dir, "bench.mp4"))
+            except Exception as e:
+                print(f"生成测试视频失败，跳过 ffmpeg_extract: {str(e)}")
+                all_cases = [case for case in all_cases if case[0] != "ffmpeg_extract"]
+
+        results = []
+        for name, fn in all_cases:
+            if cases and name not in cases:
+                continue
+            results.append(run_case(name, fn, requests, concurrency))
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def format_results(results):
+    """格式化为文本表格"""
+    lines = [f"{'入口':<16}{'请求':>8}{'错误':>8}{'吞吐(次/秒)':>14}{'p50(ms)':>10}{'p99(ms)':>10}{'平均(ms)':>10}"]
+    for item in results:
+        lines.append(
+            f"{item['name']:<16}{item['requests']:>8}{item['errors']:>8}{item['throughput']:>14.1f}"
+            f"{item['p50'] * 1000:>10.1f}{item['p99'] * 1000:>10.1f}{item['mean'] * 1000:>10.1f}"
+        )
+        if item["first_error"]:
+            lines.append(f"  首个错误: {item['first_error'][:200]}")
+    return "\n".join(lines)
@@ -0,0 +1,279 @@
+"""
+数字人工具包命令行入口：
+
+    uv run python cli.py extract-segments video.mp4 --range 00:00:10,00:00:05 --range 00:01:00,00:00:30
+    uv run python cli.py extract-segments video.mp4 --segment-length 30
+    uv run python cli.py transcribe-video video.mp4
+    uv run python cli.py run-manifest jobs.jsonl --workers 8
+    uv run python cli.py onboard-voices speakers/ --concurrency 8
+    uv run python cli.py dub-video video.mp4 --voice speech:my-voice:xxx
+    uv run python cli.py mock-server --port 8900 --latency 0.05
+    uv run python cli.py benchmark --requests 200 --concurrency 8
+"""
+
+import os
+
+import click
+from dotenv import load_dotenv
+
+from split_vedio2audio import VideoAudioSplitter, parse_ranges
+
+OUTPUT_FORMATS = ["auto", "mp3", "m4a", "wav", "flac", "ogg"]
+
+
+@click.group()
+def cli():
+    """数字人工具包命令行"""
+
+
+@cli.command("extract-segments")
+@click.argument("video_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--range", "ranges", multiple=True, help="时间段：开始时间,持续时间（HH:MM:SS,HH:MM:SS），可重复指定")
+@click.option("--ranges-file", type=click.File("r", encoding="utf-8"), help="时间段文件，每行一个“开始时间 持续时间”")
+@click.option("--segment-length", type=click.IntRange(min=1), help="按固定时长（秒）切分整段音频")
+@click.option("--format", "output_format", type=click.Choice(OUTPUT_FORMATS), default="auto", show_default=True, help="输出格式")
+def extract_segments(video_path, ranges, ranges_file, segment_length, output_format):
+    """在一次 ffmpeg 调用中从视频批量提取多段音频"""
+    parsed = parse_ranges("\n".join(ranges))
+    if ranges_file:
+        parsed += parse_ranges(ranges_file.read())
+    if not parsed and not segment_length:
+        raise click.UsageError("请通过 --range / --ranges-file 指定时间段，或通过 --segment-length 指定分段时长")
+    if parsed and segment_length:
+        raise click.UsageError("时间段与固定分段时长只能二选一")
+
+    result = VideoAudioSplitter().split_video_to_segments(
+        video_path, ranges=parsed or None, segment_length=segment_length, output_format=output_format
+    )
+    method = "流复制" if result["method"] == "copy" else "转码"
+    for path in result["paths"]:
+        click.echo(path)
+    click.echo(f"共 {len(result['paths'])} 段（{method}，耗时 {result['elapsed']:.2f} 秒）", err=True)
+
+
+@cli.command("transcribe-video")
+@click.argument("video_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--start-time", help="开始时间（HH:MM:SS），需与 --duration 同时指定")
+@click.option("--duration", help="持续时间（HH:MM:SS）")
+def transcribe_video(video_path, start_time, duration):
+    """将视频音轨经管道直接上传转写，不生成中间音频文件"""
+    from pipelines import video_to_transcript
+    from voice2text import AudioTranscriber
+
+    load_dotenv()
+    api_key = os.getenv("SILICONFLOW_API_KEY")
+    if not api_key:
+        raise click.UsageError("请设置环境变量 SILICONFLOW_API_KEY")
+    result = video_to_transcript(VideoAudioSplitter(), AudioTranscriber(api_key), video_path, start_time, duration)
+    click.echo(result.get("text", ""))
+
+
+@cli.command("run-manifest")
+@click.argument("manifest", type=click.Path(exists=True, dir_okay=False))
+@click.option("--workers", type=click.IntRange(min=1), default=4, show_default=True, help="并发任务数")
+@click.option("--output-dir", default=None, help="合成音频等输出的默认目录（默认 outputs/batch）")
+@click.option("--checkpoint", "checkpoint_path", default=None, help="检查点文件（默认为清单同名的 .checkpoint.jsonl）")
+@click.option("--retry-failed/--skip-failed", default=True, show_default=True, help="续跑时是否重试之前失败的任务")
+def run_manifest(manifest, workers, output_dir, checkpoint_path, retry_failed):
+    """按 JSONL / CSV 清单批量执行任务，中断后重新运行会从检查点继续"""
+    from batch import DEFAULT_OUTPUT_DIR, BatchRunner, Checkpoint, count_jobs, read_manifest
+
+    load_dotenv()
+    try:
+        total = count_jobs(manifest)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    checkpoint = Checkpoint(checkpoint_path or f"{os.path.splitext(manifest)[0]}.checkpoint.jsonl")
+    runner = BatchRunner(os.getenv("SILICONFLOW_API_KEY"), output_dir or DEFAULT_OUTPUT_DIR)
+
+    failures = []
+    try:
+        with click.progressbar(length=total, label="执行任务", show_pos=True, show_eta=True) as bar:
+            def on_progress(record):
+                if record and record["status"] == "error":
+                    failures.append(record)
+                bar.update(1)
+
+            counts = runner.run(read_manifest(manifest), checkpoint, workers, retry_failed, on_progress)
+    finally:
+        checkpoint.close()
+
+    for record in failures:
+        click.echo(f"[失败] {record['id']} ({record['op']}): {record['error']}", err=True)
+    click.echo(
+        f"成功 {counts['ok']}，失败 {counts['error']}，已完成跳过 {counts['skipped']}，"
+        f"其他进程执行中 {counts['claimed']}；结果见 {checkpoint.path}",
+        err=True
+    )
+    if counts["claimed"]:
+        click.echo("部分任务正由其他进程执行（或其进程刚退出、认领尚未过期），稍后重新运行以确认全部完成", err=True)
+    if counts["error"] or counts["claimed"]:
+        raise SystemExit(1)
+
+
+@cli.command("onboard-voices")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option("--model", default="FunAudioLLM/CosyVoice2-0.5B", show_default=True, help="模型 ID")
+@click.option("--concurrency", type=click.IntRange(min=1), default=4, show_default=True, help="同时处理的参考音频数")
+@click.option("--transcode/--no-transcode", default=True, show_default=True, help="上传前是否压缩参考音频")
+def onboard_voices(paths, model, concurrency, transcode):
+    """批量上传参考音频（目录或文件）为克隆音色，音色 ID 取自文件名，参考文本优先读取同名 .txt 文件"""
+    import asyncio
+
+    from async_clients import AsyncAudioTranscriber, AsyncVoiceClone, AsyncVoiceGenerator
+    from pipelines import aonboard_voices, collect_reference_clips
+
+    load_dotenv()
+    api_key = os.getenv("SILICONFLOW_API_KEY")
+    if not api_key:
+        raise click.UsageError("请设置环境变量 SILICONFLOW_API_KEY")
+    clips = collect_reference_clips(paths)
+    if not clips:
+        raise click.UsageError("没有找到参考音频")
+
+    async def run():
+        counts = {"uploaded": 0, "skipped": 0, "error": 0}
+        results = aonboard_voices(
+            AsyncVoiceClone(api_key), AsyncAudioTranscriber(api_key), AsyncVoiceGenerator(api_key),
+            clips, model, max_concurrency=concurrency, transcode=transcode
+        )
+        async for result in results:
+            counts[result["status"]] += 1
+            detail = result["error"] if result["status"] == "error" else result["uri"]
+            click.echo(f"[{result['status']}] {result['path']} -> {result['voice_id']}: {detail}")
+        return counts
+
+    counts = asyncio.run(run())
+    click.echo(f"上传 {counts['uploaded']}，跳过 {counts['skipped']}，失败 {counts['error']}", err=True)
+    if counts["error"]:
+        raise SystemExit(1)
+
+
+def _mock_options(command):
+    """模拟服务的行为参数（mock-server 与 benchmark 共用）"""
+    options = [
+        click.option("--latency", type=float, default=0.0, show_default=True, help="每个请求的固定延迟（秒）"),
+        click.option("--jitter", type=float, default=0.0, show_default=True, help="叠加的随机延迟上限（秒）"),
+        click.option("--chunk-size", type=click.IntRange(min=1), default=8192, show_default=True, help="流式语音分块大小（字节）"),
+        click.option("--chunk-interval", type=float, default=0.0, show_default=True, help="流式语音分块间隔（秒）"),
+        click.option("--error-rate", type=click.FloatRange(0, 1), default=0.0, show_default=True, help="返回 500 的比例"),
+        click.option("--throttle-rate", type=click.FloatRange(0, 1), default=0.0, show_default=True, help="返回 429 的比例"),
+        click.option("--slow-rate", type=click.FloatRange(0, 1), default=0.0, show_default=True, help="慢请求（长尾）的比例"),
+        click.option("--slow-latency", type=float, default=0.0, show_default=True, help="慢请求的额外延迟（秒）")
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+@cli.command("dub-video")
+@click.argument("video_path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--voice", required=True, help="音色 uri（或 \"模型:内置音色名\"）")
+@click.option("--model", default="FunAudioLLM/CosyVoice2-0.5B", show_default=True, help="合成模型 ID")
+@click.option("--output", "output_path", type=click.Path(dir_okay=False), help="输出视频路径，默认保存在 outputs/dubbed 下")
+@click.option("--segment-seconds", type=click.FloatRange(min=1), default=20, show_default=True, help="目标片段时长（秒）")
+@click.option("--speed", type=float, default=1.0, show_default=True, help="语速")
+@click.option("--gain", type=float, default=0, show_default=True, help="音量增益（dB）")
+def dub_video(video_path, voice, model, output_path, segment_seconds, speed, gain):
+    """视频配音：提取、转写、克隆语音合成按片段流水线执行，最后一次性合成视频"""
+    import asyncio
+
+    from async_clients import AsyncAudioTranscriber, AsyncVoiceClone
+    from pipelines import adub_video
+
+    load_dotenv()
+    api_key = os.getenv("SILICONFLOW_API_KEY")
+    if not api_key:
+        raise click.ClickException("未设置 SILICONFLOW_API_KEY")
+
+    async def run():
+        events = adub_video(
+            VideoAudioSplitter(), AsyncAudioTranscriber(api_key), AsyncVoiceClone(api_key), video_path, voice,
+            output_path, model=model, segment_seconds=segment_seconds, speed=speed, gain=gain
+        )
+        async for event in events:
+            if event["stage"] == "done":
+                return event
+            click.echo(f"[{event['stage']}] 片段 {event['index'] + 1}（{event['start']:.1f}s - {event['end']:.1f}s）", err=True)
+
+    result = asyncio.run(run())
+    stages = "，".join(f"{name} {seconds:.2f} 秒" for name, seconds in result["stage_seconds"].items())
+    click.echo(f"配音完成: {result['path']}（{result['segments']} 个片段，总耗时 {result['elapsed']:.2f} 秒；{stages}）")
+
+
+@cli.command("mock-server")
+@click.option("--host", default="127.0.0.1", show_default=True, help="监听地址")
+@click.option("--port", type=int, default=8900, show_default=True, help="监听端口")
+@click.option("--verbose", is_flag=True, help="打印访问日志")
+@_mock_options
+def mock_server(host, port, verbose, latency, jitter, chunk_size, chunk_interval, error_rate, throttle_rate,
+                slow_rate, slow_latency):
+    """启动本地 SiliconFlow 模拟服务（配合 SILICONFLOW_BASE_URL 使用）"""
+    from mock_server import MockConfig, MockSiliconFlowServer
+
+    config = MockConfig(
+        latency, jitter, chunk_size, chunk_interval, error_rate, throttle_rate,
+        slow_rate=slow_rate, slow_latency=slow_latency
+    )
+    server = MockSiliconFlowServer(host, port, config, verbose)
+    click.echo(f"模拟服务已启动: {server.url}（设置 SILICONFLOW_BASE_URL={server.url} 即可使用）", err=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+
+
+@cli.command("benchmark")
+@click.option("--base-url", default=None, help="API 根地址，默认在本地启动模拟服务")
+@click.option("--requests", "requests_count", type=click.IntRange(min=1), default=50, show_default=True, help="每个入口的请求次数")
+@click.option("--concurrency", type=click.IntRange(min=1), default=4, show_default=True, help="并发数")
+@click.option("--video", "video_path", type=click.Path(exists=True, dir_okay=False), help="ffmpeg 提取测试所用视频，默认自动生成")
+@click.option("--case", "cases", multiple=True, help="只运行指定入口（voice_list / upload_voice / tts / clone_tts / transcription / ffmpeg_extract），可重复")
+@click.option("--json", "as_json", is_flag=True, help="以 JSON 输出结果")
+@click.option("--hedge/--no-hedge", default=None, help="开启 / 关闭合成与音色列表的对冲请求（默认按 HTTP_HEDGE）")
+@_mock_options
+def benchmark(base_url, requests_count, concurrency, video_path, cases, as_json, hedge,
+              latency, jitter, chunk_size, chunk_interval, error_rate, throttle_rate, slow_rate, slow_latency):
+    """对各入口与 ffmpeg 提取路径做吞吐量与 p50 / p99 基准测试"""
+    import json
+
+    from benchmark import format_results, run_benchmarks
+    from http_transport import configure_transport, get_transport
+
+    if hedge is not None:
+        from request_policy import RequestPolicy
+
+        configure_transport(policy=RequestPolicy(hedge=hedge))
+
+    server = None
+    if base_url is None:
+        from mock_server import MockConfig, MockSiliconFlowServer
+
+        config = MockConfig(
+            latency, jitter, chunk_size, chunk_interval, error_rate, throttle_rate,
+            slow_rate=slow_rate, slow_latency=slow_latency
+        )
+        server = MockSiliconFlowServer(config=config).start()
+        base_url = server.url
+    try:
+        load_dotenv()
+        api_key = os.getenv("SILICONFLOW_API_KEY") if server is None else "benchmark"
+        results = run_benchmarks(base_url, requests_count, concurrency, video_path, cases or None, api_key or "")
+    finally:
+        if server:
+            server.stop()
+    if as_json:
+        click.echo(json.dumps(results, ensure_ascii=False, indent=2))
+    else:
+        click.echo(format_results(results))
+        for endpoint, item in sorted(get_transport().policy.stats().items()):
+            click.echo(
+                f"{endpoint}: 重试 {item['retries']} 次，对冲 {item['hedged']} 次（胜出 {item['hedge_wins']} 次），"
+                f"当前对冲延迟 {item['hedge_delay'] * 1000:.0f} ms"
+            )
+
+
+if __name__ == "__main__":
+    cli()
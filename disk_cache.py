@@ -0,0 +1,159 @@
+"""
+基于磁盘的 LRU 缓存基类（语音合成缓存与转写结果缓存共用）：
+1. 每个键对应缓存目录下的一个文件，先写临时文件再替换，不会读到半个文件
+2. 按总字节数限制容量，超出时按最近最少使用（LRU）淘汰；启动时按文件修改时间重建索引并清理中断遗留的临时文件
+3. 多个进程共用同一缓存目录时，其他进程写入的文件同样可以命中。容量上限按进程计算：每个进程只统计、
+   淘汰自己索引中的条目，共用目录的磁盘占用最多约为 进程数 × max_bytes。命中后文件被其他进程淘汰的按未命中处理
+
+子类只需指定文件后缀（suffix），并实现缓存键与内容的序列化。
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# 超过该时长（秒）未完成的临时文件视为中断遗留，启动时清理（较新的可能是其他进程正在写入的）
+STALE_TMP_SECONDS = 3600
+
+
+class DiskLRUCache:
+    """基于磁盘的 LRU 缓存"""
+
+    suffix = ".cache"
+
+    def __init__(self, cache_dir, max_bytes):
+        """
+        初始化缓存
+
+        Args:
+            cache_dir: 缓存目录
+            max_bytes: 缓存占用的最大字节数
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> 文件大小，按最近使用顺序排列
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}{self.suffix}")
+
+    def _load_index(self):
+        """从磁盘重建索引，按修改时间恢复 LRU 顺序"""
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".tmp"):
+                try:
+                    if time.time() - os.path.getmtime(path) > STALE_TMP_SECONDS:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+                continue
+            if not name.endswith(self.suffix):
+                continue
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, name[:-len(self.suffix)], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._entries[key] = size
+            self._size += size
+        self._evict()
+
+    def _evict(self):
+        while self._size > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._size -= size
+            self.evictions += 1
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                # 已被其他进程删除，或（Windows 下）正被其他进程读取
+                pass
+
+    def _adopt(self, key):
+        """索引中没有的键可能已由其他进程写入，找到时加入本进程索引"""
+        try:
+            size = os.path.getsize(self._path(key))
+        except FileNotFoundError:
+            return False
+        self._entries[key] = size
+        self._size += size
+        self._evict()
+        return key in self._entries
+
+    def lookup(self, key):
+        """
+        查询缓存并计入命中 / 未命中
+
+        Returns:
+            str | None: 命中时返回缓存文件路径
+        """
+        with self._lock:
+            if key not in self._entries and not self._adopt(key):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        path = self._path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self._discard(key)
+            return None
+        return path
+
+    def _discard(self, key):
+        """命中后文件已被其他进程淘汰（或内容无法读取）：改记为未命中并移出索引"""
+        with self._lock:
+            self.hits -= 1
+            self.misses += 1
+            self._size -= self._entries.pop(key, 0)
+
+    def _commit(self, key, tmp_path):
+        size = os.path.getsize(tmp_path)
+        with self._lock:
+            os.replace(tmp_path, self._path(key))
+            self._size -= self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._size += size
+            self._evict()
+
+    @contextmanager
+    def writer(self, key):
+        """
+        以写文件的方式写入缓存，正常退出时提交，出错或中断时丢弃
+
+        Yields:
+            file: 可写的二进制文件对象
+        """
+        tmp_path = f"{self._path(key)}.{os.urandom(4).hex()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                yield f
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._commit(key, tmp_path)
+
+    def stats(self):
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_bytes": self.max_bytes
+            }
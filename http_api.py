@@ -0,0 +1,252 @@
+"""
+轻量 HTTP 接口：与 Gradio 界面挂载在同一个应用上，供后端服务直接调用，
+不经过 Gradio 的队列与事件协议，音频以分块传输（chunked）的二进制流返回，合成未结束即可开始播放。
+
+    POST   /api/v1/synthesize      JSON {text, voice, model, speed, gain, sample_rate, response_format, use_cache, long_form}
+    POST   /api/v1/clone-speech    JSON {text, voice（克隆音色 uri）, model, speed, gain, sample_rate, response_format, use_cache}
+    POST   /api/v1/transcribe      multipart 的 file 字段（按内容命中转写缓存，long=true 时按长音频分段转写），
+                                   或请求体直接为音频数据（Content-Type 为 audio/*，边接收边转发上游）
+    POST   /api/v1/extract         multipart：file=视频, start_time, duration, output_format；
+                                   指定 sample_rate 时经 ffmpeg 管道直接流式返回该采样率的单声道 WAV
+    GET    /api/v1/voices          音色列表（refresh=true 强制刷新）
+    POST   /api/v1/voices          multipart：file=参考音频, voice_id, model, text，上传克隆音色
+    DELETE /api/v1/voices?uri=...  删除音色（可重复指定 uri 批量删除）
+
+    curl -N -X POST http://localhost:7860/api/v1/synthesize -H "Content-Type: application/json" \\
+         -d '{"text": "你好", "voice": "alex"}' -o hello.wav
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+from typing import List, Optional
+
+from fastapi import APIRouter, File, Form, HTTPException, Query, Request, UploadFile
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from audio_utils import build_wav_header, split_wav_pcm
+
+API_PREFIX = "/api/v1"
+DEFAULT_MODEL = "FunAudioLLM/CosyVoice2-0.5B"
+MEDIA_TYPES = {
+    "wav": "audio/wav",
+    "mp3": "audio/mpeg",
+    "opus": "audio/ogg",
+    "ogg": "audio/ogg",
+    "pcm": "application/octet-stream",
+    "aac": "audio/aac",
+    "m4a": "audio/mp4",
+    "flac": "audio/flac"
+}
+# 长度未知的流式 WAV 在头部使用的数据长度（按惯例取最大值）
+STREAMING_WAV_DATA_SIZE = 0xFFFFFFFF - 36
+
+
+class SynthesizeRequest(BaseModel):
+    text: str
+    voice: str
+    model: str = DEFAULT_MODEL
+    speed: float = 1.0
+    gain: float = 0
+    sample_rate: int = 24000
+    response_format: str = "wav"
+    use_cache: bool = True
+    long_form: bool = False
+
+
+class CloneSpeechRequest(BaseModel):
+    text: str
+    voice: str
+    model: str = DEFAULT_MODEL
+    speed: float = 1.0
+    gain: float = 0
+    sample_rate: Optional[int] = None
+    response_format: str = "wav"
+    use_cache: bool = True
+
+
+async def _stream_response(chunks, media_type, headers=None):
+    """
+    先取到第一块数据再返回响应：上游在开始传输之前失败时返回 502，而不是一个空的 200
+
+    之后的数据块按到达顺序分块返回；客户端断开时关闭 chunks，未完成的合成不会写入缓存。
+    """
+    try:
+        first = await anext(chunks)
+    except StopAsyncIteration:
+        first = b""
+    except Exception as e:
+        await chunks.aclose()
+        raise HTTPException(status_code=502, detail=str(e))
+
+    async def body():
+        try:
+            if first:
+                yield first
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await chunks.aclose()
+
+    return StreamingResponse(body(), media_type=media_type, headers=headers)
+
+
+async def _long_form_wav(segments):
+    """长文本模式：各段 WAV 去掉头部后拼接为一个流式 WAV（头部长度未知，使用占位值）"""
+    header_sent = False
+    async for wav in segments:
+        (sample_rate, channels, sample_width), pcm = split_wav_pcm(wav)
+        if not header_sent:
+            yield build_wav_header(STREAMING_WAV_DATA_SIZE, sample_rate, channels, sample_width)
+            header_sent = True
+        yield pcm
+
+
+async def _save_upload(upload):
+    """将上传的文件保存为临时文件（保留扩展名，ffmpeg 依赖它识别格式），返回路径"""
+    suffix = os.path.splitext(upload.filename or "")[1]
+    fd, path = tempfile.mkstemp(suffix=suffix, prefix="dh_api_")
+    with os.fdopen(fd, "wb") as f:
+        await asyncio.to_thread(shutil.copyfileobj, upload.file, f)
+    return path
+
+
+def create_router(get_voice_generator, get_voice_clone, get_transcriber, get_video_splitter,
+                  validate_voice_id=None):
+    """
+    创建接口路由，服务实例通过获取函数按需取得，与界面共用同一组客户端
+
+    Args:
+        get_voice_generator / get_voice_clone / get_transcriber / get_video_splitter: 返回服务实例的无参函数
+        validate_voice_id (callable): 校验克隆音色 ID，返回 (是否通过, 提示信息)
+    """
+    router = APIRouter(prefix=API_PREFIX)
+
+    @router.post("/synthesize")
+    async def synthesize(body: SynthesizeRequest):
+        generator = get_voice_generator()
+        if body.long_form:
+            segments = generator.stream_long_speech(
+                body.text, body.voice, model=body.model, speed=body.speed, gain=body.gain,
+                sample_rate=body.sample_rate, use_cache=body.use_cache
+            )
+            return await _stream_response(_long_form_wav(segments), MEDIA_TYPES["wav"])
+        chunks = generator.stream_speech(
+            body.text, body.voice, model=body.model, speed=body.speed, gain=body.gain,
+            sample_rate=body.sample_rate, response_format=body.response_format, use_cache=body.use_cache
+        )
+        return await _stream_response(chunks, MEDIA_TYPES.get(body.response_format, "application/octet-stream"))
+
+    @router.post("/clone-speech")
+    async def clone_speech(body: CloneSpeechRequest):
+        chunks = get_voice_clone().stream_speech(
+            body.text, body.voice, model_id=body.model, response_format=body.response_format,
+            speed=body.speed, gain=body.gain, sample_rate=body.sample_rate, use_cache=body.use_cache
+        )
+        return await _stream_response(chunks, MEDIA_TYPES.get(body.response_format, "application/octet-stream"))
+
+    @router.post("/transcribe")
+    async def transcribe(request: Request):
+        transcriber = get_transcriber()
+        content_type = request.headers.get("content-type", "")
+        try:
+            if content_type.startswith("multipart/form-data"):
+                form = await request.form()
+                upload = form.get("file")
+                if upload is None or isinstance(upload, str):
+                    raise HTTPException(status_code=400, detail="缺少 file 字段")
+                if str(form.get("long", "")).lower() in ("1", "true", "yes"):
+                    path = await _save_upload(upload)
+                    try:
+                        return await transcriber.transcriptions_long(path)
+                    finally:
+                        os.remove(path)
+                data = await upload.read()
+                return await transcriber.transcribe_bytes(
+                    data, upload.filename or "audio.wav", upload.content_type or "audio/wav"
+                )
+            if not content_type.startswith("audio/"):
+                raise HTTPException(status_code=415, detail="请以 multipart 的 file 字段或 audio/* 请求体上传音频")
+            # 请求体直接转发上游，不在本地缓冲整个文件
+            return await transcriber.transcribe_stream(
+                request.stream(), request.query_params.get("filename", "audio"), content_type
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=str(e))
+
+    @router.post("/extract")
+    async def extract(
+        file: UploadFile = File(...),
+        start_time: Optional[str] = Form(None),
+        duration: Optional[str] = Form(None),
+        output_format: str = Form("auto"),
+        sample_rate: Optional[int] = Form(None)
+    ):
+        splitter = get_video_splitter()
+        video_path = await _save_upload(file)
+        if sample_rate:
+            async def piped():
+                try:
+                    async for chunk in splitter.astream_audio(video_path, start_time, duration, sample_rate):
+                        yield chunk
+                finally:
+                    os.remove(video_path)
+
+            return await _stream_response(piped(), MEDIA_TYPES["wav"])
+        try:
+            result = await asyncio.to_thread(splitter.extract_audio, video_path, start_time, duration, output_format)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        finally:
+            os.remove(video_path)
+
+        async def read_file():
+            with open(result["path"], "rb") as f:
+                while chunk := await asyncio.to_thread(f.read, 64 * 1024):
+                    yield chunk
+
+        container = os.path.splitext(result["path"])[1].lstrip(".")
+        return await _stream_response(
+            read_file(), MEDIA_TYPES.get(container, "application/octet-stream"),
+            {"X-Extract-Method": result["method"], "X-Source-Codec": str(result["codec"])}
+        )
+
+    @router.get("/voices")
+    async def list_voices(refresh: bool = False):
+        try:
+            return {"voices": await get_voice_generator().get_voices(refresh=refresh)}
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=str(e))
+
+    @router.post("/voices")
+    async def upload_voice(
+        file: UploadFile = File(...),
+        voice_id: str = Form(...),
+        text: str = Form(...),
+        model: str = Form(DEFAULT_MODEL)
+    ):
+        if validate_voice_id is not None:
+            valid, message = validate_voice_id(voice_id)
+            if not valid:
+                raise HTTPException(status_code=400, detail=message)
+        path = await _save_upload(file)
+        try:
+            result = await get_voice_clone().upload_voice_stream(path, voice_id, model, text)
+        except Exception as e:
+            raise HTTPException(status_code=502, detail=str(e))
+        finally:
+            os.remove(path)
+        if not result or "uri" not in result:
+            raise HTTPException(status_code=502, detail=f"上传音色失败: {result}")
+        return {"uri": result["uri"], "upload_stats": result.get("upload_stats")}
+
+    @router.delete("/voices")
+    async def delete_voices(uri: List[str] = Query(...)):
+        """可重复指定 uri 批量删除"""
+        return {"results": await get_voice_generator().delete_voices(uri)}
+
+    return router
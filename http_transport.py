@@ -0,0 +1,423 @@
+"""
+共享 HTTP 传输层：
+1. VoiceClone / AudioTranscriber / VoiceGenerator 复用同一个带 keep-alive 连接池的 requests.Session
+2. OpenAI 客户端按 (api_key, base_url) 缓存，底层 httpx 连接池同样长期复用
+3. 为 asyncio 客户端按事件循环提供共享的 httpx.AsyncClient / AsyncOpenAI
+4. 统计连接复用次数与新建连接次数
+5. 所有出站请求先经过限流调度器（按接口的令牌桶排队，429 时按 Retry-After 等待后重发）
+6. API 根地址可通过 SILICONFLOW_BASE_URL 配置（如指向本地 mock 服务）
+7. 按请求策略（request_policy.py）为每个接口设置连接 / 读取超时，连接失败、超时与 5xx 时按幂等性重试，
+   短合成与音色列表请求可选对冲
+"""
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from rate_limiter import RateLimitScheduler, endpoint_of, estimate_tokens
+from request_policy import RequestPolicy
+
+# 连接池配置，可通过环境变量覆盖
+DEFAULT_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+DEFAULT_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))
+DEFAULT_BASE_URL = "https://api.siliconflow.cn/v1"
+# 可按请求策略重试的传输层异常；其中连接阶段的异常意味着请求尚未发出
+REQUESTS_ERRORS = (
+    requests.exceptions.ConnectionError, requests.exceptions.Timeout, requests.exceptions.ChunkedEncodingError
+)
+HTTPX_CONNECT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+def resolve_base_url(base_url=None):
+    """
+    得到 API 根地址：参数优先，其次环境变量 SILICONFLOW_BASE_URL，最后为官方地址
+
+    未带版本号的地址补上 /v1，如 http://127.0.0.1:8900 → http://127.0.0.1:8900/v1
+    """
+    base_url = (base_url or os.getenv("SILICONFLOW_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+    last = base_url.rsplit("/", 1)[-1]
+    if not (last.startswith("v") and last[1:].isdigit()):
+        base_url += "/v1"
+    return base_url
+
+
+def _httpx_replayable(request):
+    """请求体已完整在内存中时才能在 429 后原样重发"""
+    return isinstance(request.stream, httpx.ByteStream)
+
+
+def _httpx_tokens(request):
+    return estimate_tokens(request.content) if _httpx_replayable(request) else 0
+
+
+def _httpx_apply_timeout(request, policy, endpoint):
+    """按接口覆盖请求的超时（OpenAI 客户端默认的 600 秒、异步客户端的不限时都由策略取代）"""
+    connect, read = policy.timeout(endpoint)
+    request.extensions["timeout"] = {
+        **request.extensions.get("timeout", {}), "connect": connect, "read": read, "write": read
+    }
+
+
+def _requests_connect_failed(error):
+    """requests 的异常是否发生在连接建立之前（请求未发出，任何请求都可以安全重试）"""
+    if isinstance(error, requests.exceptions.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _rewind_files(kwargs):
+    """
+    将 requests 的请求体恢复到可重发状态
+
+    Returns:
+        bool: 请求体不可重发（如生成器、流式请求体）时返回 False
+    """
+    data = kwargs.get("data")
+    if data is not None and not isinstance(data, (str, bytes, dict, list, tuple)):
+        return False
+    for value in (kwargs.get("files") or {}).values():
+        content = value[1] if isinstance(value, tuple) else value
+        if isinstance(content, (str, bytes)) or content is None:
+            continue
+        if not hasattr(content, "seek"):
+            return False
+        content.seek(0)
+    return True
+
+
+class _CountingHTTPXTransport(httpx.HTTPTransport):
+    """通过 httpcore 的 trace 扩展统计 httpx 连接的新建与复用，请求经限流调度器发出并按请求策略重试"""
+
+    def __init__(self, counters, lock, scheduler, policy, **kwargs):
+        super().__init__(**kwargs)
+        self._counters = counters
+        self._lock = lock
+        self._scheduler = scheduler
+        self._policy = policy
+
+    def _trace(self, event_name, info):
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self._counters["new_connections"] += 1
+        elif event_name.endswith("send_request_headers.started"):
+            with self._lock:
+                self._counters["requests"] += 1
+
+    def handle_request(self, request):
+        request.extensions["trace"] = self._trace
+        endpoint = endpoint_of(request.url)
+        tokens = _httpx_tokens(request)
+        replayable = _httpx_replayable(request)
+        idempotent = self._policy.idempotent(request.method, endpoint)
+        hedge = replayable and self._policy.should_hedge(endpoint, tokens)
+        _httpx_apply_timeout(request, self._policy, endpoint)
+        send_request = super().handle_request
+
+        def send():
+            self._scheduler.acquire(endpoint, tokens)
+            started = time.monotonic()
+            response = send_request(request)
+            if response.status_code < 400:
+                self._policy.record_latency(endpoint, time.monotonic() - started)
+            return response
+
+        attempt = throttles = 0
+        while True:
+            try:
+                response = self._policy.hedge(endpoint, send, httpx.Response.close) if hedge else send()
+            except httpx.TransportError as e:
+                connect_failed = isinstance(e, HTTPX_CONNECT_ERRORS)
+                if not replayable or not self._policy.should_retry(attempt, idempotent, connect_failed):
+                    raise
+                time.sleep(self._policy.backoff(endpoint, attempt, type(e).__name__))
+                attempt += 1
+                continue
+            if response.status_code == 429:
+                if throttles >= self._scheduler.max_retries or not replayable:
+                    return response
+                self._scheduler.throttled(endpoint, response.headers.get("Retry-After"), throttles)
+                response.close()
+                throttles += 1
+                continue
+            if not replayable or not self._policy.should_retry(attempt, idempotent, status=response.status_code):
+                return response
+            response.close()
+            time.sleep(self._policy.backoff(endpoint, attempt, f"HTTP {response.status_code}"))
+            attempt += 1
+
+
+class _CountingAsyncHTTPXTransport(httpx.AsyncHTTPTransport):
+    """httpx 异步传输的连接统计，trace 回调需为协程"""
+
+    def __init__(self, counters, lock, scheduler, policy, **kwargs):
+        super().__init__(**kwargs)
+        self._counters = counters
+        self._lock = lock
+        self._scheduler = scheduler
+        self._policy = policy
+
+    async def _trace(self, event_name, info):
+        _CountingHTTPXTransport._trace(self, event_name, info)
+
+    async def handle_async_request(self, request):
+        request.extensions["trace"] = self._trace
+        endpoint = endpoint_of(request.url)
+        tokens = _httpx_tokens(request)
+        replayable = _httpx_replayable(request)
+        idempotent = self._policy.idempotent(request.method, endpoint)
+        hedge = replayable and self._policy.should_hedge(endpoint, tokens)
+        _httpx_apply_timeout(request, self._policy, endpoint)
+        send_request = super().handle_async_request
+
+        async def send():
+            await self._scheduler.acquire_async(endpoint, tokens)
+            started = time.monotonic()
+            response = await send_request(request)
+            if response.status_code < 400:
+                self._policy.record_latency(endpoint, time.monotonic() - started)
+            return response
+
+        attempt = throttles = 0
+        while True:
+            try:
+                response = await (
+                    self._policy.ahedge(endpoint, send, httpx.Response.aclose) if hedge else send()
+                )
+            except httpx.TransportError as e:
+                connect_failed = isinstance(e, HTTPX_CONNECT_ERRORS)
+                if not replayable or not self._policy.should_retry(attempt, idempotent, connect_failed):
+                    raise
+                await asyncio.sleep(self._policy.backoff(endpoint, attempt, type(e).__name__))
+                attempt += 1
+                continue
+            if response.status_code == 429:
+                if throttles >= self._scheduler.max_retries or not replayable:
+                    return response
+                self._scheduler.throttled(endpoint, response.headers.get("Retry-After"), throttles)
+                await response.aclose()
+                throttles += 1
+                continue
+            if not replayable or not self._policy.should_retry(attempt, idempotent, status=response.status_code):
+                return response
+            await response.aclose()
+            await asyncio.sleep(self._policy.backoff(endpoint, attempt, f"HTTP {response.status_code}"))
+            attempt += 1
+
+
+class HTTPTransport:
+    """线程安全的共享 HTTP 传输层"""
+
+    def __init__(self, pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                 scheduler=None, policy=None):
+        """
+        初始化传输层
+
+        Args:
+            pool_connections: 缓存的连接池数量（按 host 区分）
+            pool_maxsize: 每个连接池保持的最大连接数
+            scheduler: 限流调度器，默认按环境变量配置创建
+            policy: 超时 / 重试 / 对冲策略（RequestPolicy），默认按环境变量配置创建
+        """
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.scheduler = scheduler or RateLimitScheduler()
+        self.policy = policy or RequestPolicy()
+        self._lock = threading.Lock()
+        self._adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", self._adapter)
+        self.session.mount("http://", self._adapter)
+        self._openai_clients = {}
+        self._httpx_counters = {"requests": 0, "new_connections": 0}
+        self._httpx_client = None
+        # 异步客户端与事件循环绑定，按循环分别缓存
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._async_openai_clients = weakref.WeakKeyDictionary()
+
+    def request(self, method, url, **kwargs):
+        """
+        发送请求，复用连接池中的连接：先经限流调度器排队，429 时等待后重发；
+        未指定 timeout 时使用该接口的连接 / 读取超时，连接失败、超时与 5xx 按请求策略重试
+        """
+        endpoint = endpoint_of(url)
+        tokens = estimate_tokens(kwargs.get("json") or kwargs.get("data"))
+        kwargs.setdefault("timeout", self.policy.timeout(endpoint))
+        idempotent = self.policy.idempotent(method, endpoint)
+        # 对冲的两份请求并发发送，只用于请求体为 JSON 或为空的请求
+        hedge = not kwargs.get("files") and not kwargs.get("data") and self.policy.should_hedge(endpoint, tokens)
+
+        def send():
+            self.scheduler.acquire(endpoint, tokens)
+            started = time.monotonic()
+            response = self.session.request(method, url, **kwargs)
+            if response.status_code < 400:
+                self.policy.record_latency(endpoint, time.monotonic() - started)
+            return response
+
+        attempt = throttles = 0
+        while True:
+            try:
+                response = self.policy.hedge(endpoint, send, requests.Response.close) if hedge else send()
+            except REQUESTS_ERRORS as e:
+                if (not self.policy.should_retry(attempt, idempotent, _requests_connect_failed(e))
+                        or not _rewind_files(kwargs)):
+                    raise
+                time.sleep(self.policy.backoff(endpoint, attempt, type(e).__name__))
+                attempt += 1
+                continue
+            if response.status_code == 429:
+                if throttles >= self.scheduler.max_retries or not _rewind_files(kwargs):
+                    return response
+                self.scheduler.throttled(endpoint, response.headers.get("Retry-After"), throttles)
+                response.close()
+                throttles += 1
+                continue
+            if (not self.policy.should_retry(attempt, idempotent, status=response.status_code)
+                    or not _rewind_files(kwargs)):
+                return response
+            response.close()
+            time.sleep(self.policy.backoff(endpoint, attempt, f"HTTP {response.status_code}"))
+            attempt += 1
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def _get_httpx_client(self):
+        if self._httpx_client is None:
+            limits = httpx.Limits(
+                max_connections=self.pool_maxsize,
+                max_keepalive_connections=self.pool_maxsize
+            )
+            transport = _CountingHTTPXTransport(
+                self._httpx_counters, self._lock, self.scheduler, self.policy, limits=limits
+            )
+            self._httpx_client = httpx.Client(transport=transport, limits=limits)
+        return self._httpx_client
+
+    def openai_client(self, api_key, base_url):
+        """获取共享的 OpenAI 客户端（按 api_key 与 base_url 缓存）"""
+        key = (api_key, base_url)
+        with self._lock:
+            client = self._openai_clients.get(key)
+            if client is None:
+                from openai import OpenAI
+
+                # 重试由传输层按请求策略统一处理，避免与 OpenAI 客户端自带的重试叠加
+                client = OpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    http_client=self._get_httpx_client(),
+                    max_retries=0
+                )
+                self._openai_clients[key] = client
+            return client
+
+    def async_client(self):
+        """获取当前事件循环共享的 httpx.AsyncClient"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            client = self._async_clients.get(loop)
+            if client is None:
+                limits = httpx.Limits(
+                    max_connections=self.pool_maxsize,
+                    max_keepalive_connections=self.pool_maxsize
+                )
+                transport = _CountingAsyncHTTPXTransport(
+                    self._httpx_counters, self._lock, self.scheduler, self.policy, limits=limits
+                )
+                client = httpx.AsyncClient(transport=transport, limits=limits, timeout=None)
+                self._async_clients[loop] = client
+            return client
+
+    def async_openai_client(self, api_key, base_url):
+        """获取当前事件循环共享的 AsyncOpenAI 客户端"""
+        http_client = self.async_client()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            clients = self._async_openai_clients.setdefault(loop, {})
+            client = clients.get((api_key, base_url))
+            if client is None:
+                from openai import AsyncOpenAI
+
+                client = AsyncOpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    http_client=http_client,
+                    max_retries=0
+                )
+                clients[(api_key, base_url)] = client
+            return client
+
+    def stats(self):
+        """
+        连接统计
+
+        Returns:
+            dict: requests 总请求数、new_connections 新建连接数、reused_connections 复用连接数、
+                  rate_limit 各接口的排队与等待统计，request_policy 各接口的重试与对冲统计
+        """
+        total_requests = 0
+        new_connections = 0
+        pools = self._adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            total_requests += pool.num_requests
+            new_connections += pool.num_connections
+        with self._lock:
+            total_requests += self._httpx_counters["requests"]
+            new_connections += self._httpx_counters["new_connections"]
+        return {
+            "requests": total_requests,
+            "new_connections": new_connections,
+            "reused_connections": max(total_requests - new_connections, 0),
+            "pool_connections": self.pool_connections,
+            "pool_maxsize": self.pool_maxsize,
+            "rate_limit": self.scheduler.stats(),
+            "request_policy": self.policy.stats()
+        }
+
+    def close(self):
+        self.session.close()
+        if self._httpx_client is not None:
+            self._httpx_client.close()
+        self.policy.close()
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport():
+    """获取进程内共享的传输层实例"""
+    global _transport
+    with _transport_lock:
+        if _transport is None:
+            _transport = HTTPTransport()
+        return _transport
+
+
+def configure_transport(pool_connections=DEFAULT_POOL_CONNECTIONS, pool_maxsize=DEFAULT_POOL_MAXSIZE,
+                        scheduler=None, policy=None):
+    """按指定连接池大小、限流调度器与请求策略重建共享传输层（应在创建客户端之前调用）"""
+    global _transport
+    with _transport_lock:
+        if _transport is not None:
+            _transport.close()
+        _transport = HTTPTransport(pool_connections, pool_maxsize, scheduler, policy)
+        return _transport
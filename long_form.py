@@ -0,0 +1,182 @@
+"""
+长文本语音合成：
+1. 按中英文句末标点切分文本，合并为长度适中的片段
+2. 在并发上限内并行合成各片段，失败的片段单独重试
+3. 按原顺序将各片段 WAV 的 PCM 数据逐样本拼接为一个连续的 WAV
+"""
+
+import asyncio
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from audio_utils import build_wav_header, split_wav_pcm
+
+DEFAULT_MAX_CHARS = int(os.getenv("LONG_FORM_MAX_CHARS", "200"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("LONG_FORM_MAX_CONCURRENCY", "4"))
+DEFAULT_RETRIES = 2
+
+# 句末标点：中文句号/问号/感叹号/分号/省略号，英文 . ! ? ; 后接空白或结尾
+_SENTENCE_END = re.compile(r'(?<=[。！？；…])|(?<=[.!?;])(?=\s|$)')
+# 句内次级标点，用于切分超长句子
+_CLAUSE_END = re.compile(r'(?<=[，、：,:])')
+_WHITESPACE = re.compile(r'\s')
+
+
+def _hard_split(sentence, max_chars):
+    """超长句子先按逗号切分，仍超长时在 max_chars 之前的最后一个空白处断开，没有空白（如中文）时按字数截断"""
+    pieces = []
+    current = ""
+    for clause in _CLAUSE_END.split(sentence):
+        if len(current) + len(clause) <= max_chars:
+            current += clause
+            continue
+        if current:
+            pieces.append(current)
+        clause = clause.lstrip()
+        while len(clause) > max_chars:
+            cut = max((match.start() for match in _WHITESPACE.finditer(clause, 1, max_chars + 1)), default=0)
+            if cut == 0:
+                cut = max_chars
+            pieces.append(clause[:cut].rstrip())
+            clause = clause[cut:].lstrip()
+        current = clause
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_text(text, max_chars=DEFAULT_MAX_CHARS):
+    """
+    将长文本切分为适合单次合成的片段
+
+    Args:
+        text (str): 待合成的文本
+        max_chars (int): 单个片段的最大字符数
+
+    Returns:
+        list[str]: 按原顺序排列的文本片段
+    """
+    segments = []
+    current = ""
+    for sentence in _SENTENCE_END.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if len(sentence) > max_chars:
+            if current:
+                segments.append(current)
+                current = ""
+            segments.extend(_hard_split(sentence, max_chars))
+            continue
+        separator = " " if current and sentence[0].isascii() and current[-1].isascii() else ""
+        if len(current) + len(separator) + len(sentence) <= max_chars:
+            current += separator + sentence
+        else:
+            segments.append(current)
+            current = sentence
+    if current:
+        segments.append(current)
+    return segments
+
+
+def _with_retries(fn, segment, retries):
+    for attempt in range(retries + 1):
+        try:
+            return fn(segment)
+        except Exception as e:
+            if attempt == retries:
+                raise Exception(f"片段合成失败（已重试 {retries} 次）: {segment[:20]}... {str(e)}")
+            print(f"片段合成失败，第 {attempt + 1} 次重试: {str(e)}")
+            time.sleep(0.5 * 2 ** attempt)
+
+
+def iter_synthesized(segments, synthesize, max_concurrency=DEFAULT_MAX_CONCURRENCY, retries=DEFAULT_RETRIES):
+    """
+    并发合成各片段，并按原顺序依次返回结果
+
+    Args:
+        segments (list[str]): 文本片段
+        synthesize (callable): 合成单个片段的函数，返回 WAV 字节
+        max_concurrency (int): 最大并发数
+        retries (int): 单个片段失败后的重试次数
+
+    Yields:
+        bytes: 按顺序排列的各片段 WAV 数据
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_concurrency)) as executor:
+        futures = [executor.submit(_with_retries, synthesize, segment, retries) for segment in segments]
+        try:
+            for future in futures:
+                yield future.result()
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+async def _awith_retries(fn, segment, retries, semaphore):
+    for attempt in range(retries + 1):
+        try:
+            async with semaphore:
+                return await fn(segment)
+        except Exception as e:
+            if attempt == retries:
+                raise Exception(f"片段合成失败（已重试 {retries} 次）: {segment[:20]}... {str(e)}")
+            print(f"片段合成失败，第 {attempt + 1} 次重试: {str(e)}")
+            await asyncio.sleep(0.5 * 2 ** attempt)
+
+
+async def aiter_synthesized(segments, synthesize, max_concurrency=DEFAULT_MAX_CONCURRENCY, retries=DEFAULT_RETRIES):
+    """iter_synthesized 的 asyncio 版本，synthesize 为返回 WAV 字节的协程函数"""
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+    tasks = [asyncio.ensure_future(_awith_retries(synthesize, segment, retries, semaphore)) for segment in segments]
+    try:
+        for task in tasks:
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+class WavConcatWriter:
+    """将多个同格式 WAV 的 PCM 数据按顺序写入一个文件，结束时回填文件头"""
+
+    def __init__(self, f):
+        self._f = f
+        self.format = None
+        self.data_size = 0
+
+    def append(self, wav):
+        fmt, pcm = split_wav_pcm(wav)
+        if self.format is None:
+            self.format = fmt
+            self._f.write(build_wav_header(0, *fmt))
+        elif fmt != self.format:
+            raise ValueError(f"片段音频格式不一致: {fmt} != {self.format}")
+        self._f.write(pcm)
+        self.data_size += len(pcm)
+
+    def close(self):
+        if self.format is None:
+            return
+        self._f.seek(0)
+        self._f.write(build_wav_header(self.data_size, *self.format))
+        self._f.seek(0, os.SEEK_END)
+
+
+def concat_wav(wavs):
+    """按顺序逐样本拼接多个同格式 WAV，返回完整 WAV 字节"""
+    fmt = None
+    pcms = []
+    for wav in wavs:
+        wav_fmt, pcm = split_wav_pcm(wav)
+        if fmt is None:
+            fmt = wav_fmt
+        elif wav_fmt != fmt:
+            raise ValueError(f"片段音频格式不一致: {wav_fmt} != {fmt}")
+        pcms.append(pcm)
+    if fmt is None:
+        raise ValueError("没有可拼接的音频片段")
+    data = b"".join(pcms)
+    return build_wav_header(len(data), *fmt) + data
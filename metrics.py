@@ -0,0 +1,224 @@
+"""
+运行指标：
+1. 按操作（upload / transcription / tts / voice_list / ffmpeg_extract 等）统计请求数、错误数、
+   延迟直方图、首字节时间（TTFB）以及发送 / 接收的字节数
+2. 以 Prometheus 文本格式输出，供 /metrics 接口使用
+
+热路径上只有两次 perf_counter、一次加锁累加与一次 ContextVar 读取（处于请求 trace 内时另记录一个 span），
+不产生额外的 I/O。
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+from tracing import span as trace_span
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRIC_PREFIX = "digital_human"
+
+# 直方图分桶上界（秒）
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    """累计型直方图（非线程安全，由 OperationMetrics 的锁保护）"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        """按 Prometheus 约定返回 [(上界, 累计数)]，最后一项上界为 +Inf"""
+        result = []
+        total = 0
+        for bound, count in zip(list(self.buckets) + [float("inf")], self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+
+class OperationMetrics:
+    """单个操作的指标"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.latency = Histogram()
+        self.ttfb = Histogram()
+
+
+class Span:
+    """一次操作的计时与字节计数，结束时一次性写入指标"""
+
+    __slots__ = ("started", "ttfb", "bytes_sent", "bytes_received")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.ttfb = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+    def first_byte(self):
+        """记录首字节到达时间（只记录第一次）"""
+        if self.ttfb is None:
+            self.ttfb = time.perf_counter() - self.started
+
+    def sent(self, size):
+        self.bytes_sent += size
+
+    def received(self, size):
+        if self.ttfb is None:
+            self.first_byte()
+        self.bytes_received += size
+
+
+class MetricsRegistry:
+    """线程安全的指标注册表"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._operations = {}
+
+    def operation(self, name):
+        metrics = self._operations.get(name)
+        if metrics is None:
+            with self._lock:
+                metrics = self._operations.setdefault(name, OperationMetrics())
+        return metrics
+
+    def record(self, name, span, error=False):
+        """将一次操作的结果写入指标"""
+        elapsed = time.perf_counter() - span.started
+        metrics = self.operation(name)
+        with metrics.lock:
+            metrics.requests += 1
+            if error:
+                metrics.errors += 1
+            metrics.bytes_sent += span.bytes_sent
+            metrics.bytes_received += span.bytes_received
+            metrics.latency.observe(elapsed)
+            if span.ttfb is not None:
+                metrics.ttfb.observe(span.ttfb)
+
+    @contextmanager
+    def track(self, name):
+        """
+        统计一次操作：with track("tts") as span: ...
+
+        同样可以在协程 / 异步生成器中包住 await 使用。上下文内抛出异常计为错误；
+        生成器被提前关闭（GeneratorExit）不计为错误。处于请求 trace 内时同时记录一个同名 span。
+        """
+        with trace_span(name) as traced:
+            span = Span()
+            error = False
+            try:
+                yield span
+            except GeneratorExit:
+                raise
+            except BaseException:
+                error = True
+                raise
+            finally:
+                self.record(name, span, error)
+                if span.bytes_sent:
+                    traced.set(bytes_sent=span.bytes_sent)
+                if span.bytes_received:
+                    traced.set(bytes_received=span.bytes_received)
+                if span.ttfb is not None:
+                    traced.first_byte(span.ttfb)
+
+    def snapshot(self):
+        """
+        指标快照
+
+        Returns:
+            dict: {操作名: {requests, errors, bytes_sent, bytes_received, latency_sum, latency_count,
+                   ttfb_sum, ttfb_count}}
+        """
+        with self._lock:
+            operations = dict(self._operations)
+        result = {}
+        for name, metrics in operations.items():
+            with metrics.lock:
+                result[name] = {
+                    "requests": metrics.requests,
+                    "errors": metrics.errors,
+                    "bytes_sent": metrics.bytes_sent,
+                    "bytes_received": metrics.bytes_received,
+                    "latency_sum": metrics.latency.sum,
+                    "latency_count": metrics.latency.count,
+                    "ttfb_sum": metrics.ttfb.sum,
+                    "ttfb_count": metrics.ttfb.count
+                }
+        return result
+
+    def render(self):
+        """以 Prometheus 文本格式输出所有指标"""
+        with self._lock:
+            operations = sorted(self._operations.items())
+        counters = [
+            ("requests_total", "请求数", "requests"),
+            ("errors_total", "错误数", "errors"),
+            ("bytes_sent_total", "发送的字节数", "bytes_sent"),
+            ("bytes_received_total", "接收的字节数", "bytes_received")
+        ]
+        histograms = [
+            ("latency_seconds", "操作耗时", "latency"),
+            ("ttfb_seconds", "首字节时间", "ttfb")
+        ]
+        lines = []
+        values_by_op = []
+        for name, metrics in operations:
+            with metrics.lock:
+                values_by_op.append((name, {
+                    "requests": metrics.requests,
+                    "errors": metrics.errors,
+                    "bytes_sent": metrics.bytes_sent,
+                    "bytes_received": metrics.bytes_received,
+                    "latency": (metrics.latency.cumulative(), metrics.latency.sum, metrics.latency.count),
+                    "ttfb": (metrics.ttfb.cumulative(), metrics.ttfb.sum, metrics.ttfb.count)
+                }))
+        for suffix, help_text, field in counters:
+            metric = f"{METRIC_PREFIX}_{suffix}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for name, values in values_by_op:
+                lines.append(f'{metric}{{op="{name}"}} {values[field]}')
+        for suffix, help_text, field in histograms:
+            metric = f"{METRIC_PREFIX}_{suffix}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} histogram")
+            for name, values in values_by_op:
+                buckets, total, count = values[field]
+                for bound, cumulative in buckets:
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f'{metric}_bucket{{op="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'{metric}_sum{{op="{name}"}} {total}')
+                lines.append(f'{metric}_count{{op="{name}"}} {count}')
+        return "\n".join(lines) + "\n"
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics():
+    """获取进程内共享的指标注册表"""
+    return _registry
+
+
+def track(name):
+    """在共享注册表上统计一次操作"""
+    return _registry.track(name)
+
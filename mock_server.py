@@ -0,0 +1,242 @@
+"""
+本地 SiliconFlow 模拟服务，用于离线开发与性能测试（不消耗 API 额度，不受网络抖动影响）：
+1. 实现客户端用到的接口：/v1/uploads/audio/voice、/v1/audio/voice/list、/v1/audio/voice/deletions、
+   /v1/audio/speech（分块流式返回 WAV）、/v1/audio/transcriptions
+2. 可配置延迟（含随机抖动）、长尾慢请求、流式分块大小与间隔、错误率与限流（429）比例
+
+    uv run python cli.py mock-server --port 8900 --latency 0.05
+    SILICONFLOW_BASE_URL=http://127.0.0.1:8900 uv run python app.py
+"""
+
+import json
+import math
+import random
+import struct
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from audio_utils import build_wav_header
+
+# 合成语音的时长：每个字符约 0.2 秒
+SECONDS_PER_CHAR = 0.2
+
+
+def synth_wav(text, sample_rate=24000):
+    """生成与文本长度相称的正弦波 WAV"""
+    frames = max(1, int(len(text) * SECONDS_PER_CHAR * sample_rate))
+    period = sample_rate / 440.0
+    one_period = b"".join(
+        struct.pack("<h", int(8000 * math.sin(2 * math.pi * i / period))) for i in range(int(period))
+    )
+    pcm = (one_period * (frames // len(one_period) + 1))[:frames * 2]
+    return build_wav_header(len(pcm), sample_rate) + pcm
+
+
+class MockConfig:
+    """模拟服务的行为参数"""
+
+    def __init__(self, latency=0.0, jitter=0.0, chunk_size=8192, chunk_interval=0.0,
+                 error_rate=0.0, throttle_rate=0.0, retry_after=1, slow_rate=0.0, slow_latency=0.0):
+        """
+        Args:
+            latency: 每个请求返回首字节前的固定延迟（秒）
+            jitter: 在 latency 基础上叠加的随机延迟上限（秒）
+            chunk_size: /audio/speech 流式返回的分块大小（字节）
+            chunk_interval: 相邻分块之间的间隔（秒）
+            error_rate: 返回 500 的请求比例
+            throttle_rate: 返回 429 的请求比例
+            retry_after: 429 响应的 Retry-After（秒）
+            slow_rate: 额外延迟 slow_latency 秒的请求比例（模拟上游的慢副本，用于观察长尾延迟）
+            slow_latency: 慢请求的额外延迟（秒）
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.chunk_size = chunk_size
+        self.chunk_interval = chunk_interval
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.retry_after = retry_after
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "MockSiliconFlow/1.0"
+    # 响应头与响应体分两次写出，关闭 Nagle 算法避免与延迟确认叠加出额外的 40ms
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def handle(self):
+        # 客户端提前断开（如对冲请求中未被采用的一份）属于正常情况，不打印异常
+        try:
+            super().handle()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+
+    def _read_body(self):
+        if self.headers.get("Transfer-Encoding", "").lower() == "chunked":
+            body = bytearray()
+            while True:
+                size = int(self.rfile.readline().split(b";")[0].strip(), 16)
+                if size == 0:
+                    self.rfile.readline()
+                    break
+                body += self.rfile.read(size)
+                self.rfile.readline()
+            return bytes(body)
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _send_json(self, obj, status=200, headers=None):
+        body = json.dumps(obj, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _simulate(self):
+        """模拟延迟与故障，返回 True 表示已发送错误响应"""
+        config = self.server.config
+        delay = config.latency + random.uniform(0, config.jitter)
+        if config.slow_rate and random.random() < config.slow_rate:
+            delay += config.slow_latency
+        if delay > 0:
+            time.sleep(delay)
+        roll = random.random()
+        if roll < config.throttle_rate:
+            self._send_json(
+                {"code": 50603, "message": "rate limited (mock)"}, 429,
+                {"Retry-After": str(config.retry_after)}
+            )
+            return True
+        if roll < config.throttle_rate + config.error_rate:
+            self._send_json({"code": 50500, "message": "internal error (mock)"}, 500)
+            return True
+        return False
+
+    def do_GET(self):
+        path = self.path.split("?")[0].rstrip("/")
+        if path != "/v1/audio/voice/list":
+            return self._send_json({"message": f"not found: {path}"}, 404)
+        if self._simulate():
+            return
+        with self.server.lock:
+            voices = list(self.server.voices.values())
+        self._send_json({"result": voices})
+
+    def do_POST(self):
+        path = self.path.split("?")[0].rstrip("/")
+        body = self._read_body()
+        handler = {
+            "/v1/uploads/audio/voice": self._upload,
+            "/v1/audio/voice/deletions": self._delete,
+            "/v1/audio/speech": self._speech,
+            "/v1/audio/transcriptions": self._transcribe
+        }.get(path)
+        if handler is None:
+            return self._send_json({"message": f"not found: {path}"}, 404)
+        if self._simulate():
+            return
+        handler(body)
+
+    def _upload(self, body):
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            fields = json.loads(body)
+        else:
+            fields = {"model": "", "customName": ""}
+            for name in ("model", "customName"):
+                marker = f'name="{name}"\r\n\r\n'.encode("utf-8")
+                start = body.find(marker)
+                if start >= 0:
+                    start += len(marker)
+                    fields[name] = body[start:body.find(b"\r\n", start)].decode("utf-8")
+        uri = f"speech:{fields.get('customName', '')}:mock:{uuid.uuid4().hex[:12]}"
+        with self.server.lock:
+            self.server.voices[uri] = {
+                "model": fields.get("model", ""),
+                "customName": fields.get("customName", ""),
+                "text": fields.get("text", ""),
+                "uri": uri
+            }
+        self._send_json({"uri": uri})
+
+    def _delete(self, body):
+        uri = json.loads(body or b"{}").get("uri")
+        with self.server.lock:
+            self.server.voices.pop(uri, None)
+        self._send_json("success")
+
+    def _speech(self, body):
+        payload = json.loads(body or b"{}")
+        config = self.server.config
+        audio = synth_wav(payload.get("input", ""), int(payload.get("sample_rate") or 24000))
+        self.send_response(200)
+        self.send_header("Content-Type", "audio/wav")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for offset in range(0, len(audio), config.chunk_size):
+            chunk = audio[offset:offset + config.chunk_size]
+            self.wfile.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            self.wfile.flush()
+            if config.chunk_interval > 0:
+                time.sleep(config.chunk_interval)
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _transcribe(self, body):
+        self._send_json({"text": f"模拟转写结果（{len(body)} 字节）"})
+
+
+class MockSiliconFlowServer:
+    """在后台线程中运行的模拟服务"""
+
+    def __init__(self, host="127.0.0.1", port=0, config=None, verbose=False):
+        """
+        Args:
+            host: 监听地址
+            port: 监听端口，0 表示自动分配
+            config: MockConfig，默认无延迟、无错误
+            verbose: 是否打印访问日志
+        """
+        self._server = ThreadingHTTPServer((host, port), _Handler)
+        self._server.daemon_threads = True
+        self._server.config = config or MockConfig()
+        self._server.verbose = verbose
+        self._server.lock = threading.Lock()
+        self._server.voices = {}
+        self._thread = None
+
+    @property
+    def config(self):
+        return self._server.config
+
+    @property
+    def url(self):
+        """API 根地址（含 /v1），可直接作为客户端的 base_url"""
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
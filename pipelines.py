@@ -0,0 +1,354 @@
+"""
+多步骤处理流水线：
+1. 视频直接转写：ffmpeg 将音轨解码为 16 kHz 单声道 WAV 输出到管道，数据块边产生边上传转写，
+   全程不写临时文件，也不经过有损的 mp3 编码
+2. 多模型对比：同一段文本用多个模型（及多个音色）并发合成，总耗时取决于最慢的一个组合，
+   而不是各组合之和
+3. 批量上传音色：一批参考音频并发完成转写与上传，音色 ID 取自文件名，参考文本优先读取同名 .txt 文件；
+   同一模型下已上传过的参考音频（按内容哈希判断）直接跳过
+4. 视频配音：提取 → 转写 → 克隆语音合成三个阶段按片段流水线执行（片段 N 合成的同时转写 N+1、提取 N+2），
+   阶段之间以有界队列衔接，最后一次 ffmpeg 调用将新音轨合成进视频；总耗时接近最慢的阶段，而不是各阶段之和
+"""
+
+import asyncio
+import os
+import re
+import time
+
+import numpy as np
+
+from audio_chunking import DEFAULT_SAMPLE_RATE, find_cut_points, to_wav_bytes
+from audio_utils import WavStreamReframer, build_wav_header, split_wav_pcm, wav_duration
+from long_form import WavConcatWriter
+from tracing import accumulate, span as trace_span
+from transcript_cache import file_digest
+
+DUB_SEGMENT_SECONDS = float(os.getenv("DUB_SEGMENT_SECONDS", "20"))
+# 相邻阶段之间最多积压的片段数，限制内存占用，下游跟不上时上游暂停
+DUB_QUEUE_SIZE = 2
+
+REFERENCE_EXTENSIONS = (".wav", ".mp3", ".m4a", ".flac", ".ogg", ".opus", ".aac")
+
+
+def video_to_transcript(splitter, transcriber, video_path, start_time=None, duration=None):
+    """
+    视频直接转写
+
+    Args:
+        splitter (VideoAudioSplitter): 视频音频分离器
+        transcriber (AudioTranscriber): 语音转写客户端
+        video_path (str): 视频文件路径
+        start_time (str, optional): 开始时间（格式：HH:MM:SS）
+        duration (str, optional): 持续时间（格式：HH:MM:SS）
+
+    Returns:
+        dict: 转写 API 响应的结果
+    """
+    chunks = splitter.stream_audio(video_path, start_time, duration, sample_rate=DEFAULT_SAMPLE_RATE)
+    return transcriber.transcribe_stream(chunks, filename="audio.wav", content_type="audio/wav")
+
+
+async def avideo_to_transcript(splitter, transcriber, video_path, start_time=None, duration=None):
+    """video_to_transcript 的 asyncio 版本，transcriber 为 AsyncAudioTranscriber"""
+    chunks = splitter.astream_audio(video_path, start_time, duration, sample_rate=DEFAULT_SAMPLE_RATE)
+    return await transcriber.transcribe_stream(chunks, filename="audio.wav", content_type="audio/wav")
+
+
+async def acompare_speech(generator, text, models, voices, output_dir, speed=1, gain=0,
+                          sample_rate=24000, use_cache=True):
+    """
+    多模型对比：所有 (模型, 音色) 组合并发合成，按完成顺序逐个返回结果
+
+    Args:
+        generator (AsyncVoiceGenerator): 语音合成客户端
+        text (str): 合成文本
+        models (list[str]): 模型 ID 列表
+        voices (list[str]): 音色列表（内置音色名或 "名称:uri"）
+        output_dir (str): 输出目录
+        use_cache (bool): 是否读取合成缓存，对比延迟时应关闭
+
+    Yields:
+        dict: {index 组合序号（先按模型再按音色）, model, voice, path, latency 总耗时, ttfb 首字节时间,
+               duration 音频时长, error}，出错的组合 path 为 None 并记录 error
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    run_id = os.urandom(4).hex()
+    combos = [(model, voice) for model in models for voice in voices]
+
+    async def synthesize(index, model, voice):
+        label = re.sub(r"[^\w.-]+", "_", f"{model}_{voice.split(':', 1)[0]}")
+        path = os.path.join(output_dir, f"compare_{run_id}_{index}_{label}.wav")
+        result = {"index": index, "model": model, "voice": voice, "path": None,
+                  "latency": None, "ttfb": None, "duration": None, "error": None}
+        started = time.perf_counter()
+        try:
+            chunks = []
+            async for chunk in generator.stream_speech(
+                text, voice, model=model, speed=speed, gain=gain, sample_rate=sample_rate,
+                response_format="wav", use_cache=use_cache
+            ):
+                if result["ttfb"] is None:
+                    result["ttfb"] = time.perf_counter() - started
+                chunks.append(chunk)
+            result["latency"] = time.perf_counter() - started
+            wav = b"".join(chunks)
+            with trace_span("disk_write", target="output", bytes=len(wav)), open(path, "wb") as f:
+                f.write(wav)
+            result["path"] = path
+            result["duration"] = wav_duration(wav)
+        except Exception as e:
+            result["error"] = str(e)
+        return result
+
+    tasks = [asyncio.create_task(synthesize(i, model, voice)) for i, (model, voice) in enumerate(combos)]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def collect_reference_clips(paths):
+    """
+    整理批量上传的参考音频：paths 为目录或文件路径列表，文件名相同（不含扩展名）的 .txt 文件作为参考文本
+
+    Returns:
+        list[tuple[str, str | None]]: (音频路径, 参考文本文件路径) 列表，按文件名排序
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(os.path.join(path, name) for name in os.listdir(path))
+        else:
+            files.append(path)
+    # 按文件名配对：界面上传的文件各自位于不同的临时目录
+    def stem(path):
+        return os.path.splitext(os.path.basename(path))[0]
+
+    texts = {stem(path): path for path in files if path.lower().endswith(".txt")}
+    return sorted(
+        (path, texts.get(stem(path)))
+        for path in files if path.lower().endswith(REFERENCE_EXTENSIONS)
+    )
+
+
+def voice_id_from_path(path, digest):
+    """由文件名生成音色 ID（只保留字母、数字、下划线和连字符，不超过 64 个字符）"""
+    stem = re.sub(r"[^a-zA-Z0-9_-]+", "-", os.path.splitext(os.path.basename(path))[0]).strip("-")
+    return stem[:64] or f"voice-{digest[:8]}"
+
+
+async def aonboard_voices(voice_clone, transcriber, generator, clips, model, max_concurrency=4, transcode=True):
+    """
+    批量上传音色：各参考音频并发转写并上传，按完成顺序逐个返回结果
+
+    Args:
+        voice_clone (AsyncVoiceClone): 语音克隆客户端
+        transcriber (AsyncAudioTranscriber): 语音转写客户端（没有参考文本文件时使用）
+        generator (AsyncVoiceGenerator): 语音合成客户端，用于获取已有音色判断是否重复上传
+        clips (list[tuple[str, str | None]]): collect_reference_clips 的返回值
+        model (str): 模型 ID
+        max_concurrency (int): 同时处理的参考音频数
+
+    Yields:
+        dict: {path, voice_id, status（uploaded / skipped / error）, uri, text, error}
+    """
+    await generator.get_voices()
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def onboard(audio_path, text_path):
+        result = {"path": audio_path, "voice_id": None, "status": "error", "uri": None, "text": None, "error": None}
+        async with semaphore:
+            try:
+                digest = await asyncio.to_thread(file_digest, audio_path)
+                result["voice_id"] = voice_id_from_path(audio_path, digest)
+                existing = generator.registry.find_reference(model, digest)
+                if existing:
+                    result.update(status="skipped", uri=existing["uri"], voice_id=existing["customName"])
+                    return result
+                if text_path:
+                    with open(text_path, "r", encoding="utf-8") as f:
+                        text = f.read().strip()
+                else:
+                    text = (await transcriber.transcriptions(audio_path)).get("text", "").strip()
+                if not text:
+                    raise ValueError("参考文本为空")
+                result["text"] = text
+                response = await voice_clone.upload_voice_stream(
+                    audio_path, result["voice_id"], model, text, transcode=transcode
+                )
+                if not response or "uri" not in response:
+                    raise Exception(f"上传失败: {response}")
+                result.update(status="uploaded", uri=response["uri"])
+            except Exception as e:
+                result["error"] = str(e)
+        return result
+
+    tasks = [asyncio.create_task(onboard(audio_path, text_path)) for audio_path, text_path in clips]
+    try:
+        for task in asyncio.as_completed(tasks):
+            yield await task
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def _silence_wav(seconds, sample_rate):
+    """指定时长的静音（16 bit 单声道 WAV）"""
+    pcm = bytes(int(seconds * sample_rate) * 2)
+    return build_wav_header(len(pcm), sample_rate) + pcm
+
+
+async def adub_video(splitter, transcriber, voice_clone, video_path, voice, output_path=None,
+                     model="FunAudioLLM/CosyVoice2-0.5B", segment_seconds=DUB_SEGMENT_SECONDS,
+                     speed=1.0, gain=0, sample_rate=24000, use_cache=True, queue_size=DUB_QUEUE_SIZE):
+    """
+    视频配音：按片段流水线执行 提取 → 转写 → 克隆语音合成，最后将新音轨合成进视频
+
+    提取阶段只启动一个 ffmpeg 进程，边解码边在目标时长附近的静音处切出片段；每个合成的片段放在原片段的
+    开始时间处，比原片段长时顺延（后续片段相应推迟），空白处补静音。
+
+    Args:
+        splitter (VideoAudioSplitter): 视频音频分离器
+        transcriber (AsyncAudioTranscriber): 语音转写客户端
+        voice_clone (AsyncVoiceClone): 语音克隆客户端
+        video_path (str): 视频文件路径
+        voice (str): 音色 uri（或 "模型:内置音色名"）
+        output_path (str, optional): 输出视频路径，默认保存在 outputs/dubbed 下
+        model (str): 合成模型 ID
+        segment_seconds (float): 目标片段时长（秒）
+        sample_rate (int): 合成音轨的采样率
+        queue_size (int): 相邻阶段之间最多积压的片段数
+
+    Yields:
+        dict: 各阶段的进度 {stage（extract / transcribe / synthesize）, index, start, end, text, delay 顺延秒数}，
+              最后一项为 {stage: "done", path 输出视频, audio_path 新音轨, segments 片段数, elapsed 总耗时,
+              stage_seconds 各阶段的工作耗时, max_delay 最大顺延秒数}
+    """
+    started = time.perf_counter()
+    base = f"{os.path.splitext(os.path.basename(video_path))[0]}_{os.urandom(4).hex()}"
+    os.makedirs("outputs/dubbed", exist_ok=True)
+    audio_path = os.path.join("outputs/dubbed", f"{base}.wav")
+    if output_path is None:
+        output_path = os.path.join("outputs/dubbed", f"{base}.mp4")
+
+    events = asyncio.Queue()
+    extracted = asyncio.Queue(maxsize=queue_size)
+    transcribed = asyncio.Queue(maxsize=queue_size)
+    stage_seconds = {"extract": 0.0, "transcribe": 0.0, "synthesize": 0.0}
+    summary = {"segments": 0, "duration": 0.0, "max_delay": 0.0}
+
+    async def extract():
+        rate = DEFAULT_SAMPLE_RATE
+        # 缓冲超过 1.25 倍目标时长时，在目标切点前后 1/4 的范围内找最安静的位置切分
+        limit = int(segment_seconds * 1.25 * rate) + rate // 10
+        reframer = WavStreamReframer()
+        pending = []
+        buffered = 0
+        offset = 0
+        index = 0
+
+        async def emit(samples):
+            nonlocal offset, index
+            start, end = offset / rate, (offset + len(samples)) / rate
+            offset += len(samples)
+            await extracted.put((index, start, end, samples))
+            events.put_nowait({"stage": "extract", "index": index, "start": start, "end": end})
+            index += 1
+
+        chunks = splitter.astream_audio(video_path, sample_rate=rate)
+        mark = time.perf_counter()
+        async for chunk in chunks:
+            wav = reframer.feed(chunk)
+            if wav is None:
+                continue
+            pending.append(np.frombuffer(split_wav_pcm(wav)[1], dtype=np.int16))
+            buffered += len(pending[-1])
+            while buffered > limit:
+                buffer = np.concatenate(pending)
+                cuts = find_cut_points(buffer, rate, segment_seconds)
+                cut = cuts[0] if cuts else int(segment_seconds * rate)
+                pending, buffered = [buffer[cut:]], len(buffer) - cut
+                stage_seconds["extract"] += time.perf_counter() - mark
+                await emit(buffer[:cut])
+                mark = time.perf_counter()
+        stage_seconds["extract"] += time.perf_counter() - mark
+        if buffered:
+            await emit(np.concatenate(pending))
+        summary["duration"] = offset / rate
+        await extracted.put(None)
+
+    async def transcribe():
+        while (item := await extracted.get()) is not None:
+            index, start, end, samples = item
+            mark = time.perf_counter()
+            result = await transcriber.transcribe_bytes(to_wav_bytes(samples, DEFAULT_SAMPLE_RATE), use_cache=use_cache)
+            stage_seconds["transcribe"] += time.perf_counter() - mark
+            text = result.get("text", "").strip()
+            await transcribed.put((index, start, end, text))
+            events.put_nowait({"stage": "transcribe", "index": index, "start": start, "end": end, "text": text})
+        await transcribed.put(None)
+
+    async def synthesize():
+        position = 0.0  # 新音轨已写入的时长（秒）
+        with open(audio_path, "wb") as f, accumulate("disk_write", target="output") as writes:
+            writer = WavConcatWriter(f)
+            while (item := await transcribed.get()) is not None:
+                index, start, end, text = item
+                delay = 0.0
+                if text:
+                    mark = time.perf_counter()
+                    wav = b"".join([chunk async for chunk in voice_clone.stream_speech(
+                        text, voice, model_id=model, response_format="wav", speed=speed, gain=gain,
+                        sample_rate=sample_rate, use_cache=use_cache
+                    )])
+                    stage_seconds["synthesize"] += time.perf_counter() - mark
+                    with writes:
+                        if start > position:
+                            writer.append(_silence_wav(start - position, sample_rate))
+                            position = start
+                        writer.append(wav)
+                    delay = position - start
+                    position += wav_duration(wav)
+                summary["segments"] += 1
+                summary["max_delay"] = max(summary["max_delay"], delay)
+                events.put_nowait({
+                    "stage": "synthesize", "index": index, "start": start, "end": end, "text": text, "delay": delay
+                })
+            # 结尾补静音到原视频的音频时长
+            with writes:
+                if summary["duration"] > position or writer.format is None:
+                    writer.append(_silence_wav(max(summary["duration"] - position, 0.0), sample_rate))
+                writer.close()
+
+    stages = [asyncio.create_task(stage()) for stage in (extract, transcribe, synthesize)]
+
+    async def supervise():
+        try:
+            await asyncio.gather(*stages)
+        except Exception as e:
+            events.put_nowait(e)
+        else:
+            events.put_nowait(None)
+
+    supervisor = asyncio.create_task(supervise())
+    try:
+        while (event := await events.get()) is not None:
+            if isinstance(event, Exception):
+                raise event
+            yield event
+    finally:
+        for task in stages + [supervisor]:
+            task.cancel()
+
+    await asyncio.to_thread(splitter.replace_audio, video_path, audio_path, output_path)
+    yield {
+        "stage": "done",
+        "path": output_path,
+        "audio_path": audio_path,
+        "segments": summary["segments"],
+        "elapsed": time.perf_counter() - started,
+        "stage_seconds": stage_seconds,
+        "max_delay": summary["max_delay"]
+    }
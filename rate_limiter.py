@@ -0,0 +1,223 @@
+"""
+出站请求限流调度：
+1. 按接口（如 audio/speech、audio/transcriptions）分别维护 RPM / TPM 令牌桶，额度不足时排队等待而不是报错
+2. 上游返回 429 时按 Retry-After（缺省时指数退避）暂停该接口，随后自动重发
+3. 统计各接口的排队深度、等待时间与 429 次数
+
+配置（环境变量）：
+    RATE_LIMIT_RPM / RATE_LIMIT_TPM     所有接口的默认每分钟请求数 / 字符数，0 表示不限制
+    RATE_LIMITS                         按接口覆盖，JSON，如 {"audio/speech": {"rpm": 60, "tpm": 20000}}
+    RATE_LIMIT_MAX_RETRIES              遇到 429 时最多重发次数
+"""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+DEFAULT_RPM = float(os.getenv("RATE_LIMIT_RPM", "0"))
+DEFAULT_TPM = float(os.getenv("RATE_LIMIT_TPM", "0"))
+DEFAULT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "3"))
+# 429 未携带 Retry-After 时的退避基数（秒）与上限
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+
+
+def _load_endpoint_limits():
+    raw = os.getenv("RATE_LIMITS", "").strip()
+    if not raw:
+        return {}
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError as e:
+        print(f"RATE_LIMITS 配置不是合法的 JSON，已忽略: {e}")
+        return {}
+
+
+def endpoint_of(url):
+    """由 URL 得到接口名：去掉版本前缀后的路径，如 https://host/v1/audio/speech → audio/speech"""
+    path = urlparse(str(url)).path.strip("/")
+    head, _, rest = path.partition("/")
+    if head.startswith("v") and head[1:].isdigit():
+        return rest
+    return path
+
+
+def estimate_tokens(payload):
+    """估算请求消耗的 TPM 额度：按合成文本（input 字段）的字符数计"""
+    if isinstance(payload, (bytes, bytearray)):
+        if not payload.startswith(b"{"):
+            return 0
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            return 0
+    elif isinstance(payload, str):
+        try:
+            payload = json.loads(payload)
+        except ValueError:
+            return 0
+    if isinstance(payload, dict) and isinstance(payload.get("input"), str):
+        return len(payload["input"])
+    return 0
+
+
+def parse_retry_after(value):
+    """解析 Retry-After（秒数或 HTTP 日期），无法解析时返回 None"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    预约式令牌桶：额度可以透支，透支部分换算为调用方需要等待的时间，
+    因此等待者按到达顺序依次获得额度
+    """
+
+    def __init__(self, per_minute, capacity=None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity if capacity is not None else per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount, now):
+        """预约 amount 个令牌，返回需要等待的秒数"""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # 单次请求超过桶容量时按容量计，避免永远等不到
+        self.tokens -= min(amount, self.capacity)
+        if self.tokens >= 0:
+            return 0.0
+        return -self.tokens / self.rate
+
+
+class _Endpoint:
+    def __init__(self, rpm, tpm):
+        self.rpm = TokenBucket(rpm) if rpm > 0 else None
+        self.tpm = TokenBucket(tpm) if tpm > 0 else None
+        self.blocked_until = 0.0
+        self.queued = 0
+        self.requests = 0
+        self.delayed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.throttled = 0
+
+
+class RateLimitScheduler:
+    """线程安全的限流调度器，同步调用方 sleep 等待，异步调用方 await 等待"""
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM, limits=None, max_retries=DEFAULT_MAX_RETRIES):
+        """
+        Args:
+            rpm: 默认每分钟请求数，0 表示不限制
+            tpm: 默认每分钟字符数，0 表示不限制
+            limits: 按接口覆盖的配置 {endpoint: {"rpm": ..., "tpm": ...}}
+            max_retries: 遇到 429 时最多重发次数
+        """
+        self.default_rpm = rpm
+        self.default_tpm = tpm
+        self.limits = limits if limits is not None else _load_endpoint_limits()
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def _endpoint(self, name):
+        state = self._endpoints.get(name)
+        if state is None:
+            config = self.limits.get(name, {})
+            state = _Endpoint(config.get("rpm", self.default_rpm), config.get("tpm", self.default_tpm))
+            self._endpoints[name] = state
+        return state
+
+    def _reserve(self, name, tokens):
+        """预约额度，返回需要等待的秒数"""
+        now = time.monotonic()
+        with self._lock:
+            state = self._endpoint(name)
+            delay = max(state.blocked_until - now, 0.0)
+            if state.rpm:
+                delay = max(delay, state.rpm.reserve(1, now))
+            if state.tpm and tokens:
+                delay = max(delay, state.tpm.reserve(tokens, now))
+            state.requests += 1
+            if delay > 0:
+                state.queued += 1
+                state.delayed += 1
+                state.total_wait += delay
+                state.max_wait = max(state.max_wait, delay)
+            return delay
+
+    def _done_waiting(self, name):
+        with self._lock:
+            self._endpoints[name].queued -= 1
+
+    def acquire(self, name, tokens=0):
+        """同步获取额度，额度不足时阻塞等待，返回等待的秒数"""
+        delay = self._reserve(name, tokens)
+        if delay > 0:
+            try:
+                time.sleep(delay)
+            finally:
+                self._done_waiting(name)
+        return delay
+
+    async def acquire_async(self, name, tokens=0):
+        """异步获取额度，额度不足时挂起等待，返回等待的秒数"""
+        delay = self._reserve(name, tokens)
+        if delay > 0:
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self._done_waiting(name)
+        return delay
+
+    def throttled(self, name, retry_after, attempt):
+        """
+        记录一次 429：在 Retry-After（缺省为指数退避）之内暂停该接口的所有请求
+
+        Returns:
+            float: 暂停的秒数
+        """
+        delay = parse_retry_after(retry_after)
+        if delay is None:
+            delay = min(BACKOFF_BASE * (2 ** attempt), BACKOFF_MAX)
+        with self._lock:
+            state = self._endpoint(name)
+            state.throttled += 1
+            state.blocked_until = max(state.blocked_until, time.monotonic() + delay)
+        print(f"接口 {name} 触发限流（429），{delay:.1f} 秒后重试")
+        return delay
+
+    def stats(self):
+        """
+        各接口的限流统计
+
+        Returns:
+            dict: {endpoint: {queued 当前排队数, requests 请求数, delayed 需要等待的请求数,
+                   total_wait / max_wait / avg_wait 等待秒数, throttled 429 次数}}
+        """
+        with self._lock:
+            return {
+                name: {
+                    "queued": state.queued,
+                    "requests": state.requests,
+                    "delayed": state.delayed,
+                    "total_wait": round(state.total_wait, 3),
+                    "max_wait": round(state.max_wait, 3),
+                    "avg_wait": round(state.total_wait / state.delayed, 3) if state.delayed else 0.0,
+                    "throttled": state.throttled
+                }
+                for name, state in self._endpoints.items()
+            }
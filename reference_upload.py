@@ -0,0 +1,146 @@
+"""
+参考音频流式上传：
+1. 可选先用 ffmpeg 将参考音频转码为模型所需采样率的单声道压缩格式
+2. 以流的方式边读文件边做 base64 编码生成 JSON 请求体，不在内存中保留整份音频及其编码副本
+3. 统计转码前后在网络上传输的字节数
+"""
+
+import asyncio
+import base64
+import json
+import os
+import tempfile
+
+from metrics import track
+
+# 各模型处理参考音频所用的采样率
+MODEL_SAMPLE_RATES = {
+    "FunAudioLLM/CosyVoice2-0.5B": 24000,
+    "fishaudio/fish-speech-1.5": 44100,
+    "RVC-Boss/GPT-SoVITS": 32000
+}
+DEFAULT_SAMPLE_RATE = 24000
+DEFAULT_BITRATE = os.getenv("REFERENCE_UPLOAD_BITRATE", "64k")
+
+MIME_TYPES = {
+    ".mp3": "audio/mpeg",
+    ".wav": "audio/wav",
+    ".m4a": "audio/mp4",
+    ".aac": "audio/aac",
+    ".ogg": "audio/ogg",
+    ".opus": "audio/ogg",
+    ".flac": "audio/flac"
+}
+
+# 每次读取的字节数，需为 3 的倍数，保证分块 base64 编码结果可以直接拼接
+READ_SIZE = 3 * 64 * 1024
+
+
+def transcode_reference(audio_path, model_id, bitrate=DEFAULT_BITRATE):
+    """
+    将参考音频转码为模型采样率的单声道 mp3
+
+    Returns:
+        str: 转码后的临时文件路径，由调用方负责删除
+    """
+    import ffmpeg
+
+    sample_rate = MODEL_SAMPLE_RATES.get(model_id, DEFAULT_SAMPLE_RATE)
+    fd, output_path = tempfile.mkstemp(suffix=".mp3")
+    os.close(fd)
+    try:
+        with track("ffmpeg_transcode"):
+            (
+                ffmpeg
+                .input(audio_path)
+                .output(output_path, ac=1, ar=sample_rate, acodec="libmp3lame", audio_bitrate=bitrate)
+                .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
+            )
+    except ffmpeg.Error as e:
+        os.remove(output_path)
+        raise Exception(f"参考音频转码失败: {e.stderr.decode(errors='ignore')}")
+    return output_path
+
+
+def legacy_wire_bytes(audio_size, fields):
+    """整份 base64 编码上传（旧方式）时请求体的字节数"""
+    encoded = 4 * ((audio_size + 2) // 3)
+    prefix = len("data:audio/mpeg;base64,")
+    return len(json.dumps(dict(fields, audio="")).encode("utf-8")) + prefix + encoded
+
+
+class Base64JsonBody:
+    """
+    流式 JSON 请求体：{...fields, "audio": "data:<mime>;base64,<文件内容>"}
+
+    实现 read / __iter__ / __len__，requests 会据此设置 Content-Length 并分块发送；
+    异步客户端使用 aiter()（读盘与编码在线程中逐块执行，不阻塞事件循环）。
+    """
+
+    def __init__(self, fields, audio_path, mime_type):
+        self.audio_path = audio_path
+        header = json.dumps(fields, ensure_ascii=False)[:-1]
+        separator = ", " if fields else ""
+        self._prefix = f'{header}{separator}"audio": "data:{mime_type};base64,'.encode("utf-8")
+        self._suffix = b'"}'
+        self._audio_size = os.path.getsize(audio_path)
+        self._length = len(self._prefix) + 4 * ((self._audio_size + 2) // 3) + len(self._suffix)
+        self._iter = None
+        self._buffer = b""
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        yield self._prefix
+        with open(self.audio_path, "rb") as f:
+            while chunk := f.read(READ_SIZE):
+                yield base64.b64encode(chunk)
+        yield self._suffix
+
+    async def aiter(self):
+        chunks = iter(self)
+        while (chunk := await asyncio.to_thread(next, chunks, None)) is not None:
+            yield chunk
+
+    def read(self, size=-1):
+        if self._iter is None:
+            self._iter = iter(self)
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._iter)
+            except StopIteration:
+                break
+        if size < 0:
+            data, self._buffer = self._buffer, b""
+        else:
+            data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+def prepare_upload(audio_path, model_id, voice_id, text, transcode=True):
+    """
+    准备流式上传
+
+    Returns:
+        tuple: (Base64JsonBody, 统计信息 dict, 需要清理的临时文件路径或 None)
+    """
+    fields = {"model": model_id, "customName": voice_id, "text": text}
+    source_bytes = os.path.getsize(audio_path)
+    upload_path = audio_path
+    temp_path = None
+    if transcode:
+        temp_path = transcode_reference(audio_path, model_id)
+        # 转码后反而更大时（如原本就是低码率文件）直接上传原文件
+        if os.path.getsize(temp_path) < source_bytes:
+            upload_path = temp_path
+    mime_type = MIME_TYPES.get(os.path.splitext(upload_path)[1].lower(), "audio/mpeg")
+    body = Base64JsonBody(fields, upload_path, mime_type)
+    stats = {
+        "source_bytes": source_bytes,
+        "upload_audio_bytes": os.path.getsize(upload_path),
+        "transcoded": upload_path != audio_path,
+        "wire_bytes_before": legacy_wire_bytes(source_bytes, fields),
+        "wire_bytes_after": len(body)
+    }
+    return body, stats, temp_path
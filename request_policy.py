@@ -0,0 +1,286 @@
+"""
+出站请求的超时、重试与对冲（hedged request）策略：
+1. 按接口设置连接 / 读取超时，卡住的上游连接不会无限期占用工作线程
+2. 连接未建立（请求尚未发出）时任何请求都可以重试；读取超时、连接中断与 5xx 只对幂等接口重试
+   （合成、转写、音色列表、删除音色），上传音色不重试，避免重复创建。退避时间带随机抖动（full jitter）
+3. 可选对冲：短文本合成与音色列表请求在超过该接口近期延迟的 p95 仍未返回时发出第二份相同请求，
+   取先返回的一份，另一份取消或关闭；统计对冲次数与第二份请求胜出的次数
+
+配置（环境变量）：
+    HTTP_CONNECT_TIMEOUT    连接超时（秒）
+    HTTP_READ_TIMEOUTS      按接口覆盖读取超时（秒），JSON，如 {"audio/speech": 30}
+    HTTP_MAX_RETRIES        连接失败 / 超时 / 5xx 时最多重试次数
+    HTTP_HEDGE              1 表示开启对冲请求（默认关闭）
+    HTTP_HEDGE_MAX_CHARS    参与对冲的合成请求最多字符数
+    HTTP_HEDGE_WORKERS      执行对冲请求的线程数（每个对冲中的请求最多占用两个）
+"""
+
+import asyncio
+import json
+import math
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+DEFAULT_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "5"))
+DEFAULT_READ_TIMEOUT = 60.0
+# 各接口的读取超时（秒）：流式合成为相邻两块数据之间的最长间隔，转写与上传需等待上游处理整段音频
+READ_TIMEOUTS = {
+    "audio/speech": 60.0,
+    "audio/transcriptions": 120.0,
+    "uploads/audio/voice": 120.0,
+    "audio/voice/list": 15.0,
+    "audio/voice/deletions": 15.0
+}
+DEFAULT_MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "2"))
+# 重试退避的基数与上限（秒）
+RETRY_BACKOFF_BASE = 0.5
+RETRY_BACKOFF_MAX = 8.0
+RETRYABLE_STATUS = (500, 502, 503, 504)
+# 重复发送不会产生额外副作用的接口（POST 也可重试）
+IDEMPOTENT_ENDPOINTS = ("audio/speech", "audio/transcriptions", "audio/voice/list", "audio/voice/deletions")
+
+HEDGE_ENABLED = os.getenv("HTTP_HEDGE", "0").lower() in ("1", "true", "yes")
+HEDGE_ENDPOINTS = ("audio/speech", "audio/voice/list")
+HEDGE_MAX_CHARS = int(os.getenv("HTTP_HEDGE_MAX_CHARS", "200"))
+HEDGE_WORKERS = int(os.getenv("HTTP_HEDGE_WORKERS", "16"))
+# 样本不足时的对冲延迟，以及对冲延迟的下限（秒）
+HEDGE_DEFAULT_DELAY = 1.0
+HEDGE_MIN_DELAY = 0.05
+HEDGE_MIN_SAMPLES = 20
+LATENCY_WINDOW = 200
+
+
+def _load_read_timeouts():
+    timeouts = dict(READ_TIMEOUTS)
+    raw = os.getenv("HTTP_READ_TIMEOUTS", "").strip()
+    if raw:
+        try:
+            timeouts.update({name: float(value) for name, value in json.loads(raw).items()})
+        except (ValueError, AttributeError) as e:
+            print(f"HTTP_READ_TIMEOUTS 配置不是合法的 JSON 对象，已忽略: {e}")
+    return timeouts
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+
+class RequestPolicy:
+    """线程安全的请求策略：超时、重试判定与对冲执行"""
+
+    def __init__(self, connect_timeout=DEFAULT_CONNECT_TIMEOUT, read_timeouts=None,
+                 max_retries=DEFAULT_MAX_RETRIES, hedge=HEDGE_ENABLED, hedge_max_chars=HEDGE_MAX_CHARS,
+                 hedge_workers=HEDGE_WORKERS):
+        """
+        Args:
+            connect_timeout: 连接超时（秒）
+            read_timeouts: 按接口的读取超时 {endpoint: 秒}，未列出的接口使用 DEFAULT_READ_TIMEOUT
+            max_retries: 连接失败 / 超时 / 5xx 时最多重试次数
+            hedge: 是否对短合成与音色列表请求发送对冲请求
+            hedge_max_chars: 参与对冲的合成请求最多字符数
+            hedge_workers: 执行对冲请求的线程数
+        """
+        self.connect_timeout = connect_timeout
+        self.read_timeouts = read_timeouts if read_timeouts is not None else _load_read_timeouts()
+        self.max_retries = max_retries
+        self.hedge_enabled = hedge
+        self.hedge_max_chars = hedge_max_chars
+        self.hedge_workers = hedge_workers
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._executor = None
+
+    def _endpoint(self, name):
+        state = self._endpoints.get(name)
+        if state is None:
+            state = self._endpoints[name] = _EndpointStats()
+        return state
+
+    def timeout(self, endpoint):
+        """(连接超时, 读取超时)"""
+        return self.connect_timeout, self.read_timeouts.get(endpoint, DEFAULT_READ_TIMEOUT)
+
+    @staticmethod
+    def idempotent(method, endpoint):
+        return method.upper() in ("GET", "HEAD", "DELETE") or endpoint in IDEMPOTENT_ENDPOINTS
+
+    def should_retry(self, attempt, idempotent, connect_failed=False, status=None):
+        """
+        判断一次失败是否重试
+
+        Args:
+            attempt: 已重试的次数
+            idempotent: 请求是否幂等
+            connect_failed: 连接未建立（请求未发出）
+            status: 上游返回的状态码（异常时为 None）
+        """
+        if attempt >= self.max_retries:
+            return False
+        if status is not None:
+            return idempotent and status in RETRYABLE_STATUS
+        return connect_failed or idempotent
+
+    def backoff(self, endpoint, attempt, reason):
+        """记录一次重试并返回带抖动的退避秒数"""
+        delay = random.uniform(0, min(RETRY_BACKOFF_BASE * (2 ** attempt), RETRY_BACKOFF_MAX))
+        with self._lock:
+            self._endpoint(endpoint).retries += 1
+        print(f"请求 {endpoint} 失败（{reason}），{delay:.2f} 秒后第 {attempt + 1} 次重试")
+        return delay
+
+    def record_latency(self, endpoint, seconds):
+        """记录一次成功请求的响应时间（到收到响应头为止），用于计算对冲延迟"""
+        with self._lock:
+            self._endpoint(endpoint).latencies.append(seconds)
+
+    def should_hedge(self, endpoint, tokens=0):
+        """是否对该请求发送对冲请求：仅限短文本合成与音色列表"""
+        if not self.hedge_enabled or endpoint not in HEDGE_ENDPOINTS:
+            return False
+        return endpoint != "audio/speech" or 0 < tokens <= self.hedge_max_chars
+
+    def hedge_delay(self, endpoint):
+        """第一份请求超过该时间仍未返回时发出对冲请求：近期响应时间的 p95"""
+        with self._lock:
+            samples = sorted(self._endpoint(endpoint).latencies)
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        p95 = samples[min(len(samples) - 1, math.ceil(len(samples) * 0.95) - 1)]
+        return max(p95, HEDGE_MIN_DELAY)
+
+    def _record_hedge(self, endpoint, won):
+        with self._lock:
+            state = self._endpoint(endpoint)
+            state.hedged += 1
+            if won:
+                state.hedge_wins += 1
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.hedge_workers, thread_name_prefix="hedge")
+            return self._executor
+
+    def hedge(self, endpoint, send, close):
+        """
+        同步对冲执行：send() 超过 hedge_delay 未返回时再调用一次，返回先成功的结果
+
+        Args:
+            send: 发送一次请求并返回响应的函数
+            close: 关闭未被采用的响应
+        """
+        executor = self._get_executor()
+        started = threading.Event()
+        started_at = []
+
+        def send_first():
+            started_at.append(time.monotonic())
+            started.set()
+            return send()
+
+        first = executor.submit(send_first)
+        # 线程池繁忙时请求先在队列中等待，对冲延迟从 send() 实际开始时计时，排队时间不算作上游延迟
+        started.wait()
+        remaining = self.hedge_delay(endpoint) - (time.monotonic() - started_at[0])
+        done, _ = wait([first], timeout=max(remaining, 0))
+        if done:
+            return first.result()
+        second = executor.submit(send)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = error or future.exception()
+                    continue
+                # 另一份请求无法中途取消，返回后直接关闭
+                for other in (done | pending) - {future}:
+                    other.add_done_callback(lambda f: f.exception() is None and close(f.result()))
+                self._record_hedge(endpoint, future is second)
+                return future.result()
+        self._record_hedge(endpoint, False)
+        raise error
+
+    async def ahedge(self, endpoint, send, aclose):
+        """hedge 的 asyncio 版本：send 为协程函数，未被采用的请求直接取消"""
+        first = asyncio.ensure_future(send())
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_delay(endpoint))
+        if done:
+            return first.result()
+        second = asyncio.ensure_future(send())
+        pending = {first, second}
+        error = None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is not None:
+                        error = error or task.exception()
+                        continue
+                    for other in done - {task}:
+                        if other.exception() is None:
+                            await aclose(other.result())
+                    self._record_hedge(endpoint, task is second)
+                    return task.result()
+            self._record_hedge(endpoint, False)
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self):
+        """
+        各接口的重试与对冲统计
+
+        Returns:
+            dict: {endpoint: {retries 重试次数, hedged 发出对冲请求的次数, hedge_wins 对冲请求先返回的次数,
+                   hedge_win_rate, hedge_delay 当前对冲延迟, p95 近期响应时间 p95}}
+        """
+        with self._lock:
+            names = list(self._endpoints)
+        result = {}
+        for name in names:
+            delay = self.hedge_delay(name)
+            with self._lock:
+                state = self._endpoints[name]
+                samples = sorted(state.latencies)
+                result[name] = {
+                    "retries": state.retries,
+                    "hedged": state.hedged,
+                    "hedge_wins": state.hedge_wins,
+                    "hedge_win_rate": round(state.hedge_wins / state.hedged, 3) if state.hedged else 0.0,
+                    "hedge_delay": round(delay, 3),
+                    "p95": round(samples[math.ceil(len(samples) * 0.95) - 1], 3) if samples else None
+                }
+        return result
+
+    def render(self):
+        """以 Prometheus 文本格式输出各接口的重试与对冲次数（追加在 /metrics 的操作指标之后）"""
+        from metrics import METRIC_PREFIX
+
+        stats = self.stats()
+        lines = []
+        for suffix, help_text, field in (
+            ("http_retries_total", "超时 / 连接失败 / 5xx 后的重试次数", "retries"),
+            ("http_hedged_total", "发出对冲请求的次数", "hedged"),
+            ("http_hedge_wins_total", "对冲请求先于原请求返回的次数", "hedge_wins")
+        ):
+            metric = f"{METRIC_PREFIX}_{suffix}"
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            for endpoint, item in sorted(stats.items()):
+                lines.append(f'{metric}{{endpoint="{endpoint}"}} {item[field]}')
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
@@ -0,0 +1,345 @@
+"""
+多进程共享状态：
+1. 多个 app.py / run-manifest 进程（如部署在负载均衡之后）共享音色列表缓存、任务状态与跨进程锁，
+   避免每个进程各自冷启动缓存、重复请求上游
+2. 后端可插拔：默认使用本地 SQLite（单机多进程），也可以选择进程内存储或自定义实现
+3. 锁以带过期时间的租约实现，持有期间后台定期续租（长任务不会因租约过期被其他进程重复执行），
+   持有者异常退出后不再续租，租约到期自动释放
+
+配置（环境变量）：
+    SHARED_STATE_BACKEND    sqlite（默认）/ memory / 自定义后端 "模块:类名"（无参构造，继承 SharedState）
+    SHARED_STATE_PATH       SQLite 数据库路径
+
+合成 / 转写缓存的文件本身保存在磁盘缓存目录中，多台机器部署时将缓存目录放在共享存储上即可共享命中。
+"""
+
+import asyncio
+import importlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager, contextmanager
+
+DEFAULT_BACKEND = os.getenv("SHARED_STATE_BACKEND", "sqlite")
+DEFAULT_STATE_PATH = os.getenv("SHARED_STATE_PATH", os.path.join("outputs", "state", "shared.sqlite3"))
+# 锁租约的默认有效期（秒，持有期间每 1/3 有效期续租一次）与获取锁时的轮询间隔
+DEFAULT_LOCK_TTL = 30.0
+LOCK_POLL_INTERVAL = 0.05
+
+
+def worker_name():
+    """当前进程的标识：主机名:进程号"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_id():
+    return f"{worker_name()}:{uuid.uuid4().hex[:8]}"
+
+
+class SharedState(ABC):
+    """
+    共享状态后端的接口：按命名空间存取可 JSON 序列化的值，支持过期时间
+
+    子类必须实现 get / set / add / delete / items（缺少任一方法时创建实例即报错），renew 可选覆盖，
+    锁在此基础上由 add + delete 实现。
+    """
+
+    @abstractmethod
+    def get(self, namespace, key):
+        """读取值，不存在或已过期时返回 None"""
+
+    @abstractmethod
+    def set(self, namespace, key, value, ttl=None):
+        """写入值，ttl 为有效期（秒），None 表示不过期"""
+
+    @abstractmethod
+    def add(self, namespace, key, value, ttl=None):
+        """仅在键不存在（或已过期）时写入，返回是否写入成功（原子操作）"""
+
+    @abstractmethod
+    def delete(self, namespace, key, expected=None):
+        """删除键；指定 expected 时仅在当前值等于 expected 时删除。返回是否删除"""
+
+    @abstractmethod
+    def items(self, namespace):
+        """命名空间下所有未过期的 {键: 值}"""
+
+    def renew(self, namespace, key, expected, ttl):
+        """
+        仅在键存在且当前值等于 expected 时重新设置有效期（用于续租），返回是否续期
+
+        默认实现由 get + set 组成，不是原子操作；内置后端均以原子方式覆盖实现。
+        """
+        if self.get(namespace, key) != expected:
+            return False
+        self.set(namespace, key, expected, ttl)
+        return True
+
+    def _try_lock(self, name, owner, ttl, deadline):
+        if self.add("locks", name, owner, ttl):
+            return True
+        if deadline is not None and time.monotonic() >= deadline:
+            raise TimeoutError(f"等待共享锁超时: {name}")
+        return False
+
+    def _renew_lock(self, name, owner, ttl):
+        try:
+            renewed = self.renew("locks", name, owner, ttl)
+        except Exception as e:
+            print(f"共享锁 {name} 续租失败: {e}")
+            return
+        if not renewed:
+            print(f"共享锁 {name} 的租约已过期，可能被其他进程同时持有")
+
+    @contextmanager
+    def lock(self, name, ttl=DEFAULT_LOCK_TTL, timeout=None):
+        """
+        跨进程互斥锁：with state.lock("voice_list:xxx"): ...
+
+        持有期间后台线程每 ttl / 3 续租一次，持有时间可以超过 ttl。
+
+        Args:
+            name: 锁名
+            ttl: 租约有效期（秒），持有者异常退出后最迟在此时间后释放
+            timeout: 等待上限（秒），None 表示一直等待，超时抛出 TimeoutError
+        """
+        owner = _owner_id()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while not self._try_lock(name, owner, ttl, deadline):
+            time.sleep(LOCK_POLL_INTERVAL)
+        released = threading.Event()
+
+        def heartbeat():
+            while not released.wait(ttl / 3):
+                self._renew_lock(name, owner, ttl)
+
+        threading.Thread(target=heartbeat, name="lock-lease", daemon=True).start()
+        try:
+            yield
+        finally:
+            released.set()
+            self.delete("locks", name, expected=owner)
+
+    @asynccontextmanager
+    async def alock(self, name, ttl=DEFAULT_LOCK_TTL, timeout=None):
+        """lock 的 asyncio 版本，等待与续租期间不阻塞事件循环（后端读写在线程中执行）"""
+        owner = _owner_id()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        while not await asyncio.to_thread(self._try_lock, name, owner, ttl, deadline):
+            await asyncio.sleep(LOCK_POLL_INTERVAL)
+
+        async def heartbeat():
+            while True:
+                await asyncio.sleep(ttl / 3)
+                await asyncio.to_thread(self._renew_lock, name, owner, ttl)
+
+        renewing = asyncio.ensure_future(heartbeat())
+        try:
+            yield
+        finally:
+            renewing.cancel()
+            await asyncio.to_thread(self.delete, "locks", name, owner)
+
+
+class MemoryState(SharedState):
+    """进程内存储，只在单个进程内共享（适合单进程部署或测试）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}  # (namespace, key) -> (value, expires_at)
+
+    def _live(self, item_key, now):
+        item = self._data.get(item_key)
+        if item is None:
+            return None
+        if item[1] is not None and item[1] <= now:
+            del self._data[item_key]
+            return None
+        return item
+
+    def get(self, namespace, key):
+        with self._lock:
+            item = self._live((namespace, key), time.time())
+            return item[0] if item else None
+
+    def set(self, namespace, key, value, ttl=None):
+        with self._lock:
+            self._data[(namespace, key)] = (value, time.time() + ttl if ttl is not None else None)
+
+    def add(self, namespace, key, value, ttl=None):
+        now = time.time()
+        with self._lock:
+            if self._live((namespace, key), now):
+                return False
+            self._data[(namespace, key)] = (value, now + ttl if ttl is not None else None)
+            return True
+
+    def delete(self, namespace, key, expected=None):
+        with self._lock:
+            item = self._live((namespace, key), time.time())
+            if item is None or (expected is not None and item[0] != expected):
+                return False
+            del self._data[(namespace, key)]
+            return True
+
+    def renew(self, namespace, key, expected, ttl):
+        with self._lock:
+            item = self._live((namespace, key), time.time())
+            if item is None or item[0] != expected:
+                return False
+            self._data[(namespace, key)] = (item[0], time.time() + ttl)
+            return True
+
+    def items(self, namespace):
+        now = time.time()
+        with self._lock:
+            return {
+                key: item[0]
+                for (ns, key), item in list(self._data.items())
+                if ns == namespace and self._live((ns, key), now)
+            }
+
+
+class SQLiteState(SharedState):
+    """
+    基于本地 SQLite 的共享状态，同一台机器上的多个进程共享
+
+    使用 WAL 模式，读写互不阻塞；每个线程使用独立的连接。
+    """
+
+    def __init__(self, path=DEFAULT_STATE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            "namespace TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, expires_at REAL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        conn.execute("DELETE FROM state WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None：自动提交，需要原子性的操作显式使用 BEGIN IMMEDIATE
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def get(self, namespace, key):
+        row = self._conn().execute(
+            "SELECT value FROM state WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, namespace, key, value, ttl=None):
+        expires_at = time.time() + ttl if ttl is not None else None
+        self._conn().execute(
+            "INSERT OR REPLACE INTO state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+            (namespace, key, json.dumps(value, ensure_ascii=False), expires_at)
+        )
+
+    def add(self, namespace, key, value, ttl=None):
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "DELETE FROM state WHERE namespace = ? AND key = ? AND expires_at IS NOT NULL AND expires_at <= ?",
+                (namespace, key, now)
+            )
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO state (namespace, key, value, expires_at) VALUES (?, ?, ?, ?)",
+                (namespace, key, json.dumps(value, ensure_ascii=False), now + ttl if ttl is not None else None)
+            )
+            return cursor.rowcount == 1
+
+    def delete(self, namespace, key, expected=None):
+        with self._transaction() as conn:
+            if expected is not None:
+                row = conn.execute(
+                    "SELECT value FROM state WHERE namespace = ? AND key = ?", (namespace, key)
+                ).fetchone()
+                if row is None or json.loads(row[0]) != expected:
+                    return False
+            cursor = conn.execute("DELETE FROM state WHERE namespace = ? AND key = ?", (namespace, key))
+            return cursor.rowcount == 1
+
+    def renew(self, namespace, key, expected, ttl):
+        now = time.time()
+        with self._transaction() as conn:
+            row = conn.execute(
+                "SELECT value FROM state WHERE namespace = ? AND key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (namespace, key, now)
+            ).fetchone()
+            if row is None or json.loads(row[0]) != expected:
+                return False
+            conn.execute(
+                "UPDATE state SET expires_at = ? WHERE namespace = ? AND key = ?", (now + ttl, namespace, key)
+            )
+            return True
+
+    def items(self, namespace):
+        rows = self._conn().execute(
+            "SELECT key, value FROM state WHERE namespace = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (namespace, time.time())
+        ).fetchall()
+        return {key: json.loads(value) for key, value in rows}
+
+
+def create_shared_state(backend=DEFAULT_BACKEND):
+    """
+    按名称创建共享状态后端
+
+    Args:
+        backend: sqlite / memory / "模块:类名"
+    """
+    if backend == "sqlite":
+        return SQLiteState()
+    if backend == "memory":
+        return MemoryState()
+    module_name, _, attr = backend.partition(":")
+    if not attr:
+        raise ValueError(f"未知的共享状态后端: {backend}（可选 sqlite / memory / 模块:类名）")
+    return getattr(importlib.import_module(module_name), attr)()
+
+
+_state = None
+_state_lock = threading.Lock()
+
+
+def get_shared_state():
+    """获取进程内使用的共享状态后端（首次调用时按 SHARED_STATE_BACKEND 创建）"""
+    global _state
+    with _state_lock:
+        if _state is None:
+            _state = create_shared_state()
+        return _state
+
+
+def configure_shared_state(state):
+    """替换进程内使用的共享状态后端（需在创建客户端之前调用）"""
+    global _state
+    with _state_lock:
+        _state = state
+    return state
@@ -0,0 +1,107 @@
+"""
+请求合并（single-flight）：
+同一个键上并发发起的多次调用只执行一次，其余调用等待并共享同一个结果或异常
+"""
+
+import asyncio
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """线程版本的请求合并"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        """
+        执行 fn，若同一键已有调用在进行中则等待其结果
+
+        Args:
+            key: 合并键
+            fn (callable): 无参函数
+
+        Returns:
+            fn 的返回值
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    def in_flight(self):
+        """正在进行中的调用数量"""
+        with self._lock:
+            return len(self._calls)
+
+
+class AsyncSingleFlight:
+    """asyncio 版本的请求合并，按事件循环区分"""
+
+    def __init__(self):
+        self._calls = {}
+
+    async def do(self, key, coro_fn):
+        """
+        执行协程函数 coro_fn，若同一键已有调用在进行中则等待其结果
+
+        Args:
+            key: 合并键
+            coro_fn (callable): 无参协程函数
+
+        Returns:
+            coro_fn 的返回值
+        """
+        loop = asyncio.get_running_loop()
+        call_key = (loop, key)
+        future = self._calls.get(call_key)
+        if future is not None:
+            return await asyncio.shield(future)
+
+        future = loop.create_future()
+        self._calls[call_key] = future
+        try:
+            result = await coro_fn()
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            # 没有其他等待者时避免 "exception was never retrieved" 警告
+            future.exception()
+            raise
+        except BaseException:
+            future.cancel()
+            raise
+        finally:
+            del self._calls[call_key]
+
+    def in_flight(self):
+        """正在进行中的调用数量"""
+        return len(self._calls)
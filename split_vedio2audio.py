@@ -2,16 +2,46 @@
 将 mp4 文件分离为 mp3 文件：
 1. 指定 seek start 和 time duration 分离音轨的音频
 2. 直接分离音轨的音频
+3. 源音频编码与目标容器兼容时直接流复制（-c:a copy），否则才转码；ffprobe 探测结果按文件缓存
+4. 一次 ffmpeg 调用中按多个时间段（或固定时长）批量切出多段音频，只读取 / 解码源文件一遍
+5. 将音频以 16 kHz 单声道 WAV 输出到管道，供转写等下游直接消费，不落盘
+6. 用新的音轨替换视频的音频（视频流直接复制，不重新编码）
 """
 
+import asyncio
+import glob
 import os
+import threading
+import time
 import ffmpeg
 import re
 
+from metrics import track
+
+# 各输出容器可直接流复制的音频编码
+CONTAINER_CODECS = {
+    "mp3": {"mp3"},
+    "m4a": {"aac", "alac"},
+    "wav": {"pcm_s16le", "pcm_s24le", "pcm_s32le", "pcm_f32le", "pcm_u8"},
+    "flac": {"flac"},
+    "ogg": {"vorbis", "opus"}
+}
+
+# 必须转码时各容器使用的编码器
+CONTAINER_ENCODERS = {
+    "mp3": "libmp3lame",
+    "m4a": "aac",
+    "wav": "pcm_s16le",
+    "flac": "flac",
+    "ogg": "libvorbis"
+}
+
 class VideoAudioSplitter:
     def __init__(self):
         self.output_dir = "outputs/audio"
         os.makedirs(self.output_dir, exist_ok=True)
+        self._probe_cache = {}  # (路径, 大小, 修改时间) -> 音轨信息
+        self._probe_lock = threading.Lock()
 
     def _validate_time_format(self, time_str):
         """验证时间格式是否正确 (HH:MM:SS)"""
@@ -22,29 +52,83 @@ class VideoAudioSplitter:
             raise ValueError("时间格式必须为 HH:MM:SS，例如 00:01:30")
         return True
 
-    def split_video_to_audio(self, video_path, start_time=None, duration=None):
+    def probe_audio(self, video_path):
         """
-        从视频文件中提取音频
+        使用 ffprobe 探测第一条音轨的信息，结果按 (路径, 大小, 修改时间) 缓存
+
+        返回:
+            dict | None: {"codec", "sample_rate", "channels", "duration"}，无音轨时返回 None
+        """
+        stat = os.stat(video_path)
+        key = (os.path.abspath(video_path), stat.st_size, stat.st_mtime_ns)
+        with self._probe_lock:
+            if key in self._probe_cache:
+                return self._probe_cache[key]
+
+        info = ffmpeg.probe(video_path, select_streams="a:0")
+        streams = info.get("streams", [])
+        result = None
+        if streams:
+            stream = streams[0]
+            result = {
+                "codec": stream.get("codec_name"),
+                "sample_rate": int(stream.get("sample_rate", 0) or 0),
+                "channels": stream.get("channels"),
+                "duration": float(info.get("format", {}).get("duration", 0) or 0)
+            }
+        with self._probe_lock:
+            self._probe_cache[key] = result
+        return result
+
+    def _probe_codec(self, video_path):
+        """探测源音轨编码，ffprobe 不可用时返回 None（按需转码处理）"""
+        try:
+            probe = self.probe_audio(video_path)
+        except Exception as e:
+            print(f"探测音轨失败，将直接转码: {str(e)}")
+            probe = None
+        return probe["codec"] if probe else None
+
+    def _choose_format(self, codec, output_format):
+        """根据源编码与请求的输出格式决定容器，以及能否流复制"""
+        if output_format == "auto":
+            for container, codecs in CONTAINER_CODECS.items():
+                if codec in codecs:
+                    return container, True
+            return "mp3", False
+        if output_format not in CONTAINER_ENCODERS:
+            raise ValueError(f"不支持的输出格式: {output_format}")
+        return output_format, codec in CONTAINER_CODECS[output_format]
+
+    def extract_audio(self, video_path, start_time=None, duration=None, output_format="mp3"):
+        """
+        从视频文件中提取音频，能流复制时不重新编码
         
         参数:
             video_path (str): 视频文件路径
             start_time (str, optional): 开始时间（格式：HH:MM:SS）
             duration (str, optional): 持续时间（格式：HH:MM:SS）
+            output_format (str): 输出格式，mp3 / m4a / wav / flac / ogg，auto 表示按源编码选择可流复制的容器
             
         返回:
-            str: 输出的音频文件路径
+            dict: {"path": 输出路径, "method": "copy" 或 "transcode", "codec": 源编码, "elapsed": 耗时秒数}
         """
         try:
+            started = time.perf_counter()
             # 验证时间格式
             self._validate_time_format(start_time)
             self._validate_time_format(duration)
 
+            # 探测源音轨编码
+            codec = self._probe_codec(video_path)
+            container, copy = self._choose_format(codec, output_format)
+
             # 生成输出文件名
             video_filename = os.path.splitext(os.path.basename(video_path))[0]
             output_filename = f"{video_filename}"
             if start_time and duration:
                 output_filename += f"_{start_time}_{duration}"
-            output_filename += ".mp3"
+            output_filename += f".{container}"
             
             output_path = os.path.join(self.output_dir, output_filename)
 
@@ -55,13 +139,217 @@ class VideoAudioSplitter:
             if start_time and duration:
                 stream = ffmpeg.input(video_path, ss=start_time, t=duration)
             
-            # 提取音频
-            stream = ffmpeg.output(stream, output_path, acodec='libmp3lame')
+            # 提取音频：兼容时流复制，否则转码
+            acodec = "copy" if copy else CONTAINER_ENCODERS[container]
+            stream = ffmpeg.output(stream["a:0"], output_path, acodec=acodec)
             
             # 执行命令
-            ffmpeg.run(stream, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+            with track("ffmpeg_extract") as span:
+                ffmpeg.run(stream, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+                span.received(os.path.getsize(output_path))
             
-            return output_path
+            return {
+                "path": output_path,
+                "method": "copy" if copy else "transcode",
+                "codec": codec,
+                "elapsed": time.perf_counter() - started
+            }
+            
+        except Exception as e:
+            raise Exception(f"处理视频时出错: {str(e)}")
+
+    def split_video_to_audio(self, video_path, start_time=None, duration=None, output_format="mp3"):
+        """
+        从视频文件中提取音频
+        
+        参数:
+            video_path (str): 视频文件路径
+            start_time (str, optional): 开始时间（格式：HH:MM:SS）
+            duration (str, optional): 持续时间（格式：HH:MM:SS）
+            output_format (str): 输出格式，见 extract_audio
+            
+        返回:
+            str: 输出的音频文件路径
+        """
+        return self.extract_audio(video_path, start_time, duration, output_format)["path"]
+
+    def split_video_to_segments(self, video_path, ranges=None, segment_length=None, output_format="mp3"):
+        """
+        在一次 ffmpeg 调用中批量提取多段音频
+        
+        参数:
+            video_path (str): 视频文件路径
+            ranges (list[tuple[str, str]], optional): (开始时间, 持续时间) 列表，格式均为 HH:MM:SS
+            segment_length (int, optional): 固定分段时长（秒），与 ranges 二选一
+            output_format (str): 输出格式，见 extract_audio
             
+        返回:
+            dict: {"paths": 输出路径列表, "method": "copy" 或 "transcode", "codec": 源编码, "elapsed": 耗时秒数}
+        """
+        if not ranges and not segment_length:
+            raise ValueError("请指定时间段列表或固定分段时长")
+        try:
+            started = time.perf_counter()
+            for start_time, duration in ranges or []:
+                self._validate_time_format(start_time)
+                self._validate_time_format(duration)
+
+            codec = self._probe_codec(video_path)
+            container, copy = self._choose_format(codec, output_format)
+            acodec = "copy" if copy else CONTAINER_ENCODERS[container]
+            video_filename = os.path.splitext(os.path.basename(video_path))[0]
+            audio = ffmpeg.input(video_path)["a:0"]
+
+            if ranges:
+                # 多个输出共享同一个输入，ffmpeg 只读取 / 解码一遍源文件，各输出按自身的 -ss / -t 截取
+                paths = []
+                outputs = []
+                for start_time, duration in ranges:
+                    output_path = os.path.join(
+                        self.output_dir, f"{video_filename}_{start_time}_{duration}.{container}"
+                    )
+                    paths.append(output_path)
+                    outputs.append(ffmpeg.output(audio, output_path, ss=start_time, t=duration, acodec=acodec))
+                stream = ffmpeg.merge_outputs(*outputs)
+            else:
+                # 固定时长使用 segment 封装器一次切出所有分段
+                pattern = os.path.join(self.output_dir, f"{video_filename}_seg%03d.{container}")
+                for stale in glob.glob(pattern.replace("%03d", "[0-9][0-9][0-9]")):
+                    os.remove(stale)
+                stream = ffmpeg.output(
+                    audio, pattern, f="segment", segment_time=segment_length,
+                    reset_timestamps=1, acodec=acodec
+                )
+
+            with track("ffmpeg_extract") as span:
+                ffmpeg.run(stream, overwrite_output=True, capture_stdout=True, capture_stderr=True)
+                if not ranges:
+                    paths = sorted(glob.glob(pattern.replace("%03d", "[0-9][0-9][0-9]")))
+                span.received(sum(os.path.getsize(path) for path in paths))
+            return {
+                "paths": paths,
+                "method": "copy" if copy else "transcode",
+                "codec": codec,
+                "elapsed": time.perf_counter() - started
+            }
+
         except Exception as e:
             raise Exception(f"处理视频时出错: {str(e)}")
+
+    def _pipe_stream(self, video_path, start_time, duration, sample_rate):
+        """构建将音频以单声道 PCM WAV 输出到标准输出的 ffmpeg 命令"""
+        self._validate_time_format(start_time)
+        self._validate_time_format(duration)
+        stream = ffmpeg.input(video_path)
+        if start_time and duration:
+            stream = ffmpeg.input(video_path, ss=start_time, t=duration)
+        return (
+            ffmpeg
+            .output(stream["a:0"], "pipe:", format="wav", acodec="pcm_s16le", ac=1, ar=sample_rate)
+            .global_args("-loglevel", "error")
+        )
+
+    def stream_audio(self, video_path, start_time=None, duration=None, sample_rate=16000, chunk_size=64 * 1024):
+        """
+        以流的方式输出视频中的音频（WAV 头中的长度为流式占位值 0xFFFFFFFF）
+        
+        参数:
+            video_path (str): 视频文件路径
+            start_time (str, optional): 开始时间（格式：HH:MM:SS）
+            duration (str, optional): 持续时间（格式：HH:MM:SS）
+            sample_rate (int): 输出采样率
+            chunk_size (int): 每次读取的字节数
+            
+        返回:
+            Iterator[bytes]: WAV 数据块
+        """
+        with track("ffmpeg_pipe") as span:
+            process = ffmpeg.run_async(
+                self._pipe_stream(video_path, start_time, duration, sample_rate),
+                pipe_stdout=True, pipe_stderr=True
+            )
+            finished = False
+            try:
+                while chunk := process.stdout.read(chunk_size):
+                    span.received(len(chunk))
+                    yield chunk
+                finished = True
+            finally:
+                if not finished:
+                    process.kill()
+                stderr = process.stderr.read()
+                process.wait()
+                if finished and process.returncode != 0:
+                    raise Exception(f"处理视频时出错: {stderr.decode(errors='ignore')}")
+
+    async def astream_audio(self, video_path, start_time=None, duration=None, sample_rate=16000, chunk_size=64 * 1024):
+        """stream_audio 的 asyncio 版本"""
+        args = self._pipe_stream(video_path, start_time, duration, sample_rate).compile()
+        with track("ffmpeg_pipe") as span:
+            process = await asyncio.create_subprocess_exec(
+                *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            finished = False
+            try:
+                while chunk := await process.stdout.read(chunk_size):
+                    span.received(len(chunk))
+                    yield chunk
+                finished = True
+            finally:
+                if not finished:
+                    process.kill()
+                stderr = await process.stderr.read()
+                await process.wait()
+                if finished and process.returncode != 0:
+                    raise Exception(f"处理视频时出错: {stderr.decode(errors='ignore')}")
+
+
+    def replace_audio(self, video_path, audio_path, output_path=None):
+        """
+        用新的音轨替换视频中的音频：视频流直接复制，音频编码为 AAC
+        
+        参数:
+            video_path (str): 视频文件路径
+            audio_path (str): 新音轨的音频文件路径
+            output_path (str, optional): 输出视频路径，默认保存在 outputs/dubbed 下
+            
+        返回:
+            str: 输出视频路径
+        """
+        if output_path is None:
+            output_dir = "outputs/dubbed"
+            os.makedirs(output_dir, exist_ok=True)
+            video_filename = os.path.splitext(os.path.basename(video_path))[0]
+            output_path = os.path.join(output_dir, f"{video_filename}_dubbed.mp4")
+        try:
+            video = ffmpeg.input(video_path)
+            audio = ffmpeg.input(audio_path)
+            with track("ffmpeg_mux") as span:
+                (
+                    ffmpeg
+                    .output(video["v:0"], audio["a:0"], output_path, vcodec="copy", acodec="aac")
+                    .run(overwrite_output=True, capture_stdout=True, capture_stderr=True)
+                )
+                span.received(os.path.getsize(output_path))
+            return output_path
+        except ffmpeg.Error as e:
+            raise Exception(f"合成视频时出错: {e.stderr.decode(errors='ignore')}")
+
+
+def parse_ranges(text):
+    """
+    解析批量时间段文本，每行一个 "开始时间 持续时间"（空格或逗号分隔）
+
+    返回:
+        list[tuple[str, str]]: (开始时间, 持续时间) 列表
+    """
+    ranges = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        parts = re.split(r'[\s,，]+', line)
+        if len(parts) != 2:
+            raise ValueError(f"时间段格式错误: {line}，应为 \"开始时间 持续时间\"")
+        ranges.append((parts[0], parts[1]))
+    return ranges
@@ -0,0 +1,81 @@
+"""
+语音合成结果缓存：
+1. 以 (API 根地址, text, model, voice, speed, gain, sample_rate, response_format) 的哈希作为键，
+   内容寻址存储在本地磁盘；不同上游（如本地模拟服务与线上服务）的结果互不混用
+2. 按总字节数 LRU 淘汰、命中统计与多进程共用目录的处理见 disk_cache.DiskLRUCache。
+   命中时通过 open() 直接打开文件，之后其他进程淘汰该文件不影响读取；打开前已被淘汰的按未命中处理，重新合成
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+from disk_cache import DiskLRUCache
+
+DEFAULT_CACHE_DIR = os.getenv("SYNTHESIS_CACHE_DIR", "outputs/cache/speech")
+DEFAULT_MAX_BYTES = int(os.getenv("SYNTHESIS_CACHE_MAX_BYTES", str(1024 * 1024 * 1024)))
+
+
+class SynthesisCache(DiskLRUCache):
+    """基于磁盘的 LRU 语音合成缓存"""
+
+    suffix = ".audio"
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(cache_dir, max_bytes)
+
+    @staticmethod
+    def make_key(text, model, voice, speed, gain, sample_rate, response_format, base_url=""):
+        """根据合成参数与 API 根地址生成缓存键"""
+        payload = json.dumps(
+            [base_url, text, model, voice, float(speed), float(gain), sample_rate, response_format],
+            ensure_ascii=False
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        查询缓存
+
+        Returns:
+            str | None: 命中时返回缓存文件路径
+        """
+        return self.lookup(key)
+
+    def open(self, key):
+        """
+        查询缓存并打开缓存文件（二进制读）
+
+        文件在命中与打开之间被其他进程淘汰时按未命中处理。
+
+        Returns:
+            file | None: 命中时返回已打开的文件，由调用方关闭
+        """
+        path = self.lookup(key)
+        if path is None:
+            return None
+        try:
+            return open(path, "rb")
+        except FileNotFoundError:
+            self._discard(key)
+            return None
+
+    def put_file(self, key, src_path):
+        """将已有音频文件复制进缓存"""
+        with self.writer(key) as f, open(src_path, "rb") as src:
+            shutil.copyfileobj(src, f)
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_synthesis_cache():
+    """获取进程内共享的语音合成缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SynthesisCache()
+        return _cache
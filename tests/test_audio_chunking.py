@@ -0,0 +1,64 @@
+"""长音频切分：在静音处切分并按时间顺序合并转写结果"""
+
+import numpy as np
+
+from audio_chunking import find_cut_points, merge_transcripts, split_pcm, to_wav_bytes
+
+RATE = 16000
+
+
+def speech_with_pauses(seconds, pauses):
+    """正弦波模拟语音，pauses 为 (开始秒数, 结束秒数) 的静音区间"""
+    t = np.arange(int(seconds * RATE)) / RATE
+    samples = (np.sin(2 * np.pi * 220 * t) * 8000).astype(np.int16)
+    for start, end in pauses:
+        samples[int(start * RATE):int(end * RATE)] = 0
+    return samples
+
+
+def test_cuts_land_in_pauses_near_targets():
+    samples = speech_with_pauses(30, [(8.6, 9.4), (19.1, 19.9)])
+    cuts = find_cut_points(samples, RATE, chunk_seconds=10, search_seconds=2)
+    assert len(cuts) == 2
+    assert 8.6 <= cuts[0] / RATE <= 9.4
+    assert 19.1 <= cuts[1] / RATE <= 19.9
+
+
+def test_no_cuts_for_short_audio():
+    assert find_cut_points(speech_with_pauses(5, []), RATE, chunk_seconds=10) == []
+    assert find_cut_points(np.zeros(0, dtype=np.int16), RATE) == []
+
+
+def test_split_pcm_covers_all_samples():
+    samples = speech_with_pauses(30, [(9.6, 10.4), (19.6, 20.4)])
+    chunks = split_pcm(samples, RATE, chunk_seconds=10)
+    assert chunks[0][0] == 0
+    assert chunks[-1][1] == len(samples) / RATE
+    assert all(prev[1] == cur[0] for prev, cur in zip(chunks, chunks[1:]))
+    assert sum(len(chunk) for _, _, chunk in chunks) == len(samples)
+
+
+def test_to_wav_bytes_header():
+    wav = to_wav_bytes(np.zeros(100, dtype=np.int16), RATE)
+    assert wav[:4] == b"RIFF" and wav[8:12] == b"WAVE"
+    assert len(wav) == 44 + 200
+
+
+def test_merge_transcripts_orders_and_joins():
+    merged = merge_transcripts([
+        {"start": 10.0, "end": 20.0, "text": " world "},
+        {"start": 0.0, "end": 10.0, "text": "hello"},
+        {"start": 20.0, "end": 30.0, "text": "你好"},
+        {"start": 30.0, "end": 40.0, "text": "世界"},
+    ])
+    assert merged["text"] == "hello world你好世界"
+    assert [item["start"] for item in merged["segments"]] == [0.0, 10.0, 20.0, 30.0]
+
+
+def test_merge_transcripts_skips_empty_pieces():
+    merged = merge_transcripts([
+        {"start": 0.0, "end": 1.0, "text": "a"},
+        {"start": 1.0, "end": 2.0, "text": "  "},
+        {"start": 2.0, "end": 3.0, "text": "b"},
+    ])
+    assert merged["text"] == "a b"
@@ -0,0 +1,80 @@
+"""多格式输出：采样率选择、重采样与本地派生"""
+
+import os
+
+import numpy as np
+import pytest
+
+from audio_utils import build_wav_header
+from audio_variants import (
+    MAX_REMOTE_SAMPLE_RATE, decode_wav, derive_variants, master_sample_rate, resample, supported_rate
+)
+
+
+def tone(freq, rate, seconds=1.0, amplitude=10000):
+    t = np.arange(int(rate * seconds)) / rate
+    return (np.sin(2 * np.pi * freq * t) * amplitude).astype(np.float32)
+
+
+def wav_bytes(samples, rate, channels=1):
+    pcm = np.asarray(samples).astype("<i2").tobytes()
+    return build_wav_header(len(pcm), rate, channels) + pcm
+
+
+def test_supported_rate():
+    assert supported_rate("wav", 12345) == 12345
+    assert supported_rate("flac", 96000) == 96000
+    assert supported_rate("mp3", 44100) == 44100
+    # 不支持的采样率取不低于目标的最小可用值，没有时取最高值
+    assert supported_rate("opus", 44100) == 48000
+    assert supported_rate("opus", 22050) == 24000
+    assert supported_rate("mp3", 96000) == 48000
+
+
+def test_master_sample_rate_capped_at_remote_limit():
+    assert master_sample_rate([("mp3", 16000), ("wav", 24000)]) == 24000
+    assert master_sample_rate([("opus", 48000)]) == MAX_REMOTE_SAMPLE_RATE
+
+
+@pytest.mark.parametrize("src, dst", [(24000, 16000), (24000, 48000), (44100, 8000), (16000, 22050)])
+def test_resample_output_length(src, dst):
+    samples = tone(440, src, seconds=0.5)
+    out = resample(samples, src, dst)
+    assert len(out) == round(len(samples) * dst / src)
+    assert out.dtype == np.float32
+
+
+def test_resample_same_rate_and_empty_unchanged():
+    samples = tone(440, 16000, seconds=0.1)
+    assert resample(samples, 16000, 16000) is samples
+    assert len(resample(np.zeros(0, dtype=np.float32), 24000, 16000)) == 0
+
+
+def test_downsampling_filters_frequencies_above_nyquist():
+    # 10 kHz 超过 16 kHz 采样率的奈奎斯特频率，降采样后应被滤除，440 Hz 保留
+    aliased = resample(tone(10000, 48000), 48000, 16000)
+    kept = resample(tone(440, 48000), 48000, 16000)
+    assert np.abs(aliased[100:-100]).max() < 0.1 * np.abs(kept[100:-100]).max()
+
+
+def test_decode_wav_downmixes_stereo():
+    frames = np.array([[1000, 3000], [-2000, 0]], dtype=np.int16)
+    samples, rate = decode_wav(wav_bytes(frames.reshape(-1), 24000, channels=2))
+    assert rate == 24000
+    assert samples.tolist() == [2000.0, -1000.0]
+
+
+def test_derive_uncompressed_variants(tmp_path):
+    master = wav_bytes(tone(440, 24000, seconds=0.5), 24000)
+    paths = derive_variants(master, [("wav", 16000), ("pcm", 24000)], str(tmp_path), "speech")
+    assert list(paths) == ["wav_16000", "pcm_24000"]
+    with open(paths["wav_16000"], "rb") as f:
+        samples, rate = decode_wav(f.read())
+    assert rate == 16000 and len(samples) == 8000
+    assert os.path.getsize(paths["pcm_24000"]) == 12000 * 2
+
+
+def test_derive_rejects_unknown_format(tmp_path):
+    master = wav_bytes(tone(440, 24000, seconds=0.1), 24000)
+    with pytest.raises(ValueError):
+        derive_variants(master, [("wma", 24000)], str(tmp_path), "speech")
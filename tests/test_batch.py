@@ -0,0 +1,124 @@
+"""批量任务：中断 / 进程被强制结束后重新运行能接着执行未完成的任务"""
+
+import hashlib
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+from batch import BatchRunner, Checkpoint
+from shared_state import SQLiteState
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEASE = 1.0
+JOBS = [{"id": "a", "op": "synthesize"}, {"id": "b", "op": "synthesize"}]
+
+
+class FakeRunner(BatchRunner):
+    """不访问上游，记录执行过的任务"""
+
+    def __init__(self, tmp_path, fail_on=None, **kwargs):
+        super().__init__(
+            output_dir=str(tmp_path / "out"), state=SQLiteState(str(tmp_path / "state.sqlite3")), lease=LEASE,
+            **kwargs
+        )
+        self.fail_on = fail_on
+        self.executed = []
+
+    def run_job(self, job):
+        if job["id"] == self.fail_on:
+            raise KeyboardInterrupt
+        self.executed.append(job["id"])
+        return {"id": job["id"]}
+
+
+def run(runner, tmp_path, workers=1):
+    checkpoint = Checkpoint(str(tmp_path / "jobs.checkpoint.jsonl"))
+    try:
+        return runner.run([dict(job) for job in JOBS], checkpoint, workers=workers)
+    finally:
+        checkpoint.close()
+
+
+def test_resume_after_kill(tmp_path):
+    """任务执行中进程被 kill -9：租约过期前计为其他进程执行中（不计为跳过），过期后重新运行全部完成"""
+    script = textwrap.dedent(f"""
+        import os, signal, sys
+        sys.path.insert(0, {ROOT!r})
+        from batch import BatchRunner, Checkpoint
+        from shared_state import SQLiteState
+
+        class Killed(BatchRunner):
+            def run_job(self, job):
+                os.kill(os.getpid(), signal.SIGKILL)
+
+        runner = Killed(output_dir={str(tmp_path / "out")!r}, state=SQLiteState({str(tmp_path / "state.sqlite3")!r}),
+                        lease={LEASE})
+        runner.run({JOBS!r}, Checkpoint({str(tmp_path / "jobs.checkpoint.jsonl")!r}), workers=1)
+    """)
+    result = subprocess.run([sys.executable, "-c", script], cwd=str(tmp_path))
+    assert result.returncode == -9
+
+    counts = run(FakeRunner(tmp_path), tmp_path)
+    assert counts["claimed"] >= 1
+    assert counts["skipped"] == 0
+    assert counts["ok"] + counts["claimed"] == len(JOBS)
+
+    time.sleep(LEASE + 0.2)
+    runner = FakeRunner(tmp_path)
+    counts = run(runner, tmp_path)
+    assert counts["claimed"] == 0
+    assert counts["ok"] + counts["skipped"] == len(JOBS)
+
+    checkpoint = Checkpoint(str(tmp_path / "jobs.checkpoint.jsonl"))
+    checkpoint.close()
+    assert all(checkpoint.done(job["id"]) for job in JOBS)
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_interrupt_releases_claims(tmp_path, workers):
+    """任务抛出 KeyboardInterrupt：认领立即释放，不必等租约过期即可重新运行"""
+    with pytest.raises(KeyboardInterrupt):
+        run(FakeRunner(tmp_path, fail_on="a"), tmp_path, workers)
+
+    runner = FakeRunner(tmp_path)
+    counts = run(runner, tmp_path, workers)
+    assert counts["claimed"] == 0
+    assert "a" in runner.executed
+    assert counts["ok"] + counts["skipped"] == len(JOBS)
+
+
+def test_claimed_elsewhere_is_not_success(tmp_path):
+    """其他进程持有认领的任务计为 claimed，不计为跳过，也不执行"""
+    runner = FakeRunner(tmp_path)
+    checkpoint_path = os.path.abspath(str(tmp_path / "jobs.checkpoint.jsonl"))
+    scope = hashlib.sha256(checkpoint_path.encode("utf-8")).hexdigest()[:16]
+    runner.state.add("jobs", f"{scope}:a", {"worker": "other"}, ttl=60)
+
+    counts = run(runner, tmp_path)
+    assert counts == {"ok": 1, "error": 0, "skipped": 0, "claimed": 1}
+    assert runner.executed == ["b"]
+
+
+def test_lease_is_renewed_while_running(tmp_path):
+    """执行时间超过租约的任务不会被其他进程重新认领"""
+    state_path = str(tmp_path / "state.sqlite3")
+    observed = []
+
+    class Slow(FakeRunner):
+        def run_job(self, job):
+            time.sleep(LEASE * 2)
+            other = SQLiteState(state_path)
+            observed.append(other.add("jobs", next(iter(other.items("jobs"))), {"worker": "other"}, ttl=60))
+            return super().run_job(job)
+
+    checkpoint = Checkpoint(str(tmp_path / "jobs.checkpoint.jsonl"))
+    try:
+        counts = Slow(tmp_path).run([dict(JOBS[0])], checkpoint, workers=1)
+    finally:
+        checkpoint.close()
+    assert counts["ok"] == 1
+    assert observed == [False]
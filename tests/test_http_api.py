@@ -0,0 +1,45 @@
+"""HTTP 接口：流式响应在首块数据之前失败时返回 502"""
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from http_api import _stream_response
+
+
+def make_client(chunks_factory):
+    server_app = FastAPI()
+
+    @server_app.get("/stream")
+    async def stream():
+        return await _stream_response(chunks_factory(), "audio/wav", {"X-Test": "1"})
+
+    return TestClient(server_app)
+
+
+def test_error_before_first_chunk_returns_502():
+    closed = []
+
+    async def chunks():
+        try:
+            raise RuntimeError("upstream failed")
+            yield b""
+        finally:
+            closed.append(True)
+
+    response = make_client(chunks).get("/stream")
+    assert response.status_code == 502
+    assert "upstream failed" in response.json()["detail"]
+    assert closed == [True]
+
+
+def test_chunks_streamed_in_order():
+    async def chunks():
+        for part in (b"RIFF", b"abc", b"def"):
+            yield part
+
+    with make_client(chunks).stream("GET", "/stream") as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "audio/wav"
+        assert response.headers["x-test"] == "1"
+        assert "content-length" not in response.headers
+        assert b"".join(response.iter_bytes()) == b"RIFFabcdef"
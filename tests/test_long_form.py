@@ -0,0 +1,20 @@
+"""长文本切分：超长句子的断句位置"""
+
+from long_form import split_text
+
+
+def test_long_english_sentence_splits_between_words():
+    text = "The quick brown fox jumps over the lazy dog and keeps running far away"
+    segments = split_text(text, max_chars=20)
+    assert all(len(segment) <= 20 for segment in segments)
+    assert " ".join(segments) == text
+
+
+def test_long_chinese_sentence_falls_back_to_hard_split():
+    text = "一" * 45
+    assert split_text(text, max_chars=20) == ["一" * 20, "一" * 20, "一" * 5]
+
+
+def test_clauses_are_preferred_over_whitespace():
+    segments = split_text("alpha beta gamma, delta epsilon zeta eta", max_chars=20)
+    assert segments[0] == "alpha beta gamma,"
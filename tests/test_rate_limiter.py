@@ -0,0 +1,67 @@
+"""出站限流：令牌桶补充与 429 退避"""
+
+import time
+from email.utils import formatdate
+
+import pytest
+
+from rate_limiter import BACKOFF_BASE, RateLimitScheduler, TokenBucket, endpoint_of, parse_retry_after
+
+
+def test_bucket_refills_at_rate():
+    bucket = TokenBucket(60)  # 每秒 1 个
+    assert bucket.reserve(60, now=bucket.updated) == 0.0
+    start = bucket.updated
+    assert bucket.reserve(1, now=start) == pytest.approx(1.0)
+    # 透支的额度按到达顺序排队
+    assert bucket.reserve(1, now=start) == pytest.approx(2.0)
+    # 10 秒后补充 10 个，抵消透支后为 8 个，再预约 1 个
+    assert bucket.reserve(1, now=start + 10) == 0.0
+    assert bucket.tokens == pytest.approx(7.0)
+
+
+def test_bucket_caps_at_capacity_and_oversized_request():
+    bucket = TokenBucket(60, capacity=5)
+    start = bucket.updated
+    bucket.reserve(5, now=start)
+    assert bucket.reserve(0, now=start + 3600) == 0.0
+    assert bucket.tokens == 5
+    # 超过容量的单次请求按容量计，等待时间有上限
+    assert bucket.reserve(100, now=start + 3600) == 0.0
+    assert bucket.reserve(1, now=start + 3600) == pytest.approx(1.0)
+
+
+def test_scheduler_queues_by_endpoint():
+    scheduler = RateLimitScheduler(rpm=0, tpm=0, limits={"audio/speech": {"rpm": 60}})
+    assert scheduler._reserve("audio/speech", 0) == 0.0
+    scheduler._endpoints["audio/speech"].rpm.tokens = 0
+    assert scheduler._reserve("audio/speech", 0) > 0
+    assert scheduler._reserve("audio/transcriptions", 0) == 0.0
+    assert scheduler.stats()["audio/speech"]["delayed"] == 1
+
+
+def test_parse_retry_after():
+    assert parse_retry_after("3") == 3.0
+    assert parse_retry_after("-1") == 0.0
+    assert parse_retry_after(formatdate(time.time() + 30, usegmt=True)) == pytest.approx(30, abs=2)
+    assert parse_retry_after("soon") is None
+    assert parse_retry_after(None) is None
+
+
+def test_throttled_blocks_endpoint_for_retry_after():
+    scheduler = RateLimitScheduler(rpm=0, tpm=0, limits={})
+    assert scheduler.throttled("audio/speech", "2", attempt=0) == 2.0
+    assert scheduler._reserve("audio/speech", 0) == pytest.approx(2.0, abs=0.1)
+    assert scheduler._reserve("audio/voice/list", 0) == 0.0
+    assert scheduler.stats()["audio/speech"]["throttled"] == 1
+
+
+def test_throttled_without_retry_after_backs_off_exponentially():
+    scheduler = RateLimitScheduler(rpm=0, tpm=0, limits={})
+    assert scheduler.throttled("audio/speech", None, attempt=0) == BACKOFF_BASE
+    assert scheduler.throttled("audio/speech", None, attempt=2) == BACKOFF_BASE * 4
+
+
+def test_endpoint_of_strips_version_prefix():
+    assert endpoint_of("https://api.siliconflow.cn/v1/audio/speech") == "audio/speech"
+    assert endpoint_of("http://127.0.0.1:8900/audio/voice/list") == "audio/voice/list"
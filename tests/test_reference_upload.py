@@ -0,0 +1,71 @@
+"""流式上传请求体：Base64JsonBody"""
+
+import asyncio
+import base64
+import json
+import os
+import threading
+
+import pytest
+
+import reference_upload
+from reference_upload import READ_SIZE, Base64JsonBody
+
+
+def test_aiter_encodes_off_event_loop(tmp_path, monkeypatch):
+    path = tmp_path / "ref.mp3"
+    path.write_bytes(bytes(range(256)) * 1000)
+    expected = b"".join(Base64JsonBody({"model": "m"}, str(path), "audio/mpeg"))
+    threads = set()
+    encode = reference_upload.base64.b64encode
+
+    def recording_encode(data):
+        threads.add(threading.get_ident())
+        return encode(data)
+
+    monkeypatch.setattr(reference_upload.base64, "b64encode", recording_encode)
+    body = Base64JsonBody({"model": "m"}, str(path), "audio/mpeg")
+
+    async def collect():
+        return b"".join([chunk async for chunk in body.aiter()]), threading.get_ident()
+
+    data, loop_thread = asyncio.run(collect())
+    assert data == expected
+    assert len(data) == len(body)
+    assert threads and loop_thread not in threads
+
+
+@pytest.mark.parametrize("size", [0, 1, 2, 3, READ_SIZE - 1, READ_SIZE, READ_SIZE + 1, 2 * READ_SIZE + 2])
+def test_length_matches_body_and_parses_as_json(tmp_path, size):
+    audio = os.urandom(size)
+    path = tmp_path / "ref.wav"
+    path.write_bytes(audio)
+    fields = {"model": "FunAudioLLM/CosyVoice2-0.5B", "customName": "voice", "text": "你好，\"world\""}
+    body = Base64JsonBody(fields, str(path), "audio/wav")
+
+    data = b"".join(body)
+    assert len(body) == len(data)
+    parsed = json.loads(data)
+    assert {key: parsed[key] for key in fields} == fields
+    mime, _, encoded = parsed["audio"].partition(";base64,")
+    assert mime == "data:audio/wav"
+    assert base64.b64decode(encoded, validate=True) == audio
+
+
+def test_read_in_pieces_matches_iteration(tmp_path):
+    path = tmp_path / "ref.mp3"
+    path.write_bytes(os.urandom(READ_SIZE + 10))
+    expected = b"".join(Base64JsonBody({"model": "m"}, str(path), "audio/mpeg"))
+    body = Base64JsonBody({"model": "m"}, str(path), "audio/mpeg")
+    pieces = []
+    while piece := body.read(1000):
+        assert len(piece) <= 1000
+        pieces.append(piece)
+    assert b"".join(pieces) == expected
+
+
+def test_empty_fields(tmp_path):
+    path = tmp_path / "ref.mp3"
+    path.write_bytes(b"abc")
+    data = b"".join(Base64JsonBody({}, str(path), "audio/mpeg"))
+    assert json.loads(data) == {"audio": "data:audio/mpeg;base64,YWJj"}
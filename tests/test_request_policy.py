@@ -0,0 +1,47 @@
+"""对冲请求：排队时间不计入对冲延迟"""
+
+import threading
+import time
+
+from request_policy import RequestPolicy
+
+
+def test_hedge_timer_starts_when_send_begins():
+    """线程池被占满时，请求排队的时间不触发对冲"""
+    policy = RequestPolicy(hedge=True, hedge_workers=1)
+    release = threading.Event()
+    policy._get_executor().submit(release.wait)
+    threading.Timer(0.3, release.set).start()
+
+    def send():
+        time.sleep(0.05)
+        return "ok"
+
+    for _ in range(20):
+        policy.record_latency("audio/voice/list", 0.1)
+    try:
+        assert policy.hedge("audio/voice/list", send, lambda response: None) == "ok"
+        assert policy.stats()["audio/voice/list"]["hedged"] == 0
+    finally:
+        release.set()
+        policy.close()
+
+
+def test_hedge_sends_second_request_after_delay():
+    policy = RequestPolicy(hedge=True, hedge_workers=2)
+    calls = []
+
+    def send():
+        calls.append(None)
+        if len(calls) == 1:
+            time.sleep(0.5)
+            return "slow"
+        return "fast"
+
+    for _ in range(20):
+        policy.record_latency("audio/voice/list", 0.05)
+    try:
+        assert policy.hedge("audio/voice/list", send, lambda response: None) == "fast"
+        assert policy.stats()["audio/voice/list"]["hedge_wins"] == 1
+    finally:
+        policy.close()
@@ -0,0 +1,56 @@
+"""共享状态：后端接口与共享锁的续租"""
+
+import asyncio
+import time
+
+import pytest
+
+from shared_state import MemoryState, SQLiteState, SharedState
+
+
+def test_lock_renewed_past_ttl(tmp_path):
+    state = SQLiteState(str(tmp_path / "shared.sqlite3"))
+    other = SQLiteState(str(tmp_path / "shared.sqlite3"))
+    with state.lock("transcribe:k", ttl=0.3):
+        time.sleep(1.0)
+        assert not other.add("locks", "transcribe:k", "other", ttl=0.3)
+    assert other.add("locks", "transcribe:k", "other", ttl=0.3)
+
+
+def test_alock_renewed_past_ttl():
+    state = MemoryState()
+
+    async def hold():
+        async with state.alock("transcribe:k", ttl=0.3):
+            await asyncio.sleep(1.0)
+            return state.add("locks", "transcribe:k", "other", ttl=0.3)
+
+    assert asyncio.run(hold()) is False
+    assert state.get("locks", "transcribe:k") is None
+
+
+def test_lease_expires_without_release():
+    """持有者异常退出（不再续租）后租约到期释放"""
+    state = MemoryState()
+    assert state.add("locks", "transcribe:k", "crashed", ttl=0.1)
+    time.sleep(0.2)
+    with state.lock("transcribe:k", ttl=0.3, timeout=1):
+        pass
+
+
+def test_incomplete_backend_fails_on_creation():
+    class NoItems(SharedState):
+        def get(self, namespace, key):
+            return None
+
+        def set(self, namespace, key, value, ttl=None):
+            pass
+
+        def add(self, namespace, key, value, ttl=None):
+            return True
+
+        def delete(self, namespace, key, expected=None):
+            return True
+
+    with pytest.raises(TypeError):
+        NoItems()
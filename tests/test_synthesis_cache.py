@@ -0,0 +1,35 @@
+"""语音合成缓存：多个进程（实例）共用同一缓存目录"""
+
+from synthesis_cache import SynthesisCache
+
+
+def put(cache, key, data):
+    with cache.writer(key) as f:
+        f.write(data)
+
+
+def test_open_survives_eviction_by_other_process(tmp_path):
+    """命中后文件被其他实例淘汰，已打开的文件仍可读完"""
+    a = SynthesisCache(str(tmp_path), max_bytes=10)
+    b = SynthesisCache(str(tmp_path), max_bytes=10)
+    put(a, "first", b"0123456789")
+
+    cached = b.open("first")
+    assert cached is not None
+    put(a, "second", b"abcdefghij")  # 超出 a 的容量，淘汰 first
+    with cached as f:
+        assert f.read() == b"0123456789"
+
+
+def test_evicted_before_open_is_a_miss(tmp_path):
+    """索引中有但文件已被其他实例淘汰：按未命中处理"""
+    a = SynthesisCache(str(tmp_path), max_bytes=10)
+    b = SynthesisCache(str(tmp_path), max_bytes=10)
+    put(a, "first", b"0123456789")
+    assert b.get("first") is not None
+    put(a, "second", b"abcdefghij")
+
+    assert b.open("first") is None
+    assert b.stats()["entries"] == 0
+    with b.open("second") as f:
+        assert f.read() == b"abcdefghij"
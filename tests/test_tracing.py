@@ -0,0 +1,34 @@
+"""请求追踪：默认关闭，日志由后台线程写盘并按大小轮转"""
+
+import json
+import threading
+
+from tracing import Tracer
+
+
+def test_disabled_without_log_path():
+    assert not Tracer(log_path="").enabled
+
+
+def test_finish_writes_off_caller_thread(tmp_path, monkeypatch):
+    tracer = Tracer(log_path=str(tmp_path / "requests.jsonl"), slow_seconds=None)
+    writers = []
+    append = tracer._append_log
+    monkeypatch.setattr(tracer, "_append_log",
+                        lambda line: (writers.append(threading.current_thread().name), append(line)))
+
+    record = tracer.finish(tracer.start("op"))
+    assert tracer.flush(5)
+    assert writers == ["trace-writer"]
+    line = (tmp_path / "requests.jsonl").read_text(encoding="utf-8").strip()
+    assert json.loads(line)["trace_id"] == record["trace_id"]
+
+
+def test_log_rotates_at_max_bytes(tmp_path):
+    path = tmp_path / "requests.jsonl"
+    tracer = Tracer(log_path=str(path), slow_seconds=None, max_bytes=1)
+    for _ in range(3):
+        tracer.finish(tracer.start("op"))
+    assert tracer.flush(5)
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 1
+    assert len((tmp_path / "requests.jsonl.1").read_text(encoding="utf-8").splitlines()) == 1
@@ -0,0 +1,37 @@
+"""转写结果缓存：按容量 LRU 淘汰"""
+
+from transcript_cache import TranscriptCache
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = TranscriptCache(str(tmp_path), max_bytes=60)
+    cache.put("a", {"text": "a" * 10})
+    cache.put("b", {"text": "b" * 10})
+    assert cache.get("a") is not None  # a 变为最近使用
+    cache.put("c", {"text": "c" * 10})
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["entries"] == 2
+    assert stats["bytes"] <= 60
+
+
+def test_index_rebuilt_and_capped_on_start(tmp_path):
+    cache = TranscriptCache(str(tmp_path))
+    for key in ("a", "b", "c"):
+        cache.put(key, {"text": key * 10})
+
+    reopened = TranscriptCache(str(tmp_path), max_bytes=40)
+    assert reopened.stats()["entries"] == 1
+    assert len(list(tmp_path.glob("*.json"))) == 1
+
+
+def test_adopts_entries_written_by_other_process(tmp_path):
+    a = TranscriptCache(str(tmp_path))
+    b = TranscriptCache(str(tmp_path))
+    a.put("k", {"text": "hello"})
+    assert b.get("k") == {"text": "hello"}
+    assert b.stats()["entries"] == 1
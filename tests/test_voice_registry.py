@@ -0,0 +1,65 @@
+"""音色列表缓存：asyncio 版本的共享状态读写不阻塞事件循环"""
+
+import asyncio
+import threading
+import time
+
+from shared_state import SQLiteState
+from voice_registry import VoiceRegistry
+
+
+def make_registry(tmp_path):
+    return VoiceRegistry(ttl=60, state=SQLiteState(str(tmp_path / "state.sqlite3")), state_key="test")
+
+
+def test_async_add_remove_shared_between_instances(tmp_path):
+    a = make_registry(tmp_path)
+    b = make_registry(tmp_path)
+
+    async def loader():
+        return [{"customName": "alex", "uri": "speech:alex"}]
+
+    async def main():
+        await a.aget(loader)
+        await a.aadd("mine", "speech:mine", "model", "hash")
+        names = {item["customName"] for item in await b.aget(loader)}
+        assert names == {"alex", "mine"}
+        assert b.find_reference("model", "hash")["uri"] == "speech:mine"
+        await b.aremove("speech:mine")
+        return {item["customName"] for item in await a.aget(loader)}
+
+    assert asyncio.run(main()) == {"alex"}
+
+
+def test_async_add_waits_for_shared_lock_without_blocking_loop(tmp_path):
+    """其他进程持有共享锁时，aadd 等待期间事件循环仍能调度其他协程"""
+    registry = make_registry(tmp_path)
+    registry.state.set("voice_list", "test", {"entries": [], "loaded_at": time.time()}, ttl=60)
+    held = threading.Event()
+
+    def hold_lock():
+        with registry.state.lock("voice_list:test"):
+            held.set()
+            time.sleep(0.5)
+
+    async def main():
+        thread = threading.Thread(target=hold_lock)
+        thread.start()
+        held.wait()
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await registry.aadd("mine", "speech:mine")
+        task.cancel()
+        thread.join()
+        return ticks
+
+    assert asyncio.run(main()) >= 20
+    snapshot = registry.state.get("voice_list", "test")
+    assert [item["uri"] for item in snapshot["entries"]] == ["speech:mine"]
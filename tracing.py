@@ -0,0 +1,505 @@
+"""
+请求级追踪与慢请求采样剖析：
+1. 每次界面操作（app.py 中的处理函数）为一个 trace，记录其中各步骤的 span：参数校验、文件读取 / 编码、
+   上传、上游首字节（TTFB）、流式下载、写盘、ffmpeg 等；metrics.track 统计的操作自动成为 span
+2. trace 结束时以一行 JSON 追加写入本地追踪日志（由后台线程写盘，不阻塞事件循环；超过大小上限时轮转为 .1），
+   按 trace_id 即可还原单次请求的耗时分布
+3. 可选采样剖析：请求期间定时采样处理该请求的线程的调用栈，耗时超过阈值的请求输出折叠栈文件
+   （可直接用 flamegraph.pl / speedscope 生成火焰图），并在 trace 中记录占用采样最多的代码行。
+   事件循环线程由并发请求共享，并发较高时采样中会混入同一时段其他请求的调用栈
+
+没有活动 trace 时（如 CLI、批处理）span 不做任何记录，开销只有一次 ContextVar 读取。
+
+配置（环境变量）：
+    TRACE_LOG               追踪日志路径（JSONL），未设置时不追踪
+    TRACE_LOG_MAX_BYTES     追踪日志大小上限（字节），超过后轮转为 <TRACE_LOG>.1
+    PROFILE_SLOW_SECONDS    开启采样剖析，耗时超过该秒数的请求输出剖析结果（默认关闭，需同时设置 TRACE_LOG）
+    PROFILE_INTERVAL_MS     采样间隔（毫秒）
+"""
+
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+
+DEFAULT_TRACE_LOG = os.getenv("TRACE_LOG", "")
+TRACE_LOG_MAX_BYTES = int(os.getenv("TRACE_LOG_MAX_BYTES", str(64 * 1024 * 1024)))
+_slow_seconds = os.getenv("PROFILE_SLOW_SECONDS", "").strip()
+PROFILE_SLOW_SECONDS = float(_slow_seconds) if _slow_seconds else None
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+# 剖析结果中记录的热点代码行数，以及折叠栈保留的最大深度
+PROFILE_TOP_FRAMES = 10
+PROFILE_MAX_DEPTH = 64
+# 栈顶为这些帧的采样视为空闲（事件循环等待 I/O、线程池等待任务），不计入热点
+IDLE_FRAMES = ("select (selectors.py", "_worker (thread.py", "wait (threading.py")
+
+_current = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    """一次请求的 span 集合（线程安全：同一请求的子任务可能运行在线程池中）"""
+
+    def __init__(self, name, attrs=None):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.attrs = dict(attrs or {})
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.spans = []
+        self.threads = {threading.get_ident()}
+        self.samples = Counter()
+        self.sample_count = 0
+        self.lock = threading.Lock()
+
+    def add(self, name, start, duration, attrs=None, parent=None):
+        """
+        记录一个 span
+
+        Args:
+            start: 开始时刻（perf_counter）
+            duration: 耗时（秒）
+            parent: 所属 span 的名称（如 tts.ttfb 属于 tts）
+        """
+        item = {
+            "name": name,
+            "start": round(start - self.started, 6),
+            "duration": round(duration, 6),
+            "thread": threading.get_ident()
+        }
+        if parent:
+            item["parent"] = parent
+        if attrs:
+            item["attrs"] = attrs
+        with self.lock:
+            self.spans.append(item)
+
+    def touch(self):
+        """登记当前线程参与处理该请求（采样剖析只采样这些线程）"""
+        ident = threading.get_ident()
+        if ident not in self.threads:
+            with self.lock:
+                self.threads.add(ident)
+
+
+class SpanHandle:
+    """span 的句柄：在 span 结束前补充属性、标记首字节"""
+
+    __slots__ = ("attrs", "ttfb")
+
+    def __init__(self):
+        self.attrs = {}
+        self.ttfb = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def first_byte(self, seconds):
+        """标记首字节在 span 开始后 seconds 秒到达，结束时拆分出 .ttfb 与 .download 两个子 span"""
+        self.ttfb = seconds
+
+
+class Accumulator:
+    """
+    累计一个 trace 内多次短操作（如流式写盘的每一块）的耗时，结束时记为一个 span
+
+        with accumulate("disk_write") as writes:
+            for chunk in chunks:
+                with writes:
+                    f.write(chunk)
+    """
+
+    __slots__ = ("name", "attrs", "trace", "first", "total", "calls", "_entered")
+
+    def __init__(self, name, trace, attrs=None):
+        self.name = name
+        self.attrs = attrs or {}
+        self.trace = trace
+        self.first = None
+        self.total = 0.0
+        self.calls = 0
+        self._entered = 0.0
+
+    def __enter__(self):
+        if self.trace is not None:
+            self._entered = time.perf_counter()
+            if self.first is None:
+                self.first = self._entered
+        return self
+
+    def __exit__(self, *exc):
+        if self.trace is not None:
+            self.total += time.perf_counter() - self._entered
+            self.calls += 1
+        return False
+
+    def close(self):
+        if self.trace is not None and self.calls:
+            self.trace.add(self.name, self.first, self.total, dict(self.attrs, calls=self.calls))
+            self.calls = 0
+
+
+def current_trace():
+    """当前上下文中的 trace，没有时返回 None"""
+    return _current.get()
+
+
+@contextmanager
+def span(name, **attrs):
+    """
+    记录一个 span：with span("file_read_encode", bytes=size) as s: ...
+
+    没有活动 trace 时不记录；上下文内抛出异常时 span 带 error 属性。
+    """
+    trace = _current.get()
+    if trace is None:
+        yield SpanHandle()
+        return
+    trace.touch()
+    handle = SpanHandle()
+    handle.attrs.update(attrs)
+    start = time.perf_counter()
+    try:
+        yield handle
+    except GeneratorExit:
+        raise
+    except BaseException as e:
+        handle.attrs["error"] = type(e).__name__
+        raise
+    finally:
+        end = time.perf_counter()
+        trace.add(name, start, end - start, handle.attrs or None)
+        if handle.ttfb is not None:
+            first_byte = start + handle.ttfb
+            trace.add(f"{name}.ttfb", start, handle.ttfb, parent=name)
+            trace.add(f"{name}.download", first_byte, max(end - first_byte, 0.0), parent=name)
+
+
+@contextmanager
+def accumulate(name, **attrs):
+    """累计多次短操作的耗时，结束时记为一个 span（见 Accumulator）"""
+    accumulator = Accumulator(name, _current.get(), attrs)
+    try:
+        yield accumulator
+    finally:
+        accumulator.close()
+
+
+class _Sampler:
+    """后台采样线程：定时读取活动 trace 所涉及线程的调用栈，按折叠栈计数"""
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active = set()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def add(self, trace):
+        with self._lock:
+            self._active.add(trace)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="trace-sampler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def remove(self, trace):
+        with self._lock:
+            self._active.discard(trace)
+
+    def _run(self):
+        own = threading.get_ident()
+        last = None
+        while True:
+            with self._lock:
+                traces = list(self._active)
+            if not traces:
+                last = None
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            # 持有 GIL 的长时间 C 调用（如整份 base64 编码）期间采样线程无法运行，返回后看到的栈顶
+            # 仍是发起调用的代码行，按距上次采样经过的间隔数加权，避免低估这类热点
+            now = time.perf_counter()
+            weight = max(1, round((now - last) / self.interval)) if last is not None else 1
+            last = now
+            frames = sys._current_frames()
+            for trace in traces:
+                with trace.lock:
+                    threads = list(trace.threads)
+                stacks = [_fold(frames[ident]) for ident in threads if ident != own and ident in frames]
+                with trace.lock:
+                    trace.sample_count += 1
+                    for stack in stacks:
+                        trace.samples[stack] += weight
+            del frames
+            time.sleep(self.interval)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _fold(frame):
+    """调用栈 → 折叠栈字符串（由外到内以 ; 分隔）"""
+    labels = []
+    while frame is not None and len(labels) < PROFILE_MAX_DEPTH:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class Tracer:
+    """管理 trace 的开始与结束：写追踪日志，慢请求输出剖析结果"""
+
+    def __init__(self, log_path=DEFAULT_TRACE_LOG, slow_seconds=PROFILE_SLOW_SECONDS,
+                 interval=PROFILE_INTERVAL, max_bytes=TRACE_LOG_MAX_BYTES):
+        """
+        Args:
+            log_path: 追踪日志路径（JSONL），为空时不记录 trace
+            slow_seconds: 耗时超过该秒数的请求输出剖析结果，None 表示不采样
+            interval: 采样间隔（秒）
+            max_bytes: 追踪日志大小上限（字节），超过后轮转为 <log_path>.1，0 表示不限制
+        """
+        self.log_path = log_path
+        self.slow_seconds = slow_seconds
+        self.max_bytes = max_bytes
+        self.profile_dir = os.path.join(os.path.dirname(log_path) or ".", "profiles")
+        self._sampler = _Sampler(interval) if log_path and slow_seconds is not None else None
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._writer = None
+
+    @property
+    def enabled(self):
+        return bool(self.log_path)
+
+    def start(self, name, attrs=None):
+        trace = Trace(name, attrs)
+        if self._sampler is not None:
+            self._sampler.add(trace)
+        return trace
+
+    def finish(self, trace, error=None):
+        """结束 trace 并写入日志，返回写入的记录"""
+        duration = time.perf_counter() - trace.started
+        if self._sampler is not None:
+            self._sampler.remove(trace)
+        with trace.lock:
+            spans = sorted(trace.spans, key=lambda item: item["start"])
+        record = {
+            "trace_id": trace.trace_id,
+            "name": trace.name,
+            "started_at": round(trace.started_at, 3),
+            "duration": round(duration, 6),
+            "status": "error" if error is not None else "ok",
+            "spans": spans
+        }
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        if trace.attrs:
+            record["attrs"] = trace.attrs
+        if self._sampler is not None and duration >= self.slow_seconds and trace.samples:
+            record["profile"] = self._dump_profile(trace)
+        self._submit(self._append_log, json.dumps(record, ensure_ascii=False, default=str))
+        return record
+
+    def flush(self, timeout=None):
+        """等待已提交的日志写完，返回是否在超时前写完"""
+        with self._queue.all_tasks_done:
+            if timeout is None:
+                while self._queue.unfinished_tasks:
+                    self._queue.all_tasks_done.wait()
+                return True
+            return self._queue.all_tasks_done.wait_for(lambda: not self._queue.unfinished_tasks, timeout)
+
+    def _submit(self, func, *args):
+        """交给后台线程写盘（trace 多在事件循环线程上结束，不能在这里做文件 I/O）"""
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+                self._writer.start()
+                atexit.register(self.flush, 5)
+        self._queue.put((func, args))
+
+    def _write_loop(self):
+        while True:
+            func, args = self._queue.get()
+            try:
+                func(*args)
+            except OSError as e:
+                print(f"写入追踪日志失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _append_log(self, line):
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        if self.max_bytes:
+            try:
+                if os.path.getsize(self.log_path) >= self.max_bytes:
+                    os.replace(self.log_path, self.log_path + ".1")
+            except FileNotFoundError:
+                pass
+        with open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+    @staticmethod
+    def _write_folded(path, samples):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def _dump_profile(self, trace):
+        """提交折叠栈文件的写入，返回 {path, samples, interval_ms, idle_ratio, hot: [{frame, samples, ratio}]}"""
+        with trace.lock:
+            samples = Counter(trace.samples)
+            sample_count = trace.sample_count
+        path = os.path.join(self.profile_dir, f"{trace.trace_id}.folded")
+        self._submit(self._write_folded, path, samples)
+        # 按栈顶代码行（self 时间）汇总热点
+        leaves = Counter()
+        idle = 0
+        for stack, count in samples.items():
+            leaf = stack.rsplit(";", 1)[-1]
+            if leaf.startswith(IDLE_FRAMES):
+                idle += count
+            else:
+                leaves[leaf] += count
+        total = sum(samples.values())
+        return {
+            "path": path,
+            "samples": sample_count,
+            "interval_ms": round(self._sampler.interval * 1000, 3),
+            "idle_ratio": round(idle / total, 3),
+            "hot": [
+                {"frame": frame, "samples": count, "ratio": round(count / total, 3)}
+                for frame, count in leaves.most_common(PROFILE_TOP_FRAMES)
+            ]
+        }
+
+
+_tracer = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer():
+    """获取进程内共享的 Tracer（首次调用时按环境变量创建）"""
+    global _tracer
+    with _tracer_lock:
+        if _tracer is None:
+            _tracer = Tracer()
+        return _tracer
+
+
+def configure_tracer(tracer):
+    """替换进程内使用的 Tracer"""
+    global _tracer
+    with _tracer_lock:
+        _tracer = tracer
+    return tracer
+
+
+def traced(name=None):
+    """
+    将处理函数的一次调用作为一个 trace：@traced("generate_speech")
+
+    支持普通函数、协程函数与异步生成器（Gradio 的流式输出），保留原函数签名。
+    已处于 trace 内的嵌套调用不再开启新的 trace。
+    """
+    def decorator(func):
+        trace_name = name or func.__name__
+
+        def begin():
+            tracer = get_tracer()
+            if not tracer.enabled or _current.get() is not None:
+                return None, None
+            return tracer, tracer.start(trace_name)
+
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def agen_wrapper(*args, **kwargs):
+                tracer, trace = begin()
+                if trace is None:
+                    async for item in func(*args, **kwargs):
+                        yield item
+                    return
+                # Gradio 每次取下一项可能运行在不同的上下文中，每一步单独设置当前 trace
+                token = _current.set(trace)
+                try:
+                    iterator = func(*args, **kwargs)
+                finally:
+                    _current.reset(token)
+                error = None
+                try:
+                    while True:
+                        token = _current.set(trace)
+                        try:
+                            item = await iterator.__anext__()
+                        except StopAsyncIteration:
+                            break
+                        finally:
+                            _current.reset(token)
+                        yield item
+                except GeneratorExit:
+                    raise
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    token = _current.set(trace)
+                    try:
+                        await iterator.aclose()
+                    finally:
+                        _current.reset(token)
+                        tracer.finish(trace, error)
+
+            return agen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                tracer, trace = begin()
+                if trace is None:
+                    return await func(*args, **kwargs)
+                token = _current.set(trace)
+                error = None
+                try:
+                    return await func(*args, **kwargs)
+                except BaseException as e:
+                    error = e
+                    raise
+                finally:
+                    _current.reset(token)
+                    tracer.finish(trace, error)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            tracer, trace = begin()
+            if trace is None:
+                return func(*args, **kwargs)
+            token = _current.set(trace)
+            error = None
+            try:
+                return func(*args, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                _current.reset(token)
+                tracer.finish(trace, error)
+
+        return wrapper
+
+    return decorator
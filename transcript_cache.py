@@ -0,0 +1,76 @@
+"""
+语音转写结果缓存：
+1. 以音频内容的 SHA-256、模型名与 API 根地址作为键，相同音频重复转写不再请求上游，
+   不同上游（如本地模拟服务与线上服务）的结果互不混用
+2. 结果以 JSON 文件持久化在本地磁盘
+3. 按总字节数 LRU 淘汰、命中统计与多进程共用目录的处理见 disk_cache.DiskLRUCache
+"""
+
+import hashlib
+import json
+import os
+import threading
+
+from disk_cache import DiskLRUCache
+
+DEFAULT_CACHE_DIR = os.getenv("TRANSCRIPT_CACHE_DIR", "outputs/cache/transcripts")
+DEFAULT_MAX_BYTES = int(os.getenv("TRANSCRIPT_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+
+def file_digest(path):
+    """流式计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def bytes_digest(data):
+    """计算内存数据的 SHA-256"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class TranscriptCache(DiskLRUCache):
+    """基于磁盘的 LRU 转写结果缓存"""
+
+    suffix = ".json"
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        super().__init__(cache_dir, max_bytes)
+
+    @staticmethod
+    def make_key(content_digest, model, variant="", base_url=""):
+        """根据音频内容哈希、模型、转写方式与 API 根地址生成缓存键"""
+        payload = f"{base_url}|{content_digest}|{model}|{variant}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """查询缓存，未命中返回 None"""
+        path = self.lookup(key)
+        if path is None:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            self._discard(key)
+            return None
+
+    def put(self, key, result):
+        """写入缓存"""
+        with self.writer(key) as f:
+            f.write(json.dumps(result, ensure_ascii=False).encode("utf-8"))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_transcript_cache():
+    """获取进程内共享的转写结果缓存"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TranscriptCache()
+        return _cache
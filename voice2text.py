@@ -1,41 +1,215 @@
 import requests
 import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from http_transport import get_transport, resolve_base_url
+from audio_chunking import (
+    DEFAULT_CHUNK_SECONDS, DEFAULT_MAX_WORKERS, DEFAULT_SAMPLE_RATE,
+    decode_pcm, merge_transcripts, split_pcm, to_wav_bytes
+)
+from shared_state import get_shared_state
+from singleflight import SingleFlight
+from metrics import track
+from transcript_cache import TranscriptCache, bytes_digest, file_digest, get_transcript_cache
+
+# 进程内相同音频的并发转写请求合并为一次
+_transcribe_flight = SingleFlight()
+
+def multipart_envelope(model, filename, content_type):
+    """
+    构建流式 multipart 请求体的头尾，文件内容夹在两者之间分块发送
+
+    Returns:
+        tuple: (Content-Type 请求头, 文件内容之前的字节, 文件内容之后的字节)
+    """
+    boundary = uuid.uuid4().hex
+    head = (
+        f'--{boundary}\r\nContent-Disposition: form-data; name="model"\r\n\r\n{model}\r\n'
+        f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        f'Content-Type: {content_type}\r\n\r\n'
+    ).encode("utf-8")
+    tail = f'\r\n--{boundary}--\r\n'.encode("utf-8")
+    return f"multipart/form-data; boundary={boundary}", head, tail
 
 class AudioTranscriber:
-    def __init__(self, api_key):
+    def __init__(self, api_key, transport=None, cache=None, base_url=None, state=None):
         self.api_key = api_key
-        self.url = "https://api.siliconflow.cn/v1/audio/transcriptions"
+        self.transport = transport or get_transport()
+        self.cache = cache or get_transcript_cache()
+        self.state = state or get_shared_state()
+        self.model = 'FunAudioLLM/SenseVoiceSmall'
+        self.root_url = resolve_base_url(base_url)
+        self.url = f"{self.root_url}/audio/transcriptions"
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "multipart/form-data; boundary=---011000010111000001101001"
         }
     
-    def transcriptions(self, audio_file_path):
+    def _cached(self, key, fn, use_cache=True):
+        """
+        先查转写缓存，未命中时合并相同键的并发请求（进程内 single-flight + 跨进程共享锁），
+        结果写回缓存
+        """
+        if use_cache:
+            result = self.cache.get(key)
+            if result is not None:
+                return result
+
+        def load():
+            with self.state.lock(f"transcribe:{key}"):
+                # 等待期间可能已有其他请求（包括其他进程）写入缓存
+                result = self.cache.get(key) if use_cache else None
+                if result is None:
+                    result = fn()
+                    self.cache.put(key, result)
+                return result
+
+        return _transcribe_flight.do(key, load)
+
+    def transcriptions(self, audio_file_path, use_cache=True):
         """
         将音频文件转换为文字
         
         Args:
             audio_file_path (str): 音频文件的路径
+            use_cache (bool): 是否读取转写缓存（按音频内容哈希与模型命中）
             
         Returns:
             dict: API 响应的结果
         """
         if not os.path.exists(audio_file_path):
             raise FileNotFoundError(f"音频文件不存在: {audio_file_path}")
-            
+
+        key = TranscriptCache.make_key(file_digest(audio_file_path), self.model, base_url=self.root_url)
+        return self._cached(key, lambda: self._upload_file(audio_file_path), use_cache)
+
+    def _upload_file(self, audio_file_path):
         with open(audio_file_path, 'rb') as audio_file:
             files = {
                 'file': ('audio.wav', audio_file, 'audio/wav'),
-                'model': (None, 'FunAudioLLM/SenseVoiceSmall')
+                'model': (None, self.model)
             }
             
             try:
-                response = requests.post(
+                with track("transcription") as span:
+                    span.sent(os.path.getsize(audio_file_path))
+                    response = self.transport.post(
+                        self.url,
+                        headers={"Authorization": f"Bearer {self.api_key}"},
+                        files=files
+                    )
+                    response.raise_for_status()
+                    span.received(len(response.content))
+                    return response.json()
+            except requests.exceptions.RequestException as e:
+                raise Exception(f"API 请求失败: {str(e)}")
+
+    def transcribe_bytes(self, audio_data, filename='audio.wav', content_type='audio/wav', use_cache=True):
+        """
+        转写内存中的音频数据
+
+        Args:
+            audio_data (bytes): 音频数据
+            filename (str): 上传时使用的文件名
+            content_type (str): 音频 MIME 类型
+            use_cache (bool): 是否读取转写缓存
+
+        Returns:
+            dict: API 响应的结果
+        """
+        key = TranscriptCache.make_key(bytes_digest(audio_data), self.model, base_url=self.root_url)
+        return self._cached(
+            key, lambda: self._upload_bytes(audio_data, filename, content_type), use_cache
+        )
+
+    def _upload_bytes(self, audio_data, filename, content_type):
+        files = {
+            'file': (filename, audio_data, content_type),
+            'model': (None, self.model)
+        }
+        try:
+            with track("transcription") as span:
+                span.sent(len(audio_data))
+                response = self.transport.post(
                     self.url,
                     headers={"Authorization": f"Bearer {self.api_key}"},
                     files=files
                 )
                 response.raise_for_status()
+                span.received(len(response.content))
                 return response.json()
-            except requests.exceptions.RequestException as e:
-                raise Exception(f"API 请求失败: {str(e)}")
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"API 请求失败: {str(e)}")
+
+    def transcribe_stream(self, chunks, filename='audio.wav', content_type='audio/wav'):
+        """
+        转写流式音频：数据块到达即通过分块传输编码上传，不在内存或磁盘中保留整份音频
+
+        Args:
+            chunks (Iterator[bytes]): 音频数据块
+            filename (str): 上传时使用的文件名
+            content_type (str): 音频 MIME 类型
+
+        Returns:
+            dict: API 响应的结果
+        """
+        multipart_type, head, tail = multipart_envelope(self.model, filename, content_type)
+
+        try:
+            with track("transcription") as span:
+                def body():
+                    yield head
+                    for chunk in chunks:
+                        span.sent(len(chunk))
+                        yield chunk
+                    yield tail
+
+                response = self.transport.post(
+                    self.url,
+                    headers={"Authorization": f"Bearer {self.api_key}", "Content-Type": multipart_type},
+                    data=body()
+                )
+                response.raise_for_status()
+                span.received(len(response.content))
+                return response.json()
+        except requests.exceptions.RequestException as e:
+            raise Exception(f"API 请求失败: {str(e)}")
+
+    def transcriptions_long(self, audio_file_path, chunk_seconds=DEFAULT_CHUNK_SECONDS,
+                            max_workers=DEFAULT_MAX_WORKERS, use_cache=True):
+        """
+        长音频模式：解码为单声道 PCM，在静音处切分后并行转写，按时间顺序合并
+
+        Args:
+            audio_file_path (str): 音频文件的路径
+            chunk_seconds (float): 目标片段时长（秒）
+            max_workers (int): 最大并发转写数
+            use_cache (bool): 是否读取转写缓存
+
+        Returns:
+            dict: {"text": 合并后的文本, "segments": [{"start", "end", "text"}]}
+        """
+        if not os.path.exists(audio_file_path):
+            raise FileNotFoundError(f"音频文件不存在: {audio_file_path}")
+
+        key = TranscriptCache.make_key(
+            file_digest(audio_file_path), self.model, f"long:{chunk_seconds}", self.root_url
+        )
+        return self._cached(
+            key, lambda: self._transcribe_chunks(audio_file_path, chunk_seconds, max_workers), use_cache
+        )
+
+    def _transcribe_chunks(self, audio_file_path, chunk_seconds, max_workers):
+        samples = decode_pcm(audio_file_path, DEFAULT_SAMPLE_RATE)
+        chunks = split_pcm(samples, DEFAULT_SAMPLE_RATE, chunk_seconds)
+        print(f"长音频切分为 {len(chunks)} 个片段")
+
+        def transcribe(chunk):
+            start, end, chunk_samples = chunk
+            result = self._upload_bytes(to_wav_bytes(chunk_samples, DEFAULT_SAMPLE_RATE), 'audio.wav', 'audio/wav')
+            return {"start": start, "end": end, "text": result.get('text', '')}
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            segments = list(executor.map(transcribe, chunks))
+        return merge_transcripts(segments)
@@ -1,23 +1,38 @@
 import os
-import requests
 import base64
 import json
-from openai import OpenAI
 from typing import Optional
 
+from http_transport import get_transport, resolve_base_url
+from synthesis_cache import SynthesisCache, get_synthesis_cache
+from transcript_cache import file_digest
+from long_form import DEFAULT_MAX_CONCURRENCY, WavConcatWriter, iter_synthesized, split_text
+from voice_registry import get_voice_registry
+from reference_upload import prepare_upload
+from metrics import track
+from tracing import accumulate, span as trace_span
+
 
 class VoiceClone:
     """语音克隆类"""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: str, transport=None, cache: Optional[SynthesisCache] = None, registry=None,
+                 base_url: Optional[str] = None):
         """
         初始化语音克隆类
         
         Args:
             api_key: SiliconFlow API密钥
+            transport: 共享的 HTTP 传输层，默认使用进程内共享实例
+            cache: 语音合成缓存，默认使用进程内共享实例
+            registry: 音色列表缓存，上传成功后写入新音色
+            base_url: API 根地址，默认读取环境变量 SILICONFLOW_BASE_URL
         """
         self.api_key = api_key
-        self.base_url = "https://api.siliconflow.cn/v1"
+        self.base_url = resolve_base_url(base_url)
+        self.transport = transport or get_transport()
+        self.cache = cache or get_synthesis_cache()
+        self.registry = registry or get_voice_registry(api_key, self.base_url)
     
     def upload_voice(
         self,
@@ -51,9 +66,6 @@ class VoiceClone:
             }
             
             # 构建请求数据
-            files = {
-                "file": open(audio_path, "rb")
-            }
             data = {
                 "model": model_id,
                 "customName": voice_id,
@@ -61,8 +73,15 @@ class VoiceClone:
             }
             
             # 发送请求
-            response = requests.post(url, headers=headers, files=files, data=data)
-            return response.json()
+            with open(audio_path, "rb") as audio_file, track("upload") as span:
+                files = {
+                    "file": audio_file
+                }
+                span.sent(os.path.getsize(audio_path))
+                response = self.transport.post(url, headers=headers, files=files, data=data).json()
+            if 'uri' in response:
+                self.registry.add(voice_id, response['uri'], model_id, file_digest(audio_path))
+            return response
             
         except Exception as e:
             print(f"上传语音文件失败: {str(e)}")
@@ -92,7 +111,7 @@ class VoiceClone:
             return None
         
         # 读取并编码音频文件
-        with open(audio_path, "rb") as audio_file:
+        with trace_span("file_read_encode", bytes=os.path.getsize(audio_path)), open(audio_path, "rb") as audio_file:
             audio_base64 = base64.b64encode(audio_file.read()).decode('utf-8')
         
         url = f"{self.base_url}/uploads/audio/voice"
@@ -107,12 +126,107 @@ class VoiceClone:
             "audio": f"data:audio/mpeg;base64,{audio_base64}",
             "text": text
         }
-        response = requests.post(url, headers=headers, data=json.dumps(data)).json()
-        print(f"上传语音文件响应: {response}")
-        if 'code' in response:
-            raise Exception(response['message'])
+        # 整份编码结果再序列化为 JSON，大文件时同样耗时明显
+        with trace_span("json_encode"):
+            body = json.dumps(data)
+        with track("upload") as span:
+            span.sent(len(body))
+            response = self.transport.post(url, headers=headers, data=body).json()
+            print(f"上传语音文件响应: {response}")
+            if 'code' in response:
+                raise Exception(response['message'])
+        if 'uri' in response:
+            self.registry.add(voice_id, response['uri'], model_id, file_digest(audio_path))
         return response
+
+    def upload_voice_stream(
+        self,
+        audio_path: str,
+        voice_id: str,
+        model_id: str,
+        text: str,
+        transcode: bool = True
+    ) -> Optional[dict]:
+        """
+        流式上传语音文件进行克隆：边读文件边 base64 编码发送，可先转码为模型采样率的单声道 mp3
+        
+        Args:
+            audio_path: 音频文件路径
+            voice_id: 声音ID
+            model_id: 模型ID
+            text: 音频对应的文本
+            transcode: 是否先转码压缩参考音频
             
+        Returns:
+            响应结果字典，upload_stats 字段记录转码前后的传输字节数
+        """
+        if not os.path.exists(audio_path):
+            print(f"音频文件 {audio_path} 不存在")
+            return None
+
+        body, stats, temp_path = prepare_upload(audio_path, model_id, voice_id, text, transcode)
+        try:
+            url = f"{self.base_url}/uploads/audio/voice"
+            headers = {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            }
+            with track("upload") as span:
+                span.sent(len(body))
+                response = self.transport.post(url, headers=headers, data=body).json()
+                print(f"上传语音文件响应: {response}，传输统计: {stats}")
+                if 'code' in response:
+                    raise Exception(response['message'])
+        finally:
+            if temp_path:
+                os.remove(temp_path)
+        if 'uri' in response:
+            self.registry.add(voice_id, response['uri'], model_id, file_digest(audio_path))
+        response['upload_stats'] = stats
+        return response
+
+    def _stream_speech(
+        self,
+        text: str,
+        voice: str,
+        model_id: str,
+        response_format: str,
+        speed: float,
+        gain: float,
+        sample_rate: Optional[int],
+        use_cache: bool
+    ):
+        """流式生成单段语音，命中缓存时直接读取本地文件"""
+        key = SynthesisCache.make_key(
+            text, model_id, voice, speed, gain, sample_rate, response_format, self.base_url
+        )
+        if use_cache:
+            cached = self.cache.open(key)
+            if cached is not None:
+                with cached as f:
+                    while chunk := f.read(64 * 1024):
+                        yield chunk
+                return
+
+        client = self.transport.openai_client(self.api_key, self.base_url)
+        extra_body = {"gain": gain}
+        if sample_rate:
+            extra_body["sample_rate"] = sample_rate
+        
+        with track("tts") as span, client.audio.speech.with_streaming_response.create(
+            model=model_id, # 支持 fishaudio / GPT-SoVITS / CosyVoice2-0.5B 系列模型
+            voice=voice, # 用户上传音色名称，参考
+            input=text,
+            speed=speed,
+            extra_body=extra_body,
+            response_format=response_format
+            ) as response:
+            with self.cache.writer(key) as cache_file, accumulate("disk_write", target="cache") as writes:
+                for chunk in response.iter_bytes():
+                    span.received(len(chunk))
+                    with writes:
+                        cache_file.write(chunk)
+                    yield chunk
 
     def speech(
         self,
@@ -120,26 +234,48 @@ class VoiceClone:
         voice: str,
         model_id: str = "FunAudioLLM/CosyVoice2-0.5B",
         response_format: str = "wav",
-        speech_file_path: str = "speech.wav"
+        speech_file_path: str = "speech.wav",
+        speed: float = 1.0,
+        gain: float = 0,
+        sample_rate: Optional[int] = None,
+        use_cache: bool = True,
+        long_form: bool = False,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY
     ) -> None:
         """
         生成语音
+
+        Args:
+            use_cache: 是否读取合成缓存，False 时强制请求远端（结果仍会写回缓存）
+            long_form: 长文本模式，按句切分后并发合成并拼接为一个 WAV（仅支持 wav 格式）
+            max_concurrency: 长文本模式下的最大并发数
         """
         try:
-            client = OpenAI(
-                api_key=self.api_key,
-                base_url=self.base_url
-            )
-            
-            with client.audio.speech.with_streaming_response.create(
-                model=model_id, # 支持 fishaudio / GPT-SoVITS / CosyVoice2-0.5B 系列模型
-                voice=voice, # 用户上传音色名称，参考
-                input=text,
-                speed=1.0,
-                extra_body={"gain": 0},
-                response_format=response_format
-                ) as response:
-                response.stream_to_file(speech_file_path)
+            if long_form:
+                if response_format != "wav":
+                    raise ValueError("长文本模式仅支持 wav 格式")
+
+                def synthesize(segment):
+                    return b"".join(self._stream_speech(
+                        segment, voice, model_id, response_format, speed, gain, sample_rate, use_cache
+                    ))
+
+                segments = split_text(text)
+                print(f"长文本切分为 {len(segments)} 个片段")
+                with open(speech_file_path, "wb") as f, accumulate("disk_write", target="output") as writes:
+                    writer = WavConcatWriter(f)
+                    for wav in iter_synthesized(segments, synthesize, max_concurrency):
+                        with writes:
+                            writer.append(wav)
+                    writer.close()
+                return None
+
+            with open(speech_file_path, "wb") as f, accumulate("disk_write", target="output") as writes:
+                for chunk in self._stream_speech(
+                    text, voice, model_id, response_format, speed, gain, sample_rate, use_cache
+                ):
+                    with writes:
+                        f.write(chunk)
             
         except Exception as e:
             print(f"生成语音失败: {str(e)}")
@@ -1,35 +1,103 @@
-import requests
 import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from http_transport import get_transport, resolve_base_url
+from synthesis_cache import SynthesisCache, get_synthesis_cache
+from audio_variants import derive_variants, master_sample_rate
+from long_form import DEFAULT_MAX_CHARS, DEFAULT_MAX_CONCURRENCY, concat_wav, iter_synthesized, split_text
+from voice_registry import get_voice_registry
+from metrics import track
+from tracing import accumulate
 
 class VoiceGenerator:
-    def __init__(self, api_key):
+    def __init__(self, api_key, transport=None, cache=None, registry=None, base_url=None):
         self.api_key = api_key
-        self.base_url = "https://api.siliconflow.cn/v1/audio"
+        self.transport = transport or get_transport()
+        self.cache = cache or get_synthesis_cache()
+        root_url = resolve_base_url(base_url)
+        self.root_url = root_url
+        self.registry = registry or get_voice_registry(api_key, root_url)
+        self.base_url = f"{root_url}/audio"
         self.headers = {
             "Authorization": f"Bearer {api_key}",
             "Content-Type": "application/json"
         }
 
-    def get_voice_list(self):
-        """获取语音列表"""
+    def _fetch_voice_list(self):
+        """从上游拉取语音列表"""
         url = f"{self.base_url}/voice/list"
-        response = requests.get(url, headers=self.headers).json()
-        return [f"{item['customName']}:{item['uri']}" for item in response['result']]
+        with track("voice_list") as span:
+            raw = self.transport.get(url, headers=self.headers)
+            span.received(len(raw.content))
+            response = raw.json()
+        return [
+            {"customName": item['customName'], "uri": item['uri'], "model": item.get('model')}
+            for item in response['result']
+        ]
+
+    def get_voice_list(self, refresh=False):
+        """
+        获取语音列表（带 TTL 缓存，并发刷新合并为一次请求）
+
+        Args:
+            refresh: 忽略缓存有效期，强制重新拉取
+
+        Returns:
+            list[str]: "customName:uri" 格式的列表，供下拉框使用
+        """
+        entries = self.registry.get(self._fetch_voice_list, refresh=refresh)
+        return [f"{item['customName']}:{item['uri']}" for item in entries]
+
+    def get_voices(self, refresh=False):
+        """
+        获取音色条目列表
+
+        Returns:
+            list[dict]: {"customName", "uri", "model", "reference_hash", "created"}，
+            后三项为本地上传时记录的信息，其他途径创建的音色可能为 None
+        """
+        return self.registry.get(self._fetch_voice_list, refresh=refresh)
+
+    def find_voice(self, custom_name, refresh=False):
+        """按 customName 查找音色条目，不存在时返回 None"""
+        self.registry.get(self._fetch_voice_list, refresh=refresh)
+        return self.registry.lookup(custom_name)
 
     def delete_voice(self, uri):
         """删除指定的语音"""
         url = f"{self.base_url}/voice/deletions"
         data = {"uri": uri}
-        response = requests.post(url, headers=self.headers, json=data)
+        with track("voice_delete"):
+            response = self.transport.post(url, headers=self.headers, json=data)
+        if response.ok:
+            self.registry.remove(uri)
         return response.json()
 
-    def create_speech(self, text, voice, model="FunAudioLLM/CosyVoice2-0.5B",
-                     speed=1, gain=0, sample_rate=24000, response_format="wav"):
-        """生成语音"""
-        url = f"{self.base_url}/speech"
-        data = {
+    def delete_voices(self, uris, max_workers=4):
+        """
+        并发删除多个音色
+
+        Returns:
+            dict: {uri: 删除结果}，出错的音色结果为 {"message": 错误信息}
+        """
+        def delete(uri):
+            try:
+                return self.delete_voice(uri)
+            except Exception as e:
+                return {"message": str(e)}
+
+        uris = list(uris)
+        if not uris:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(uris))) as executor:
+            return dict(zip(uris, executor.map(delete, uris)))
+
+    def _speech_payload(self, text, voice, model, speed, gain, sample_rate, response_format):
+        """构建语音合成请求数据"""
+        return {
             "input": text,
-            "response_format": "wav",
+            "response_format": response_format,
             "stream": True,
             "speed": speed,
             "gain": gain,
@@ -37,7 +105,101 @@ class VoiceGenerator:
             "voice": voice.split(':', 1)[-1] if ":" in voice else f"{model}:{voice}",
             "sample_rate": sample_rate
         }
+
+    def stream_speech(self, text, voice, model="FunAudioLLM/CosyVoice2-0.5B",
+                      speed=1, gain=0, sample_rate=24000, response_format="wav", use_cache=True):
+        """
+        流式生成语音，按到达顺序逐块返回音频数据
+
+        Args:
+            use_cache: 是否读取合成缓存，False 时强制请求远端（结果仍会写回缓存）
+
+        Yields:
+            bytes: 音频数据块
+        """
+        url = f"{self.base_url}/speech"
+        data = self._speech_payload(text, voice, model, speed, gain, sample_rate, response_format)
+        key = SynthesisCache.make_key(
+            text, model, data["voice"], speed, gain, sample_rate, data["response_format"], self.root_url
+        )
+        if use_cache:
+            cached = self.cache.open(key)
+            if cached is not None:
+                with cached as f:
+                    while chunk := f.read(64 * 1024):
+                        yield chunk
+                return
+
         print(f"生成语音请求数据：{data}")
-        response = requests.post(url, headers=self.headers, json=data)
-        return response.content  # 返回音频二进制数据
+        with track("tts") as span, self.transport.post(url, headers=self.headers, json=data, stream=True) as response:
+            if response.status_code != 200:
+                raise Exception(f"生成语音失败: {response.status_code} {response.text}")
+            with self.cache.writer(key) as cache_file, accumulate("disk_write", target="cache") as writes:
+                for chunk in response.iter_content(chunk_size=None):
+                    if chunk:
+                        span.received(len(chunk))
+                        with writes:
+                            cache_file.write(chunk)
+                        yield chunk
+
+    def create_speech_to_file(self, text, voice, output_path, **kwargs):
+        """流式生成语音并边接收边写入文件，返回文件路径"""
+        with open(output_path, "wb") as f, accumulate("disk_write", target="output") as writes:
+            for chunk in self.stream_speech(text, voice, **kwargs):
+                with writes:
+                    f.write(chunk)
+        return output_path
+
+    def stream_long_speech(self, text, voice, model="FunAudioLLM/CosyVoice2-0.5B",
+                           speed=1, gain=0, sample_rate=24000, use_cache=True,
+                           max_concurrency=DEFAULT_MAX_CONCURRENCY, max_chars=DEFAULT_MAX_CHARS):
+        """
+        长文本模式：按句切分后并发合成，按原顺序逐段返回
+
+        Yields:
+            bytes: 每个文本片段对应的完整 WAV 数据
+        """
+        def synthesize(segment):
+            return self.create_speech(
+                segment, voice, model=model, speed=speed, gain=gain,
+                sample_rate=sample_rate, response_format="wav", use_cache=use_cache
+            )
+
+        segments = split_text(text, max_chars)
+        print(f"长文本切分为 {len(segments)} 个片段")
+        yield from iter_synthesized(segments, synthesize, max_concurrency)
+
+    def create_speech(self, text, voice, model="FunAudioLLM/CosyVoice2-0.5B",
+                     speed=1, gain=0, sample_rate=24000, response_format="wav", use_cache=True,
+                     long_form=False, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """生成语音"""
+        if long_form:
+            return concat_wav(self.stream_long_speech(
+                text, voice, model=model, speed=speed, gain=gain, sample_rate=sample_rate,
+                use_cache=use_cache, max_concurrency=max_concurrency
+            ))
+        chunks = self.stream_speech(
+            text, voice, model=model, speed=speed, gain=gain,
+            sample_rate=sample_rate, response_format=response_format, use_cache=use_cache
+        )
+        return b"".join(chunks)  # 返回音频二进制数据
+
+    def create_speech_variants(self, text, voice, variants, output_dir, basename=None,
+                               model="FunAudioLLM/CosyVoice2-0.5B", speed=1, gain=0, use_cache=True,
+                               long_form=False, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """
+        只做一次远端合成（WAV，所需的最高采样率），在本地派生其余格式与采样率
+
+        Args:
+            variants (list[tuple[str, int]]): (格式, 采样率) 列表，如 [("mp3", 44100), ("pcm", 16000)]
+            output_dir (str): 输出目录
+            basename (str): 输出文件名前缀，默认随机生成
 
+        Returns:
+            dict: {"格式_采样率": 文件路径}
+        """
+        master = self.create_speech(
+            text, voice, model=model, speed=speed, gain=gain, sample_rate=master_sample_rate(variants),
+            response_format="wav", use_cache=use_cache, long_form=long_form, max_concurrency=max_concurrency
+        )
+        return derive_variants(master, variants, output_dir, basename or f"speech_{os.urandom(4).hex()}")
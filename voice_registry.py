@@ -0,0 +1,324 @@
+"""
+音色列表缓存：
+1. 按 TTL 缓存 /audio/voice/list 的结果，过期后才重新拉取
+2. 并发刷新通过 single-flight 合并为一次上游请求（线程与 asyncio 均支持）
+3. 上传 / 删除音色时直接更新缓存条目（write-through），无需重新拉取整个列表
+4. 配置共享状态后端时，列表快照在多个进程之间共享：任一进程拉取后其他进程直接复用，
+   跨进程的并发刷新也只有一个进程请求上游
+5. 本地索引：按 customName / uri / (模型, 参考音频哈希) O(1) 查找音色；上传时记录的模型、
+   参考音频哈希与创建时间持久保存（上游列表不返回这些字段），重新拉取列表后合并回条目
+6. asyncio 版本（aget / aadd / aremove）的共享状态读写在线程中执行，跨进程锁使用 alock，不阻塞事件循环
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+
+from shared_state import get_shared_state
+from singleflight import AsyncSingleFlight, SingleFlight
+
+DEFAULT_VOICE_LIST_TTL = float(os.getenv("VOICE_LIST_TTL", "60"))
+
+
+class VoiceRegistry:
+    """音色列表缓存"""
+
+    def __init__(self, ttl=DEFAULT_VOICE_LIST_TTL, state=None, state_key=None):
+        """
+        初始化音色列表缓存
+
+        Args:
+            ttl: 缓存有效期（秒）
+            state: 共享状态后端（SharedState），None 表示只在进程内缓存
+            state_key: 在共享状态中的键（区分账号与 API 地址）
+        """
+        self.ttl = ttl
+        self.state = state
+        self.state_key = state_key
+        self._lock = threading.Lock()
+        self._entries = None  # [{"customName", "uri", "model", "reference_hash", "created"}]
+        self._by_name = {}
+        self._by_uri = {}
+        self._by_reference = {}
+        self._meta = {}  # 未配置共享状态时的本地元数据：uri -> {"model", "reference_hash", "created"}
+        self._loaded_at = 0.0
+        self._pending = None  # 拉取期间发生的本地变更，拉取完成后重放
+        self._flight = SingleFlight()
+        self._async_flight = AsyncSingleFlight()
+        self.loads = 0
+
+    def _is_fresh(self):
+        return self._entries is not None and time.monotonic() - self._loaded_at < self.ttl
+
+    def _set_entries(self, entries):
+        """替换条目并重建索引（调用方持有 self._lock）"""
+        self._entries = entries
+        self._by_name = {item["customName"]: item for item in entries}
+        self._by_uri = {item["uri"]: item for item in entries}
+        self._by_reference = {
+            (item.get("model"), item["reference_hash"]): item for item in entries if item.get("reference_hash")
+        }
+
+    def _load_meta(self):
+        if self.state is None:
+            return dict(self._meta)
+        prefix = f"{self.state_key}:"
+        return {
+            key[len(prefix):]: value for key, value in self.state.items("voice_meta").items() if key.startswith(prefix)
+        }
+
+    def _save_meta(self, uri, meta):
+        if self.state is None:
+            with self._lock:
+                if meta is None:
+                    self._meta.pop(uri, None)
+                else:
+                    self._meta[uri] = meta
+        elif meta is None:
+            self.state.delete("voice_meta", f"{self.state_key}:{uri}")
+        else:
+            self.state.set("voice_meta", f"{self.state_key}:{uri}", meta)
+
+    def _merge_meta(self, entries):
+        """将本地记录的元数据合并进上游返回的条目"""
+        meta = self._load_meta()
+        merged = []
+        for item in entries:
+            extra = meta.get(item["uri"], {})
+            merged.append({
+                "customName": item["customName"],
+                "uri": item["uri"],
+                "model": item.get("model") or extra.get("model"),
+                "reference_hash": extra.get("reference_hash"),
+                "created": extra.get("created")
+            })
+        return merged
+
+    def _adopt_shared(self):
+        """采用其他进程拉取的列表快照，成功时返回条目列表"""
+        if self.state is None:
+            return None
+        snapshot = self.state.get("voice_list", self.state_key)
+        if snapshot is None:
+            return None
+        with self._lock:
+            entries = list(snapshot["entries"])
+            for op, value in self._pending or []:
+                entries = self._apply(entries, op, value)
+            self._set_entries(entries)
+            # 快照的拉取时间为墙钟时间，换算到本进程的单调时钟
+            self._loaded_at = time.monotonic() - max(time.time() - snapshot["loaded_at"], 0.0)
+            return list(entries)
+
+    def _publish(self, entries):
+        if self.state is not None:
+            self.state.set(
+                "voice_list", self.state_key, {"entries": entries, "loaded_at": time.time()}, ttl=self.ttl
+            )
+
+    def _publish_mutation(self, op, value):
+        """将本地变更写入共享快照（读-改-写在共享锁内完成）"""
+        if self.state is None:
+            return
+        with self.state.lock(f"voice_list:{self.state_key}"):
+            snapshot = self.state.get("voice_list", self.state_key)
+            if snapshot is None:
+                return
+            remaining = self.ttl - (time.time() - snapshot["loaded_at"])
+            if remaining > 0:
+                snapshot["entries"] = self._apply(snapshot["entries"], op, value)
+                self.state.set("voice_list", self.state_key, snapshot, ttl=remaining)
+
+    def _begin_load(self):
+        with self._lock:
+            if self._pending is None:
+                self._pending = []
+
+    def _finish_load(self, entries):
+        entries = self._merge_meta(entries)
+        with self._lock:
+            for op, value in self._pending or []:
+                entries = self._apply(entries, op, value)
+            self._pending = None
+            self._set_entries(entries)
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+        self._publish(entries)
+        return list(entries)
+
+    def _abort_load(self):
+        with self._lock:
+            self._pending = None
+
+    @staticmethod
+    def _apply(entries, op, value):
+        if op == "add":
+            entries = [item for item in entries if item["uri"] != value["uri"]]
+            entries.append(value)
+        elif op == "remove":
+            entries = [item for item in entries if item["uri"] != value]
+        return entries
+
+    async def _apublish_mutation(self, op, value):
+        """_publish_mutation 的 asyncio 版本"""
+        if self.state is None:
+            return
+        async with self.state.alock(f"voice_list:{self.state_key}"):
+            snapshot = await asyncio.to_thread(self.state.get, "voice_list", self.state_key)
+            if snapshot is None:
+                return
+            remaining = self.ttl - (time.time() - snapshot["loaded_at"])
+            if remaining > 0:
+                snapshot["entries"] = self._apply(snapshot["entries"], op, value)
+                await asyncio.to_thread(self.state.set, "voice_list", self.state_key, snapshot, remaining)
+
+    def _mutate_local(self, op, value):
+        with self._lock:
+            if self._pending is not None:
+                self._pending.append((op, value))
+            if self._entries is not None:
+                self._set_entries(self._apply(self._entries, op, value))
+
+    def _mutate(self, op, value):
+        self._mutate_local(op, value)
+        self._publish_mutation(op, value)
+
+    async def _amutate(self, op, value):
+        self._mutate_local(op, value)
+        await self._apublish_mutation(op, value)
+
+    async def _offload(self, fn, *args):
+        """配置了共享状态时在线程中执行（SQLite 读写），否则直接执行"""
+        if self.state is None:
+            return fn(*args)
+        return await asyncio.to_thread(fn, *args)
+
+    def get(self, loader, refresh=False):
+        """
+        获取音色列表
+
+        Args:
+            loader (callable): 从上游拉取音色列表的函数
+            refresh (bool): 忽略 TTL 强制重新拉取
+
+        Returns:
+            list[dict]: 音色条目列表
+        """
+        # 共享快照优先：其他进程上传 / 删除的音色立即可见
+        if not refresh:
+            entries = self._adopt_shared()
+            if entries is not None:
+                return entries
+        with self._lock:
+            if not refresh and self._is_fresh():
+                return list(self._entries)
+
+        def load():
+            self._begin_load()
+            try:
+                if self.state is None:
+                    return self._finish_load(loader())
+                # 其他进程正在拉取时等待其结果，避免重复请求上游
+                with self.state.lock(f"voice_list_load:{self.state_key}"):
+                    entries = None if refresh else self._adopt_shared()
+                    if entries is not None:
+                        self._abort_load()
+                        return entries
+                    return self._finish_load(loader())
+            except BaseException:
+                self._abort_load()
+                raise
+
+        return self._flight.do("voice_list", load)
+
+    async def aget(self, loader, refresh=False):
+        """get 的 asyncio 版本，loader 为协程函数"""
+        # 共享快照优先：其他进程上传 / 删除的音色立即可见
+        if not refresh:
+            entries = await self._offload(self._adopt_shared)
+            if entries is not None:
+                return entries
+        with self._lock:
+            if not refresh and self._is_fresh():
+                return list(self._entries)
+
+        async def load():
+            self._begin_load()
+            try:
+                if self.state is None:
+                    return self._finish_load(await loader())
+                async with self.state.alock(f"voice_list_load:{self.state_key}"):
+                    entries = None if refresh else await self._offload(self._adopt_shared)
+                    if entries is not None:
+                        self._abort_load()
+                        return entries
+                    entries = await loader()
+                    return await self._offload(self._finish_load, entries)
+            except BaseException:
+                self._abort_load()
+                raise
+
+        return await self._async_flight.do("voice_list", load)
+
+    def add(self, custom_name, uri, model=None, reference_hash=None):
+        """上传音色后写入缓存，并持久记录模型、参考音频哈希与创建时间"""
+        meta = {"model": model, "reference_hash": reference_hash, "created": time.time()}
+        self._save_meta(uri, meta)
+        self._mutate("add", {"customName": custom_name, "uri": uri, **meta})
+
+    def remove(self, uri):
+        """删除音色后移出缓存"""
+        self._save_meta(uri, None)
+        self._mutate("remove", uri)
+
+    async def aadd(self, custom_name, uri, model=None, reference_hash=None):
+        """add 的 asyncio 版本"""
+        meta = {"model": model, "reference_hash": reference_hash, "created": time.time()}
+        await self._offload(self._save_meta, uri, meta)
+        await self._amutate("add", {"customName": custom_name, "uri": uri, **meta})
+
+    async def aremove(self, uri):
+        """remove 的 asyncio 版本"""
+        await self._offload(self._save_meta, uri, None)
+        await self._amutate("remove", uri)
+
+    def lookup(self, custom_name):
+        """按 customName 查找音色条目（基于最近一次获取的列表），不存在时返回 None"""
+        with self._lock:
+            return self._by_name.get(custom_name)
+
+    def lookup_uri(self, uri):
+        """按 uri 查找音色条目"""
+        with self._lock:
+            return self._by_uri.get(uri)
+
+    def find_reference(self, model, reference_hash):
+        """查找用同一参考音频、同一模型创建的音色（用于批量上传时跳过已上传的参考音频）"""
+        with self._lock:
+            return self._by_reference.get((model, reference_hash))
+
+    def invalidate(self):
+        """使缓存失效，下次读取时重新拉取"""
+        with self._lock:
+            self._loaded_at = 0.0
+        if self.state is not None:
+            self.state.delete("voice_list", self.state_key)
+
+
+_registries = {}
+_registries_lock = threading.Lock()
+
+
+def get_voice_registry(api_key, base_url=None):
+    """获取指定账号（及 API 地址）共享的音色列表缓存"""
+    key = (api_key, base_url)
+    with _registries_lock:
+        registry = _registries.get(key)
+        if registry is None:
+            # 共享状态中只保存账号的哈希，不落盘明文 API Key
+            state_key = hashlib.sha256(f"{api_key}|{base_url}".encode("utf-8")).hexdigest()[:16]
+            registry = VoiceRegistry(state=get_shared_state(), state_key=state_key)
+            _registries[key] = registry
+        return registry